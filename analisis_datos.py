@@ -1,48 +1,30 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import analitica
 
-# Cargar los datos desde el archivo CSV (ajusta el nombre del archivo si es necesario)
+# Resumen de datos_simulacion.csv (o del CSV exportado de la telemetría con `python telemetria.py exportar`).
+# El análisis se hace con analitica.py por bloques y sin pantalla; el informe completo (JSON, HTML y,
+# si está matplotlib, PNG) queda en el directorio "informe".
 try:
-    df = pd.read_csv("datos_simulacion.csv")
+    informe = analitica.analizar_csv("datos_simulacion.csv")
+    analitica.escribir_informe(informe, "informe")
+    respuesta = informe["latencia"]["respuesta"]
 
-    # Convertir las columnas de tiempo a datetime
-    df['tiempo_inicio'] = pd.to_datetime(df['tiempo_inicio'])
-    df['tiempo_fin'] = pd.to_datetime(df['tiempo_fin'])
-
-    # Calcular el tiempo de respuesta en segundos
-    df['tiempo_respuesta'] = (df['tiempo_fin'] - df['tiempo_inicio']).dt.total_seconds()
-
-    # Estadísticas descriptivas
-    print(df.describe())
-
-    # Visualización
-    plt.figure(figsize=(12, 6))
-
-    plt.subplot(1, 2, 1)
-    plt.hist(df['tiempo_respuesta'], bins=20)
-    plt.xlabel('Tiempo de Respuesta (s)')
-    plt.ylabel('Frecuencia')
-    plt.title('Distribución de Tiempos de Respuesta')
-
-    plt.subplot(1, 2, 2)
-    plt.plot(df['tiempo_inicio'], df['tiempo_respuesta'])
-    plt.xlabel('Tiempo')
-    plt.ylabel('Tiempo de Respuesta (s)')
-    plt.title('Tiempo de Respuesta a lo Largo del Tiempo')
-
-    plt.tight_layout()
-    plt.show()
+    print(f"{informe['filas']['solicitudes']} solicitudes en {informe['periodo']['segundos']:.0f} s")
+    if respuesta["total"]:
+        print("Tiempo de respuesta: " + ", ".join(f"{clave}={valor:.4f}s" for clave, valor in respuesta["total"].items() if clave != "n"))
 
     # Análisis por tipo de usuario
     print("\nTiempos de respuesta por tipo de usuario:")
-    print(df.groupby('user_id')['tiempo_respuesta'].mean())
+    for user_id, valores in respuesta["por_usuario"].items():
+        print(f"{user_id:<20} media={valores['media']:.4f}s p95={valores['p95']:.4f}s")
 
     # Análisis por tipo de solicitud
     print("\nTiempos de respuesta por tipo de solicitud:")
-    print(df.groupby('tipo_solicitud')['tiempo_respuesta'].mean())
+    for tipo, valores in respuesta["por_tipo"].items():
+        print(f"{tipo:<20} media={valores['media']:.4f}s p95={valores['p95']:.4f}s")
+    print("\nInforme completo en informe/informe.html")
 
 except FileNotFoundError:
     print("El archivo CSV no se encontró. Asegúrate de que los scripts de prueba se están ejecutando y guardando los datos correctamente.")
 
 except Exception as e:
-    print(f"Ocurrió un error durante el análisis: {e}")
\ No newline at end of file
+    print(f"Ocurrió un error durante el análisis: {e}")
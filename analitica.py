@@ -0,0 +1,467 @@
+import argparse
+import csv
+import html
+import json
+import math
+import os
+import sys
+import numpy as np
+import telemetria
+
+# Analítica de la telemetría del servidor (telemetria.py) o de un CSV de simulación (datos_simulacion.csv):
+# percentiles de latencia por usuario, tipo y servidor, rendimiento a lo largo del tiempo y eventos de
+# escalado. Los datos se recorren por bloques y cada bloque se agrega con operaciones vectorizadas sobre
+# acumuladores de tamaño fijo (histogramas logarítmicos y conteos por ventana), así que la memoria depende
+# del número de usuarios, servidores y ventanas, no del de filas. El resultado es un informe JSON (para
+# comparar ejecuciones con `comparar`) y un informe HTML con gráficos SVG, más PNG si está matplotlib:
+#   python analitica.py informe --telemetria telemetria --salida informe
+#   python analitica.py informe --csv datos_simulacion.csv --salida informe
+#   python analitica.py comparar informe_base/informe.json informe/informe.json --tolerancia 0.1
+
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+# Cada fila de un CSV se lee como texto; se agrupan en bloques de este número de filas
+FILAS_CSV = 65536
+
+class HistogramasLatencia:
+    """
+    Histogramas de latencia de varios grupos (usuarios, tipos, servidores) con buckets logarítmicos:
+    cada bucket cubre un `resolucion` relativo (1 %) entre `minimo` y `maximo` segundos, de modo que los
+    percentiles tienen ese error relativo y la memoria por grupo es fija (≈2300 contadores).
+    """
+    def __init__(self, resolucion=0.01, minimo=1e-6, maximo=1e4):
+        self.minimo = minimo
+        self.log_base = math.log1p(resolucion)
+        # Bucket 0: por debajo de `minimo` (p. ej. 0); el último: por encima de `maximo`
+        self.num_buckets = int(math.ceil(math.log(maximo / minimo) / self.log_base)) + 2
+        limites = minimo * np.exp(self.log_base * np.arange(self.num_buckets - 1))
+        # Valor representativo de cada bucket: su punto medio geométrico
+        self.representantes = np.concatenate(([0.0], np.sqrt(limites[:-1] * limites[1:]), [limites[-1]]))
+        self.grupos = {}  # {nombre: fila}
+        self.cuentas = np.zeros((0, self.num_buckets), dtype=np.uint32)
+        self.sumas = np.zeros(0)
+        self.minimos = np.zeros(0)
+        self.maximos = np.zeros(0)
+
+    def _filas(self, nombres):
+        unicos, inversa = np.unique(nombres, return_inverse=True)
+        nuevos = [str(n) for n in unicos if str(n) not in self.grupos]
+        if nuevos:
+            for nombre in nuevos:
+                self.grupos[nombre] = len(self.grupos)
+            extra = len(nuevos)
+            self.cuentas = np.vstack((self.cuentas, np.zeros((extra, self.num_buckets), dtype=np.uint32)))
+            self.sumas = np.concatenate((self.sumas, np.zeros(extra)))
+            self.minimos = np.concatenate((self.minimos, np.full(extra, np.inf)))
+            self.maximos = np.concatenate((self.maximos, np.full(extra, -np.inf)))
+        return np.array([self.grupos[str(n)] for n in unicos], dtype=np.int64)[inversa]
+
+    def agregar(self, nombres, valores):
+        """Añade las latencias `valores` (segundos) de un bloque, cada una al grupo de `nombres`."""
+        valores = np.asarray(valores, dtype=np.float64)
+        validos = np.isfinite(valores) & (valores >= 0)
+        if not validos.all():
+            nombres, valores = np.asarray(nombres)[validos], valores[validos]
+        if len(valores) == 0:
+            return
+        filas = self._filas(nombres)
+        buckets = np.zeros(len(valores), dtype=np.int64)
+        positivos = valores >= self.minimo
+        buckets[positivos] = np.minimum(np.floor(np.log(valores[positivos] / self.minimo) / self.log_base).astype(np.int64) + 1,
+                                        self.num_buckets - 1)
+        claves, repeticiones = np.unique(filas * self.num_buckets + buckets, return_counts=True)
+        self.cuentas.reshape(-1)[claves] += repeticiones.astype(np.uint32)
+        self.sumas += np.bincount(filas, weights=valores, minlength=len(self.grupos))
+        np.minimum.at(self.minimos, filas, valores)
+        np.maximum.at(self.maximos, filas, valores)
+
+    def resumen(self, percentiles=PERCENTILES):
+        """{grupo: {n, media, min, max, p50, ...}} con los percentiles de todos los grupos calculados a la vez."""
+        if not self.grupos:
+            return {}
+        acumuladas = np.cumsum(self.cuentas, axis=1, dtype=np.int64)
+        totales = acumuladas[:, -1]
+        columnas = {}
+        for p in percentiles:
+            objetivo = np.maximum(np.ceil(totales * p / 100.0), 1)
+            bucket = (acumuladas < objetivo[:, None]).sum(axis=1)
+            columnas[f"p{p:g}"] = np.clip(self.representantes[bucket], self.minimos, self.maximos)
+        resumen = {}
+        for nombre, fila in sorted(self.grupos.items()):
+            n = int(totales[fila])
+            resumen[nombre] = {"n": n, "media": float(self.sumas[fila] / n), "min": float(self.minimos[fila]),
+                               "max": float(self.maximos[fila]),
+                               **{clave: float(valores[fila]) for clave, valores in columnas.items()}}
+        return resumen
+
+class ConteoPorVentana:
+    """Número de eventos por ventana de `ventana` segundos, acumulado por bloques."""
+    def __init__(self, ventana=1.0):
+        self.ventana = ventana
+        self.cuentas = {}  # {índice de ventana: eventos}
+
+    def agregar(self, instantes):
+        if len(instantes) == 0:
+            return
+        indices, cuentas = np.unique(np.floor(np.asarray(instantes, dtype=np.float64) / self.ventana).astype(np.int64),
+                                     return_counts=True)
+        for indice, cuenta in zip(indices.tolist(), cuentas.tolist()):
+            self.cuentas[indice] = self.cuentas.get(indice, 0) + cuenta
+
+class Analisis:
+    """
+    Acumula bloques de solicitudes (llegadas) y de completadas con las columnas de telemetria.ESQUEMAS
+    y produce el informe. Los eventos de escalado se deducen de la primera y la última actividad de cada
+    servidor: un servidor inactivo durante más de `inactividad` segundos antes del final se da por retirado.
+    """
+    def __init__(self, ventana=1.0, inactividad=30.0):
+        self.ventana = ventana
+        self.inactividad = inactividad
+        self.respuesta = {clave: HistogramasLatencia() for clave in ("total", "tipo", "usuario", "servidor")}
+        self.espera_cola = HistogramasLatencia()
+        self.procesamiento = HistogramasLatencia()
+        self.servicio = {clave: HistogramasLatencia() for clave in ("total", "tipo")}
+        self.llegadas = ConteoPorVentana(ventana)
+        self.completadas = ConteoPorVentana(ventana)
+        self.actividad = {}  # {servidor: [primer instante, último instante]}
+        self.filas = {"solicitudes": 0, "completadas": 0}
+        self.periodo = [math.inf, -math.inf]
+
+    def _periodo(self, instantes):
+        if len(instantes):
+            self.periodo = [min(self.periodo[0], float(instantes.min())), max(self.periodo[1], float(instantes.max()))]
+
+    def _actividad(self, servidores, instantes):
+        validos = servidores >= 0
+        servidores, instantes = servidores[validos], instantes[validos]
+        if len(servidores) == 0:
+            return
+        unicos, inversa = np.unique(servidores, return_inverse=True)
+        primeros = np.full(len(unicos), np.inf)
+        ultimos = np.full(len(unicos), -np.inf)
+        np.minimum.at(primeros, inversa, instantes)
+        np.maximum.at(ultimos, inversa, instantes)
+        for servidor, primero, ultimo in zip(unicos.tolist(), primeros.tolist(), ultimos.tolist()):
+            actual = self.actividad.setdefault(servidor, [primero, ultimo])
+            actual[0], actual[1] = min(actual[0], primero), max(actual[1], ultimo)
+
+    def agregar_solicitudes(self, columnas):
+        instantes = columnas["instante"].astype(np.float64)
+        self.filas["solicitudes"] += len(instantes)
+        self._periodo(instantes)
+        self.llegadas.agregar(instantes)
+        self._actividad(columnas["servidor"].astype(np.int64), instantes)
+        if "tiempo_servicio" in columnas:
+            self.servicio["total"].agregar(np.zeros(len(instantes), dtype=np.int8), columnas["tiempo_servicio"])
+            self.servicio["tipo"].agregar(columnas["tipo"], columnas["tiempo_servicio"])
+
+    def agregar_completadas(self, columnas):
+        instantes = columnas["instante"].astype(np.float64)
+        self.filas["completadas"] += len(instantes)
+        self._periodo(instantes)
+        self.completadas.agregar(instantes)
+        servidores = columnas["servidor"].astype(np.int64)
+        self._actividad(servidores, instantes)
+        respuesta = columnas["tiempo_respuesta"]
+        self.respuesta["total"].agregar(np.zeros(len(instantes), dtype=np.int8), respuesta)
+        # Las filas de ficheros anteriores a que la telemetría guardase usuario y tipo no tienen grupo
+        con_tipo = columnas["tipo"] != ""
+        self.respuesta["tipo"].agregar(columnas["tipo"][con_tipo], respuesta[con_tipo])
+        con_usuario = columnas["user_id"] != ""
+        self.respuesta["usuario"].agregar(columnas["user_id"][con_usuario], respuesta[con_usuario])
+        con_servidor = servidores >= 0
+        nombres_servidor = servidores[con_servidor]
+        self.respuesta["servidor"].agregar(nombres_servidor, respuesta[con_servidor])
+        self.espera_cola.agregar(nombres_servidor, columnas["espera_cola"][con_servidor])
+        self.procesamiento.agregar(nombres_servidor, columnas["tiempo_procesamiento"][con_servidor])
+
+    def _rendimiento(self):
+        indices = sorted(self.llegadas.cuentas.keys() | self.completadas.cuentas.keys())
+        if not indices:
+            return {"ventana": self.ventana, "instantes": [], "llegadas": [], "completadas": []}
+        # Serie continua desde la primera ventana: las que no tuvieron eventos cuentan 0
+        todas = range(indices[0], indices[-1] + 1)
+        llegadas = [self.llegadas.cuentas.get(i, 0) for i in todas]
+        completadas = [self.completadas.cuentas.get(i, 0) for i in todas]
+        por_segundo = lambda serie: {"media": sum(serie) / (len(serie) * self.ventana), "max": max(serie) / self.ventana}
+        return {
+            "ventana": self.ventana,
+            "instantes": [i * self.ventana for i in todas],
+            "llegadas": llegadas,
+            "completadas": completadas,
+            "llegadas_por_segundo": por_segundo(llegadas),
+            "completadas_por_segundo": por_segundo(completadas),
+        }
+
+    def _escalado(self):
+        fin = self.periodo[1]
+        eventos = []
+        for servidor, (primero, ultimo) in self.actividad.items():
+            eventos.append((primero, "alta", servidor))
+            if fin - ultimo > self.inactividad:
+                eventos.append((ultimo, "baja", servidor))
+        eventos.sort(key=lambda e: (e[0], e[1] == "alta"))  # A la vez, primero las bajas
+        activos = 0
+        maximo = 0
+        salida = []
+        for instante, evento, servidor in eventos:
+            activos += 1 if evento == "alta" else -1
+            maximo = max(maximo, activos)
+            salida.append({"instante": instante, "evento": evento, "servidor": servidor, "servidores_activos": activos})
+        return {"eventos": salida, "servidores_max": maximo, "inactividad": self.inactividad}
+
+    def informe(self):
+        inicio, fin = self.periodo if self.periodo[0] <= self.periodo[1] else (None, None)
+        return {
+            "filas": dict(self.filas),
+            "periodo": {"inicio": inicio, "fin": fin, "segundos": (fin - inicio) if inicio is not None else 0.0},
+            "latencia": {
+                "respuesta": {
+                    "total": self.respuesta["total"].resumen().get("0"),
+                    "por_tipo": self.respuesta["tipo"].resumen(),
+                    "por_usuario": self.respuesta["usuario"].resumen(),
+                    "por_servidor": self.respuesta["servidor"].resumen(),
+                },
+                "espera_cola": {"por_servidor": self.espera_cola.resumen()},
+                "procesamiento": {"por_servidor": self.procesamiento.resumen()},
+                "servicio": {"total": self.servicio["total"].resumen().get("0"), "por_tipo": self.servicio["tipo"].resumen()},
+            },
+            "rendimiento": self._rendimiento(),
+            "escalado": self._escalado(),
+        }
+
+def analizar_telemetria(directorio, ventana=1.0, inactividad=30.0):
+    """Informe de la telemetría de `directorio`, leída por bloques."""
+    analisis = Analisis(ventana, inactividad)
+    for columnas in telemetria.iterar(directorio, "solicitudes"):
+        analisis.agregar_solicitudes(columnas)
+    for columnas in telemetria.iterar(directorio, "completadas"):
+        analisis.agregar_completadas(columnas)
+    return analisis.informe()
+
+def _columnas_csv(filas, indice):
+    """Columnas de un bloque de filas del CSV de simulación en el formato de la telemetría."""
+    columna = lambda nombre: np.array([fila[indice[nombre]] for fila in filas], dtype=str)
+    numero = lambda nombre: np.array([fila[indice[nombre]] or "nan" for fila in filas], dtype=np.float64)
+    inicio = columna("tiempo_inicio").astype("datetime64[s]").astype(np.int64).astype(np.float64)
+    fin = columna("tiempo_fin").astype("datetime64[s]").astype(np.int64).astype(np.float64)
+    # servidor_asignado era "encolada" en los CSV de los scripts de usuario anteriores a los tickets
+    servidor = np.array([int(v) if v.lstrip("-").isdigit() else -1 for v in columna("servidor_asignado")], dtype=np.int64)
+    user_id, tipo = columna("user_id"), columna("tipo_solicitud")
+    longitud = np.char.str_len(columna("texto_solicitud")).astype(np.uint32)
+    solicitudes = {"instante": inicio, "servidor": servidor, "tipo": tipo}
+    if "espera_cola" in indice:
+        # CSV exportado de la telemetría: tiempos del servidor con resolución completa
+        espera, procesamiento = numero("espera_cola"), numero("tiempo_procesamiento")
+        respuesta = espera + procesamiento
+    else:
+        # CSV antiguo: sólo inicio y fin al segundo
+        espera = procesamiento = np.full(len(filas), np.nan)
+        respuesta = fin - inicio
+    completada = np.isfinite(respuesta)
+    completadas = {"instante": fin[completada], "servidor": servidor[completada], "user_id": user_id[completada],
+                   "tipo": tipo[completada], "longitud": longitud[completada], "tiempo_respuesta": respuesta[completada],
+                   "espera_cola": espera[completada], "tiempo_procesamiento": procesamiento[completada]}
+    return solicitudes, completadas
+
+def bloques_csv(ruta, filas_bloque=FILAS_CSV):
+    """
+    Genera (solicitudes, completadas) por bloques de `filas_bloque` filas de un CSV con el formato de
+    datos_simulacion.csv, con las columnas de las tablas de la telemetría que se pueden obtener de él.
+    """
+    with open(ruta, newline="", encoding="utf-8") as f:
+        lector = csv.reader(f)
+        indice = {nombre: i for i, nombre in enumerate(next(lector))}
+        while True:
+            filas = [fila for _, fila in zip(range(filas_bloque), lector)]
+            if not filas:
+                return
+            yield _columnas_csv(filas, indice)
+
+def analizar_csv(ruta, ventana=1.0, inactividad=30.0, filas_bloque=FILAS_CSV):
+    """Informe de un CSV con el formato de datos_simulacion.csv, leído por bloques de `filas_bloque` filas."""
+    analisis = Analisis(ventana, inactividad)
+    for solicitudes, completadas in bloques_csv(ruta, filas_bloque):
+        analisis.agregar_solicitudes(solicitudes)
+        analisis.agregar_completadas(completadas)
+    return analisis.informe()
+
+# --- Comparación de informes ---
+
+def comparar(base, nuevo, tolerancia=0.1, percentiles=("p50", "p95", "p99")):
+    """
+    Regresiones de `nuevo` frente a `base` (informes JSON): percentiles de latencia de respuesta (total y
+    por tipo) que crecen más de `tolerancia` (relativo) y rendimiento medio que baja más de `tolerancia`.
+    """
+    regresiones = []
+
+    def latencias(grupo, anterior, actual):
+        if not anterior or not actual:
+            return
+        for p in percentiles:
+            if p in anterior and anterior[p] > 0 and actual[p] > anterior[p] * (1 + tolerancia):
+                regresiones.append(f"latencia {grupo} {p}: {anterior[p]:.4f}s -> {actual[p]:.4f}s "
+                                   f"(+{actual[p] / anterior[p] - 1:.0%})")
+
+    respuesta_base, respuesta_nueva = base["latencia"]["respuesta"], nuevo["latencia"]["respuesta"]
+    latencias("total", respuesta_base["total"], respuesta_nueva["total"])
+    for tipo in sorted(respuesta_base["por_tipo"].keys() & respuesta_nueva["por_tipo"].keys()):
+        latencias(f"tipo={tipo}", respuesta_base["por_tipo"][tipo], respuesta_nueva["por_tipo"][tipo])
+    for serie in ("completadas_por_segundo",):
+        anterior = base["rendimiento"].get(serie, {}).get("media")
+        actual = nuevo["rendimiento"].get(serie, {}).get("media")
+        if anterior and actual is not None and actual < anterior * (1 - tolerancia):
+            regresiones.append(f"rendimiento {serie}: {anterior:.2f} -> {actual:.2f} ({actual / anterior - 1:.0%})")
+    return regresiones
+
+# --- Informe HTML ---
+
+def _svg_series(series, ancho=720, alto=220, escalonada=False):
+    """Gráfico de líneas SVG de {nombre: (xs, ys)} sin dependencias; con `escalonada`, en escalones."""
+    colores = ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728")
+    puntos = [(x, y) for xs, ys in series.values() for x, y in zip(xs, ys)]
+    if not puntos:
+        return "<p>Sin datos.</p>"
+    x0, x1 = min(p[0] for p in puntos), max(p[0] for p in puntos)
+    y1 = max(max(p[1] for p in puntos), 1e-12)
+    margen = 40
+    escala_x = lambda x: margen + (x - x0) / ((x1 - x0) or 1) * (ancho - 2 * margen)
+    escala_y = lambda y: alto - margen - y / y1 * (alto - 2 * margen)
+    partes = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{ancho}" height="{alto}" font-size="11">',
+              f'<line x1="{margen}" y1="{alto - margen}" x2="{ancho - margen}" y2="{alto - margen}" stroke="#888"/>',
+              f'<line x1="{margen}" y1="{margen}" x2="{margen}" y2="{alto - margen}" stroke="#888"/>',
+              f'<text x="4" y="{margen}">{y1:.3g}</text>',
+              f'<text x="{margen}" y="{alto - margen + 14}">0 s</text>',
+              f'<text x="{ancho - margen - 40}" y="{alto - margen + 14}">{x1 - x0:.0f} s</text>']
+    for numero, (color, (nombre, (xs, ys))) in enumerate(zip(colores, series.items())):
+        coordenadas = []
+        for i, (x, y) in enumerate(zip(xs, ys)):
+            if escalonada and i:
+                coordenadas.append(f"{escala_x(x):.1f},{escala_y(ys[i - 1]):.1f}")
+            coordenadas.append(f"{escala_x(x):.1f},{escala_y(y):.1f}")
+        partes.append(f'<polyline fill="none" stroke="{color}" stroke-width="1.2" points="{" ".join(coordenadas)}"/>')
+        partes.append(f'<text x="{ancho - margen - 120}" y="{margen + 14 * numero}" fill="{color}">{html.escape(nombre)}</text>')
+    partes.append("</svg>")
+    return "\n".join(partes)
+
+def _tabla(resumen, titulo_grupo):
+    if not resumen:
+        return "<p>Sin datos.</p>"
+    claves = [c for c in next(iter(resumen.values())) if c != "n"]
+    cabecera = "".join(f"<th>{html.escape(c)}</th>" for c in [titulo_grupo, "n", *claves])
+    filas = "".join(
+        "<tr><td>" + html.escape(str(grupo)) + f"</td><td>{valores['n']}</td>"
+        + "".join(f"<td>{valores[c]:.4f}</td>" for c in claves) + "</tr>"
+        for grupo, valores in resumen.items())
+    return f"<table><tr>{cabecera}</tr>{filas}</table>"
+
+def _series_informe(informe):
+    rendimiento = informe["rendimiento"]
+    origen = rendimiento["instantes"][0] if rendimiento["instantes"] else 0.0
+    xs = [x - origen for x in rendimiento["instantes"]]
+    ventana = rendimiento["ventana"]
+    flujo = {"llegadas/s": (xs, [c / ventana for c in rendimiento["llegadas"]]),
+             "completadas/s": (xs, [c / ventana for c in rendimiento["completadas"]])}
+    eventos = informe["escalado"]["eventos"]
+    servidores = {"servidores activos": ([e["instante"] - origen for e in eventos], [e["servidores_activos"] for e in eventos])}
+    return flujo, servidores
+
+def escribir_html(informe, ruta, imagenes=()):
+    flujo, servidores = _series_informe(informe)
+    latencia = informe["latencia"]
+    total = latencia["respuesta"]["total"]
+    secciones = [
+        "<h1>Informe de rendimiento</h1>",
+        f"<p>{informe['filas']['solicitudes']} solicitudes y {informe['filas']['completadas']} completadas "
+        f"en {informe['periodo']['segundos']:.1f} s.</p>",
+        "<h2>Latencia de respuesta (s)</h2>", _tabla({"total": total} if total else {}, "grupo"),
+        "<h3>Por tipo</h3>", _tabla(latencia["respuesta"]["por_tipo"], "tipo"),
+        "<h3>Por servidor</h3>", _tabla(latencia["respuesta"]["por_servidor"], "servidor"),
+        "<h3>Espera en cola por servidor</h3>", _tabla(latencia["espera_cola"]["por_servidor"], "servidor"),
+        "<h3>Procesamiento por servidor</h3>", _tabla(latencia["procesamiento"]["por_servidor"], "servidor"),
+        "<h3>Por usuario</h3>", _tabla(latencia["respuesta"]["por_usuario"], "usuario"),
+        "<h2>Tiempo de servicio HTTP (s)</h2>", _tabla(latencia["servicio"]["por_tipo"], "tipo"),
+        "<h2>Rendimiento</h2>", _svg_series(flujo),
+        "<h2>Escalado</h2>", _svg_series(servidores, escalonada=True),
+        "<table><tr><th>instante</th><th>evento</th><th>servidor</th><th>activos</th></tr>" + "".join(
+            f"<tr><td>{e['instante'] - (informe['periodo']['inicio'] or 0):.3f}</td><td>{e['evento']}</td>"
+            f"<td>{e['servidor']}</td><td>{e['servidores_activos']}</td></tr>" for e in informe["escalado"]["eventos"]) + "</table>",
+        *(f'<p><img src="{html.escape(os.path.basename(imagen))}"></p>' for imagen in imagenes),
+    ]
+    estilo = "body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:2px 6px;text-align:right}"
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Informe</title><style>{estilo}</style></head>"
+                f"<body>{''.join(secciones)}</body></html>")
+
+def escribir_png(informe, ruta):
+    """Gráficos del informe en PNG con matplotlib sin pantalla; devuelve False si matplotlib no está instalado."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+    flujo, servidores = _series_informe(informe)
+    figura, (arriba, abajo) = plt.subplots(2, 1, figsize=(10, 6), sharex=True)
+    for nombre, (xs, ys) in flujo.items():
+        arriba.plot(xs, ys, label=nombre)
+    arriba.set_ylabel("solicitudes/s")
+    arriba.legend()
+    for nombre, (xs, ys) in servidores.items():
+        abajo.step(xs, ys, where="post", label=nombre)
+    abajo.set_ylabel("servidores")
+    abajo.set_xlabel("tiempo (s)")
+    figura.tight_layout()
+    figura.savefig(ruta)
+    plt.close(figura)
+    return True
+
+def escribir_informe(informe, directorio):
+    """Escribe informe.json, informe.html y (con matplotlib) rendimiento.png en `directorio`."""
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, "informe.json"), "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=1)
+    imagen = os.path.join(directorio, "rendimiento.png")
+    imagenes = [imagen] if escribir_png(informe, imagen) else []
+    escribir_html(informe, os.path.join(directorio, "informe.html"), imagenes)
+
+def main():
+    parser = argparse.ArgumentParser(description="Analítica de la telemetría o de un CSV de simulación")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    informe = subcomandos.add_parser("informe", help="Genera el informe JSON y HTML")
+    origen = informe.add_mutually_exclusive_group()
+    origen.add_argument("--telemetria", default="telemetria", help="Directorio de telemetría (por defecto)")
+    origen.add_argument("--csv", help="CSV con el formato de datos_simulacion.csv")
+    informe.add_argument("--salida", default="informe")
+    informe.add_argument("--ventana", type=float, default=1.0, help="Segundos por punto de la serie de rendimiento")
+    informe.add_argument("--inactividad", type=float, default=30.0,
+                         help="Segundos sin actividad antes del final para dar un servidor por retirado")
+    comparacion = subcomandos.add_parser("comparar", help="Compara dos informe.json y sale con 1 si hay regresiones")
+    comparacion.add_argument("base")
+    comparacion.add_argument("nuevo")
+    comparacion.add_argument("--tolerancia", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.comando == "informe":
+        if args.csv:
+            resultado = analizar_csv(args.csv, args.ventana, args.inactividad)
+        else:
+            resultado = analizar_telemetria(args.telemetria, args.ventana, args.inactividad)
+        escribir_informe(resultado, args.salida)
+        total = resultado["latencia"]["respuesta"]["total"] or {}
+        print(f"{resultado['filas']['solicitudes']} solicitudes, {resultado['filas']['completadas']} completadas; "
+              + ", ".join(f"{p}={total[p]:.4f}s" for p in ("p50", "p95", "p99") if p in total)
+              + f". Informe en {args.salida}/")
+    else:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.nuevo, encoding="utf-8") as f:
+            nuevo = json.load(f)
+        regresiones = comparar(base, nuevo, args.tolerancia)
+        for regresion in regresiones:
+            print(regresion)
+        print(f"{len(regresiones)} regresiones (tolerancia {args.tolerancia:.0%})")
+        sys.exit(1 if regresiones else 0)
+
+if __name__ == "__main__":
+    main()
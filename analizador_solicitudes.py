@@ -1,17 +1,129 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+# Palabras clave de cada tipo de solicitud. Cada una se busca como palabra completa en el texto ya normalizado
+# y puede tener varias palabras ("big data"); las que terminan en "*" son raíces y reconocen también las
+# palabras que empiezan por ellas ("depura*" reconoce "depurar" y "depuración").
+RUTA_PALABRAS_CLAVE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "palabras_clave.json")
+
+# Marcas diacríticas combinables que quedan separadas de su letra al descomponer en NFD
+MARCAS_DIACRITICAS = re.compile("[\u0300-\u036f]")
+
+def normalizar(texto):
+    """Minúsculas y sin tildes ni diéresis ("Análisis" -> "analisis", "ñ" -> "n")."""
+    texto = texto.lower()
+    if texto.isascii():
+        return texto
+    return MARCAS_DIACRITICAS.sub("", unicodedata.normalize("NFD", texto))
+
+def patron_trie(palabras):
+    """
+    Expresión regular que reconoce cualquiera de `palabras` con sus prefijos comunes factorizados (un trie):
+    en cada posición del texto se sigue una sola rama por carácter, así que el coste no crece con el número
+    de palabras como con la alternancia "a|b|c". Con varias posibles se queda con la más larga.
+    """
+    trie = {}
+    for palabra in palabras:
+        nodo = trie
+        for caracter in palabra:
+            nodo = nodo.setdefault(caracter, {})
+        nodo[""] = {}  # Fin de palabra
+
+    def construir(nodo):
+        ramas = [re.escape(caracter) + construir(hijo) for caracter, hijo in sorted(nodo.items()) if caracter]
+        if not ramas:
+            return ""
+        cuerpo = ramas[0] if len(ramas) == 1 else "(?:" + "|".join(ramas) + ")"
+        return f"(?:{cuerpo})?" if "" in nodo else cuerpo
+
+    return construir(trie)
+
+def cargar_palabras_clave(ruta=RUTA_PALABRAS_CLAVE):
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
 class AnalizadorSolicitudes:
+    """
+    Clasifica cada solicitud por las palabras clave de cada tipo (palabras_clave.json o las que se pasen,
+    como diccionario o ruta) con una única pasada sobre el texto normalizado. Si aparecen palabras de varios
+    tipos gana el primero de "prioridad"; sin ninguna, el tipo es "tipo_por_defecto".
+    """
+    # Caracteres que suelen indicar un fragmento de código en el texto
+    SIMBOLOS_CODIGO = re.compile(r"[(){}\[\];=<>]")
+
+    def __init__(self, palabras_clave=RUTA_PALABRAS_CLAVE):
+        if not isinstance(palabras_clave, dict):
+            palabras_clave = cargar_palabras_clave(palabras_clave)
+        self.tipo_por_defecto = palabras_clave.get("tipo_por_defecto", "simple")
+        tipos = palabras_clave["tipos"]
+        # Los tipos que no aparecen en "prioridad" van detrás, en el orden del fichero
+        orden = list(palabras_clave.get("prioridad", []))
+        orden += [tipo for tipo in tipos if tipo not in orden]
+        self.prioridad = {tipo: i for i, tipo in enumerate(orden)}
+        # {palabra normalizada: tipo}, las raíces con su "*"; una palabra repetida se queda con el tipo prioritario
+        self.tipo_de = {}
+        for tipo in sorted(tipos, key=self.prioridad.get, reverse=True):
+            for palabra in tipos[tipo]:
+                self.tipo_de[normalizar(palabra)] = tipo
+        palabras = [palabra for palabra in self.tipo_de if not palabra.endswith("*")]
+        raices = [palabra[:-1] for palabra in self.tipo_de if palabra.endswith("*")]
+        # Una coincidencia deja el texto en el grupo "palabra" (hasta el final de una palabra) o en "raiz"
+        alternativas = []
+        if palabras:
+            alternativas.append(f"(?P<palabra>{patron_trie(palabras)})\\b")
+        if raices:
+            alternativas.append(f"(?P<raiz>{patron_trie(raices)})")
+        self.patron = re.compile(r"\b(?:" + "|".join(alternativas) + ")") if alternativas else None
+        # Identifica la configuración del análisis; forma parte de las claves de contenido (ver clave)
+        configuracion = json.dumps([self.tipo_por_defecto, orden, self.tipo_de], sort_keys=True)
+        self.huella = hashlib.blake2b(configuracion.encode("utf-8"), digest_size=16).digest()
+
     def analizar(self, texto_solicitud):
         """
-        Analiza la solicitud y extrae características básicas.
+        Analiza la solicitud y extrae características: longitud, tipo, número de palabras,
+        de palabras clave encontradas y de símbolos propios de código.
         """
-        longitud = len(texto_solicitud)
-        tipo = "simple"  # Valor por defecto
-
-        if "código" in texto_solicitud.lower() or "ejecutar" in texto_solicitud.lower():
-            tipo = "codigo"
-        elif "análisis" in texto_solicitud.lower() or "predicción" in texto_solicitud.lower():
-            tipo = "compleja"
+        normalizado = normalizar(texto_solicitud)
+        tipo = self.tipo_por_defecto
+        coincidencias = 0
+        if self.patron is not None:
+            mejor = len(self.prioridad)
+            for coincidencia in self.patron.finditer(normalizado):
+                coincidencias += 1
+                palabra = coincidencia.group()
+                candidato = self.tipo_de[palabra if coincidencia.lastgroup == "palabra" else palabra + "*"]
+                if self.prioridad[candidato] < mejor:
+                    tipo, mejor = candidato, self.prioridad[candidato]
 
         return {
-            "longitud": longitud,
-            "tipo": tipo
-        }
\ No newline at end of file
+            "longitud": len(texto_solicitud),
+            "tipo": tipo,
+            "palabras": len(normalizado.split()),
+            "palabras_clave": coincidencias,
+            "simbolos_codigo": len(self.SIMBOLOS_CODIGO.findall(texto_solicitud))
+        }
+
+    def clave(self, texto_solicitud):
+        """
+        Clave de contenido del texto (16 bytes): el análisis sólo depende del texto normalizado y de la
+        longitud del original, así que los textos con la misma clave tienen las mismas características con
+        este analizador (y con cualquiera con las mismas palabras clave).
+        """
+        contenido = f"{len(texto_solicitud)}:{normalizar(texto_solicitud)}".encode("utf-8", "surrogatepass")
+        return hashlib.blake2b(contenido, digest_size=16, key=self.huella).digest()
+
+    def analizar_muchos(self, textos):
+        """
+        Analiza una lista de solicitudes; los textos repetidos se analizan una sola vez.
+        """
+        analizados = {}
+        resultado = []
+        for texto in textos:
+            caracteristicas = analizados.get(texto)
+            if caracteristicas is None:
+                caracteristicas = analizados[texto] = self.analizar(texto)
+            resultado.append(dict(caracteristicas))
+        return resultado
@@ -1,52 +1,29 @@
-from flask import Flask, request, jsonify
-from gestor_usuarios import GestorUsuarios
-from analizador_solicitudes import AnalizadorSolicitudes
-from asignador_recursos import AsignadorRecursos, DemandPredictor
-import numpy as np
 import time
-import tensorflow as tf
-
-# Forzar la habilitación de eager execution
-tf.config.run_functions_eagerly(True)
-
-print("Eager execution is enabled:", tf.executing_eagerly())
-
+_inicio_arranque = time.perf_counter()
+import json
+import logging
+from flask import Flask, Response, request, jsonify, stream_with_context
+from metricas import ERRORES, METRICAS, SOLICITUDES_NO_VALIDAS, TIPO_CONTENIDO
+from planificador import SolicitudRechazada, cabeceras_rechazo
+from registro import configurar_registro
+from servicio import (Servicio, SolicitudNoValida, TAMANO_BLOQUE_LOTE, bloques, codificar_ndjson, decodificar_ndjson,
+                      resultados_error)
 
 app = Flask(__name__)
-
-# Instanciar los componentes
-gestor_usuarios = GestorUsuarios()
-analizador_solicitudes = AnalizadorSolicitudes()
-demand_predictor = DemandPredictor()
-
-# Datos de entrenamiento de ejemplo (puedes agregar más o usar un archivo CSV)
-training_data = [
-    ({"longitud": len("Consulta general"), "tipo": "simple"}, 1),
-    ({"longitud": len("Análisis de datos y predicciones"), "tipo": "compleja"}, 3),
-    ({"longitud": len("Ejecución de código Python"), "tipo": "codigo"}, 5),
-    ({"longitud": len("Otra consulta simple"), "tipo": "simple"}, 1),
-    ({"longitud": len("Solicitud compleja de análisis"), "tipo": "compleja"}, 4),
-    ({"longitud": len("Otro ejemplo de código"), "tipo": "codigo"}, 6)  # Nuevo dato
-]
-
-# Preparar los datos para el entrenamiento
-X_train = []
-y_train = []
-for features, demand in training_data:
-    feature_vector = [
-        features["longitud"],
-        1 if features["tipo"] == "simple" else 0,
-        1 if features["tipo"] == "compleja" else 0,
-        1 if features["tipo"] == "codigo" else 0
-    ]
-    X_train.append(feature_vector)
-    y_train.append(demand)
-
-# Entrenar el modelo de predicción de demanda
-demand_predictor.train(X_train, y_train, epochs=100) #aumentamos las epochs
-
-# Crear la instancia del asignador de recursos
-asignador_recursos = AsignadorRecursos(num_servidores_inicial=1, demand_predictor=demand_predictor)
+configurar_registro()
+log = logging.getLogger(__name__)
+
+# Instanciar los componentes (ver servicio.py; la configuración se lee de las variables de entorno)
+_importaciones = time.perf_counter() - _inicio_arranque
+servicio = Servicio()
+tiempos_arranque = {"importaciones": _importaciones, **servicio.tiempos_arranque}
+tiempos_arranque["total"] += _importaciones
+servicio.tiempos_arranque = tiempos_arranque
+gestor_usuarios = servicio.gestor_usuarios
+analizador_solicitudes = servicio.analizador_solicitudes
+demand_predictor = servicio.demand_predictor
+asignador_recursos = servicio.asignador_recursos
+log.info("Tiempos de arranque: %s", ", ".join(f"{fase}={segundos:.3f}s" for fase, segundos in tiempos_arranque.items()))
 
 @app.route('/solicitud', methods=['POST'])
 def procesar_solicitud():
@@ -57,54 +34,100 @@ def procesar_solicitud():
         data = request.get_json()
 
         # Validar la entrada
-        if not data or 'user_id' not in data or 'texto' not in data:
-            return jsonify({'error': 'Datos de solicitud no válidos'}), 400
-
-        user_id = data['user_id']
-        texto_solicitud = data['texto']
-
-        # Analizar la solicitud
-        caracteristicas = analizador_solicitudes.analizar(texto_solicitud)
-
-        # Registrar la solicitud en el historial del usuario
-        gestor_usuarios.registrar_solicitud(user_id, caracteristicas)
-
-        # Obtener el perfil del usuario
-        perfil = gestor_usuarios.obtener_perfil(user_id)
-
-        # Asignar la solicitud a un servidor
-        inicio = time.time()
-        servidor_id = asignador_recursos.asignar(user_id, caracteristicas)
-        fin = time.time()
-
-        # Registrar tiempo de asignación
-        tiempo_asignacion = fin - inicio
-
-        # Actualizar el perfil del usuario basado en su historial
-        gestor_usuarios.actualizar_perfil(user_id)
+        try:
+            user_id, texto_solicitud = Servicio.validar(data)
+        except SolicitudNoValida as e:
+            SOLICITUDES_NO_VALIDAS.inc()
+            return jsonify({'error': str(e)}), 400
+
+        # Analizar la solicitud (o tomar el análisis y la demanda de la caché de textos)
+        caracteristicas, demanda = servicio.consultar(texto_solicitud)
+
+        # Registrar, encolar y actualizar el perfil del usuario. json.dumps directamente: jsonify cuesta
+        # más que el resto de la solicitud cuando el texto está en la caché
+        respuesta = servicio.procesar(user_id, caracteristicas, demanda, texto=texto_solicitud)
+        return Response(json.dumps(respuesta, ensure_ascii=False), 200, mimetype='application/json')
+
+    except SolicitudRechazada as e:
+        # Límite del usuario (429) o servicio saturado (503)
+        return jsonify(e.cuerpo()), e.codigo, cabeceras_rechazo(e)
+
+    except Exception:
+        ERRORES.etiquetas('/solicitud').inc()
+        log.exception("Error al procesar la solicitud")
+        return jsonify({'error': 'Error interno del servidor'}), 500
 
-        return jsonify({
-            'mensaje': 'Solicitud procesada correctamente',
-            'user_id': user_id,
-            'perfil': perfil,
-            'servidor_asignado': servidor_id,
-            'caracteristicas': caracteristicas,
-            'tiempo_asignacion': tiempo_asignacion
-        }), 200
+@app.route('/solicitudes', methods=['POST'])
+def procesar_solicitudes():
+    """
+    Recibe muchas solicitudes en una sola petición, como array JSON o como NDJSON (una por línea),
+    y devuelve en NDJSON un resultado por solicitud a medida que se procesa cada bloque.
+    """
+    if 'ndjson' in (request.mimetype or ''):
+        bloques_datos = _bloques_ndjson(request.stream)
+    else:
+        datos = request.get_json(silent=True)
+        if not isinstance(datos, list):
+            return jsonify({'error': 'Se esperaba un array JSON o NDJSON'}), 400
+        bloques_datos = bloques(datos)
+
+    def generar():
+        indice = 0
+        for bloque in bloques_datos:
+            try:
+                resultados = servicio.procesar_lote(bloque, indice)
+            except Exception:
+                ERRORES.etiquetas('/solicitudes').inc()
+                log.exception("Error al procesar un bloque de /solicitudes")
+                resultados = resultados_error(bloque, indice)
+            yield codificar_ndjson(resultados)
+            indice += len(bloque)
+
+    return Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+
+def _bloques_ndjson(flujo):
+    lineas = []
+    for linea in flujo:
+        lineas.append(linea)
+        if len(lineas) == TAMANO_BLOQUE_LOTE:
+            yield decodificar_ndjson(lineas)
+            lineas = []
+    if lineas:
+        yield decodificar_ndjson(lineas)
+
+@app.route('/resultado/<int:ticket>', methods=['GET'])
+def obtener_resultado(ticket):
+    """
+    Consulta el estado de una solicitud encolada. Devuelve 202 mientras se procesa, 200 al completarse y
+    503 si se desalojó de la cola por saturación.
+    """
+    cuerpo, codigo = servicio.resultado(ticket)
+    return jsonify(cuerpo), codigo
 
-    except Exception as e:
-        print(f"Error al procesar la solicitud: {e}")
-        return jsonify({'error': 'Error interno del servidor'}), 500
+@app.route('/estado_servidores', methods=['GET'])
+def estado_servidores():
+    """
+    Devuelve la utilización y el trabajo pendiente de cada servidor, y los tiempos de arranque.
+    """
+    return jsonify(servicio.estado_servidores()), 200
 
 # Nueva ruta para actualizar todos los perfiles
 @app.route('/actualizar_perfiles', methods=['POST'])
 def actualizar_perfiles():
     try:
-        gestor_usuarios.actualizar_perfiles()
+        servicio.actualizar_perfiles()
         return jsonify({'mensaje': 'Perfiles de usuario actualizados correctamente'}), 200
-    except Exception as e:
-        print(f"Error al actualizar perfiles: {e}")
+    except Exception:
+        ERRORES.etiquetas('/actualizar_perfiles').inc()
+        log.exception("Error al actualizar perfiles")
         return jsonify({'error': 'Error interno del servidor al actualizar perfiles'}), 500
 
+@app.route('/metrics', methods=['GET'])
+def metricas():
+    """
+    Métricas del servicio en el formato de texto de Prometheus (ver metricas.py).
+    """
+    return Response(METRICAS.exposicion(), content_type=TIPO_CONTENIDO)
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
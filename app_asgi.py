@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from asincrono import AgrupadorAsincrono, SolicitudesEnBloque
+from metricas import ERRORES, METRICAS, SOLICITUDES_NO_VALIDAS, TIPO_CONTENIDO
+from planificador import SolicitudRechazada, cabeceras_rechazo
+from registro import configurar_registro
+from servicio import Servicio, SolicitudNoValida
+
+# Variante ASGI de app.py con los mismos contratos HTTP. Se sirve con
+#   uvicorn app_asgi:app --port 8000
+# El bucle de eventos sólo analiza el texto y serializa respuestas: las predicciones se agrupan en lotes
+# que se evalúan en un hilo aparte y los cambios de estado (perfiles, historial, encolado) se aplican,
+# también en lotes, en un único hilo, de modo que los locks por usuario de GestorUsuarios nunca compiten.
+configurar_registro()
+log = logging.getLogger(__name__)
+servicio = Servicio()
+log.info("Tiempos de arranque: %s", ", ".join(f"{fase}={segundos:.3f}s" for fase, segundos in servicio.tiempos_arranque.items()))
+
+# Un hilo para el modelo y otro para el estado: la predicción de un lote se solapa con el registro del anterior
+ejecutor_prediccion = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prediccion")
+ejecutor_estado = ThreadPoolExecutor(max_workers=1, thread_name_prefix="estado")
+
+def _predecir_lote(lista_caracteristicas):
+    return [float(d) for d in servicio.predecir_lote(lista_caracteristicas)]
+
+def _procesar_lote(lote):
+    resultados = []
+    for user_id, caracteristicas, demanda, texto in lote:
+        try:
+            resultados.append(servicio.procesar(user_id, caracteristicas, demanda, texto))
+        except Exception as e:
+            resultados.append(e)
+    return resultados
+
+predicciones = AgrupadorAsincrono(_predecir_lote, ejecutor_prediccion)
+actualizaciones = AgrupadorAsincrono(_procesar_lote, ejecutor_estado)
+
+async def procesar_solicitud(request):
+    """
+    Recibe una solicitud de usuario, la analiza, asigna un perfil y la enruta a un servidor.
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    try:
+        user_id, texto_solicitud = Servicio.validar(data)
+    except SolicitudNoValida as e:
+        SOLICITUDES_NO_VALIDAS.inc()
+        return JSONResponse({'error': str(e)}, status_code=400)
+    try:
+        # Un texto que está en la caché de textos con la demanda del modelo vigente no pasa por el lote de predicción
+        caracteristicas, demanda = servicio.consultar(texto_solicitud)
+        if demanda is None:
+            version = servicio.demand_predictor.version
+            demanda = await predicciones.enviar(caracteristicas)
+            servicio.recordar(texto_solicitud, caracteristicas, demanda, version)
+        respuesta = await actualizaciones.enviar((user_id, caracteristicas, demanda, texto_solicitud))
+        return JSONResponse(respuesta)
+    except SolicitudRechazada as e:
+        return JSONResponse(e.cuerpo(), status_code=e.codigo, headers=cabeceras_rechazo(e))
+    except Exception:
+        ERRORES.etiquetas('/solicitud').inc()
+        log.exception("Error al procesar la solicitud")
+        return JSONResponse({'error': 'Error interno del servidor'}, status_code=500)
+
+async def _procesar_bloque(bloque, primer_indice):
+    return await asyncio.get_running_loop().run_in_executor(ejecutor_estado, servicio.procesar_lote, bloque, primer_indice)
+
+async def obtener_resultado(request):
+    """
+    Consulta el estado de una solicitud encolada. Devuelve 202 mientras se procesa, 200 al completarse y
+    503 si se desalojó de la cola por saturación.
+    """
+    cuerpo, codigo = servicio.resultado(request.path_params['ticket'])
+    return JSONResponse(cuerpo, status_code=codigo)
+
+async def estado_servidores(request):
+    """
+    Devuelve la utilización y el trabajo pendiente de cada servidor, y los tiempos de arranque.
+    """
+    return JSONResponse(servicio.estado_servidores())
+
+async def actualizar_perfiles(request):
+    try:
+        await asyncio.get_running_loop().run_in_executor(ejecutor_estado, servicio.actualizar_perfiles)
+        return JSONResponse({'mensaje': 'Perfiles de usuario actualizados correctamente'})
+    except Exception:
+        ERRORES.etiquetas('/actualizar_perfiles').inc()
+        log.exception("Error al actualizar perfiles")
+        return JSONResponse({'error': 'Error interno del servidor al actualizar perfiles'}, status_code=500)
+
+async def metricas(request):
+    """
+    Métricas del servicio en el formato de texto de Prometheus (ver metricas.py).
+    """
+    return Response(METRICAS.exposicion(), headers={'content-type': TIPO_CONTENIDO})
+
+@asynccontextmanager
+async def ciclo_vida(app):
+    predicciones.iniciar()
+    actualizaciones.iniciar()
+    yield
+    await predicciones.detener()
+    await actualizaciones.detener()
+
+app = Starlette(routes=[
+    Route('/solicitud', procesar_solicitud, methods=['POST']),
+    Route('/solicitudes', SolicitudesEnBloque(_procesar_bloque), methods=['POST']),
+    Route('/resultado/{ticket:int}', obtener_resultado, methods=['GET']),
+    Route('/estado_servidores', estado_servidores, methods=['GET']),
+    Route('/actualizar_perfiles', actualizar_perfiles, methods=['POST']),
+    Route('/metrics', metricas, methods=['GET']),
+], lifespan=ciclo_vida)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=int(os.environ.get("PUERTO", "8000")), access_log=False)
@@ -0,0 +1,110 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from asincrono import AgrupadorAsincrono, SolicitudesEnBloque
+from cluster import Cluster
+from metricas import ERRORES, SOLICITUDES_NO_VALIDAS, TIPO_CONTENIDO
+from planificador import cabeceras_rechazo, rechazo_desde_cuerpo
+from registro import configurar_registro
+from servicio import Servicio, SolicitudNoValida
+
+# Frontal ASGI del cluster (ver cluster.py) con los mismos contratos HTTP que app.py y app_asgi.py:
+#   NUM_NODOS=4 uvicorn app_cluster:app --port 8000
+# El frontal sólo interpreta el HTTP y enruta: cada solicitud va al nodo dueño de su user_id, y las que
+# llegan a la vez para un mismo nodo se le envían juntas en un único mensaje. NUM_NODOS (por defecto,
+# uno por núcleo) y ESTADO_CLUSTER ("proceso" o "local") configuran el cluster.
+configurar_registro()
+log = logging.getLogger(__name__)
+cluster = Cluster(int(os.environ.get("NUM_NODOS", "0")) or None, os.environ.get("ESTADO_CLUSTER", "proceso"))
+log.info("Tiempos de arranque: %s", ", ".join(f"{fase}={segundos:.3f}s" for fase, segundos in cluster.tiempos_arranque.items()))
+
+# Un hilo por nodo para esperar sus respuestas sin bloquear el bucle de eventos
+ejecutores = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"nodo{i}") for i in range(cluster.num_nodos)]
+agrupadores = [AgrupadorAsincrono(functools.partial(cluster.procesar_nodo, i), ejecutores[i]) for i in range(cluster.num_nodos)]
+
+async def procesar_solicitud(request):
+    """
+    Recibe una solicitud de usuario y la envía al nodo de su usuario, que la analiza, asigna un perfil y la enruta a un servidor.
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    try:
+        user_id, _ = Servicio.validar(data)
+    except SolicitudNoValida as e:
+        SOLICITUDES_NO_VALIDAS.inc()
+        return JSONResponse({'error': str(e)}, status_code=400)
+    try:
+        resultado = await agrupadores[cluster.nodo(user_id)].enviar(data)
+        del resultado['indice']
+        if 'codigo' in resultado:
+            # El nodo no la ha admitido: límite del usuario (429) o servicio saturado (503)
+            rechazo = rechazo_desde_cuerpo(resultado)
+            return JSONResponse(rechazo.cuerpo(), status_code=rechazo.codigo, headers=cabeceras_rechazo(rechazo))
+        return JSONResponse({'mensaje': 'Solicitud procesada correctamente', **resultado})
+    except Exception:
+        ERRORES.etiquetas('/solicitud').inc()
+        log.exception("Error al procesar la solicitud")
+        return JSONResponse({'error': 'Error interno del servidor'}, status_code=500)
+
+async def _procesar_bloque(bloque, primer_indice):
+    return await asyncio.get_running_loop().run_in_executor(None, cluster.procesar_lote, bloque, primer_indice)
+
+async def obtener_resultado(request):
+    """
+    Consulta el estado de una solicitud encolada. Devuelve 202 mientras se procesa, 200 al completarse y
+    503 si se desalojó de la cola por saturación.
+    """
+    cuerpo, codigo = await asyncio.get_running_loop().run_in_executor(None, cluster.resultado, request.path_params['ticket'])
+    return JSONResponse(cuerpo, status_code=codigo)
+
+async def estado_servidores(request):
+    """
+    Devuelve la utilización y el trabajo pendiente de cada servidor, el número de nodos y los tiempos de arranque.
+    """
+    return JSONResponse(await asyncio.get_running_loop().run_in_executor(None, cluster.estado_servidores))
+
+async def actualizar_perfiles(request):
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, cluster.actualizar_perfiles)
+        return JSONResponse({'mensaje': 'Perfiles de usuario actualizados correctamente'})
+    except Exception:
+        ERRORES.etiquetas('/actualizar_perfiles').inc()
+        log.exception("Error al actualizar perfiles")
+        return JSONResponse({'error': 'Error interno del servidor al actualizar perfiles'}, status_code=500)
+
+async def metricas(request):
+    """
+    Métricas del frontal, de cada nodo y del pool en el formato de texto de Prometheus, con la etiqueta origen.
+    """
+    texto = await asyncio.get_running_loop().run_in_executor(None, cluster.metricas)
+    return Response(texto, headers={'content-type': TIPO_CONTENIDO})
+
+@asynccontextmanager
+async def ciclo_vida(app):
+    for agrupador in agrupadores:
+        agrupador.iniciar()
+    yield
+    for agrupador in agrupadores:
+        await agrupador.detener()
+    cluster.cerrar()
+
+app = Starlette(routes=[
+    Route('/solicitud', procesar_solicitud, methods=['POST']),
+    Route('/solicitudes', SolicitudesEnBloque(_procesar_bloque), methods=['POST']),
+    Route('/resultado/{ticket:int}', obtener_resultado, methods=['GET']),
+    Route('/estado_servidores', estado_servidores, methods=['GET']),
+    Route('/actualizar_perfiles', actualizar_perfiles, methods=['POST']),
+    Route('/metrics', metricas, methods=['GET']),
+], lifespan=ciclo_vida)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=int(os.environ.get("PUERTO", "8000")), access_log=False)
@@ -0,0 +1,215 @@
+import logging
+import math
+import threading
+import time
+import numpy as np
+from asignador_recursos import ACTIVACIONES, DemandPredictor, MotorInferenciaNumpy, demanda_observada
+from metricas import ACTUALIZACIONES_MODELO
+
+log = logging.getLogger(__name__)
+
+# Aprendizaje en línea del modelo de demanda: los servidores informan del coste observado de cada solicitud
+# completada, que se acumula en un búfer acotado ya pasado a unidades de demanda, las que predice el modelo
+# (ver asignador_recursos.SEGUNDOS_POR_UNIDAD). Cada `intervalo` segundos un hilo en segundo plano ajusta
+# con lo recibido una copia del motor que está sirviendo (el MLP en NumPy, sin TensorFlow) y, si mejora al
+# vigente con las observaciones reservadas para validar, la pone a servir con DemandPredictor.sustituir_motor.
+# Si con el tráfico siguiente predice peor que el motor al que sustituyó, se vuelve a este.
+# Las predicciones nunca esperan al ajuste: leen el motor vigente, que sólo cambia por asignación.
+
+_ACEPTADAS = ACTUALIZACIONES_MODELO.etiquetas("aceptada")
+_RECHAZADAS = ACTUALIZACIONES_MODELO.etiquetas("rechazada")
+_REVERTIDAS = ACTUALIZACIONES_MODELO.etiquetas("revertida")
+
+# Derivada de cada activación expresada en función de su salida
+DERIVADAS = {
+    "relu": lambda salida: (salida > 0).astype(np.float32),
+    "linear": lambda salida: 1.0,
+    "sigmoid": lambda salida: salida * (1.0 - salida),
+    "tanh": lambda salida: 1.0 - salida * salida,
+}
+
+def error_cuadratico(motor, X, y):
+    """Error cuadrático medio de las predicciones del motor (la pérdida con la que se entrena el modelo)."""
+    return float(np.mean((motor.predecir(X) - y) ** 2))
+
+def ajustar_motor(motor, X, y, epochs=3, tamano_lote=64, tasa_aprendizaje=1e-3, pausa=0.0005, semilla=0):
+    """
+    Devuelve un motor nuevo con los pesos de `motor` ajustados a (X, y) por descenso de gradiente con Adam
+    sobre el error cuadrático; `motor` no se modifica (sus pesos pueden ser vistas de solo lectura del
+    artefacto). Entre lote y lote se duerme `pausa` segundos para ceder el intérprete a las peticiones.
+    """
+    capas = [(np.array(pesos, dtype=np.float32), np.array(sesgo, dtype=np.float32), activacion)
+             for pesos, sesgo, activacion in motor.capas]
+    parametros = [parametro for pesos, sesgo, _ in capas for parametro in (pesos, sesgo)]
+    momentos = [np.zeros_like(p) for p in parametros]
+    varianzas = [np.zeros_like(p) for p in parametros]
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-7
+    rng = np.random.default_rng(semilla)
+    paso = 0
+    for _ in range(epochs):
+        orden = rng.permutation(len(y))
+        for inicio in range(0, len(y), tamano_lote):
+            lote = orden[inicio:inicio + tamano_lote]
+            salidas = [X[lote]]
+            for pesos, sesgo, activacion in capas:
+                salidas.append(ACTIVACIONES[activacion](salidas[-1] @ pesos + sesgo))
+            # Retropropagación desde la derivada del error cuadrático medio
+            delta = 2.0 * (salidas[-1] - y[lote, None]) / len(lote)
+            gradientes = []
+            for indice in range(len(capas) - 1, -1, -1):
+                pesos, _, activacion = capas[indice]
+                delta = delta * DERIVADAS[activacion](salidas[indice + 1])
+                gradientes[:0] = [salidas[indice].T @ delta, delta.sum(axis=0)]
+                delta = delta @ pesos.T
+            paso += 1
+            tasa = tasa_aprendizaje * math.sqrt(1 - beta2 ** paso) / (1 - beta1 ** paso)
+            for parametro, gradiente, momento, varianza in zip(parametros, gradientes, momentos, varianzas):
+                momento *= beta1
+                momento += (1 - beta1) * gradiente
+                varianza *= beta2
+                varianza += (1 - beta2) * gradiente * gradiente
+                parametro -= tasa * momento / (np.sqrt(varianza) + epsilon)
+            if pausa:
+                time.sleep(pausa)
+    return MotorInferenciaNumpy(capas)
+
+class ObservacionesOnline:
+    """Búfer circular con las últimas `capacidad` observaciones (vector de características, coste)."""
+    def __init__(self, capacidad=65536):
+        self.capacidad = capacidad
+        self.X = np.zeros((capacidad, len(DemandPredictor.TIPOS) + 1), dtype=np.float32)
+        self.y = np.zeros(capacidad, dtype=np.float32)
+        self.total = 0  # Observaciones recibidas desde el principio
+        self._lock = threading.Lock()
+
+    def observar(self, caracteristicas, coste):
+        vector = DemandPredictor.vector_caracteristicas(caracteristicas)
+        with self._lock:
+            posicion = self.total % self.capacidad
+            self.X[posicion] = vector
+            self.y[posicion] = coste
+            self.total += 1
+
+    def desde(self, total):
+        """
+        Copia de las observaciones recibidas después de las `total` primeras (como mucho las `capacidad`
+        últimas) y el total actual, para pedir las siguientes.
+        """
+        with self._lock:
+            n = min(self.total - total, self.capacidad)
+            posiciones = np.arange(self.total - n, self.total) % self.capacidad
+            return self.X[posiciones], self.y[posiciones], self.total
+
+class AprendizajeOnline:
+    """
+    Ajusta periódicamente en segundo plano el motor de `demand_predictor` con el coste observado. Un ajuste
+    necesita al menos `min_observaciones` nuevas; una de cada `1 / fraccion_validacion` se reserva para
+    validar y el candidato sólo se pone a servir si su error no supera al del vigente. Tras sustituirlo, el
+    siguiente ciclo compara los dos motores con el tráfico nuevo y vuelve al anterior si el error del nuevo
+    es más de un `margen_reversion` mayor.
+    """
+    def __init__(self, demand_predictor, intervalo=60.0, min_observaciones=256, capacidad=65536, epochs=3,
+                 tamano_lote=64, tasa_aprendizaje=1e-3, fraccion_validacion=0.2, margen_reversion=0.1, pausa=0.0005):
+        self.demand_predictor = demand_predictor
+        self.intervalo = intervalo
+        self.min_observaciones = min_observaciones
+        self.observaciones = ObservacionesOnline(capacidad)
+        self.epochs = epochs
+        self.tamano_lote = tamano_lote
+        self.tasa_aprendizaje = tasa_aprendizaje
+        self.cada = max(2, round(1 / fraccion_validacion))
+        self.margen_reversion = margen_reversion
+        self.pausa = pausa
+        self.anterior = None  # Motor sustituido en el último ajuste, mientras no se haya confirmado el nuevo
+        self.ultimo = None  # Resultado del último ciclo que hizo algo
+        self.cuentas = {"aceptada": 0, "rechazada": 0, "revertida": 0}
+        self._vistas = 0  # Observaciones ya usadas
+        self._ciclos = 0
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def observar(self, caracteristicas, coste):
+        """
+        Registra el coste observado de una solicitud ({"longitud", "tipo"}), en segundos de servidor; no
+        bloquea al ajuste.
+        """
+        self.observaciones.observar(caracteristicas, demanda_observada(coste))
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+
+    def _bucle(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.ciclo()
+            except Exception:
+                log.exception("Error en el ajuste en línea del modelo")
+
+    def ciclo(self):
+        """
+        Confirma o revierte el último ajuste y hace uno nuevo con las observaciones recibidas desde el
+        ciclo anterior. Devuelve "aceptada", "rechazada", "revertida" o None si no había bastantes.
+        """
+        X, y, total = self.observaciones.desde(self._vistas)
+        if len(y) < self.min_observaciones:
+            return None
+        self._vistas = total
+        self._ciclos += 1
+        vigente = self.demand_predictor.motor
+
+        if self.anterior is not None:
+            # Observaciones que el motor nuevo no ha visto: debe predecirlas al menos como el que sustituyó
+            anterior, self.anterior = self.anterior, None
+            error_vigente, error_anterior = error_cuadratico(vigente, X, y), error_cuadratico(anterior, X, y)
+            if not error_vigente <= error_anterior * (1 + self.margen_reversion):
+                self.demand_predictor.sustituir_motor(anterior)
+                log.warning("Ajuste en línea revertido: error %.5f con el tráfico nuevo frente a %.5f del modelo anterior",
+                            error_vigente, error_anterior)
+                return self._resultado("revertida", _REVERTIDAS, len(y), error_vigente, error_anterior)
+
+        validacion = (np.arange(len(y)) % self.cada) == 0
+        inicio = time.perf_counter()
+        candidato = ajustar_motor(vigente, X[~validacion], y[~validacion], self.epochs, self.tamano_lote,
+                                  self.tasa_aprendizaje, self.pausa, semilla=self._ciclos)
+        segundos = time.perf_counter() - inicio
+        error_candidato = error_cuadratico(candidato, X[validacion], y[validacion])
+        error_vigente = error_cuadratico(vigente, X[validacion], y[validacion])
+        if not error_candidato <= error_vigente:
+            log.info("Ajuste en línea rechazado: error de validación %.5f frente a %.5f del vigente",
+                     error_candidato, error_vigente)
+            return self._resultado("rechazada", _RECHAZADAS, len(y), error_candidato, error_vigente, segundos)
+        self.anterior = vigente
+        self.demand_predictor.sustituir_motor(candidato)
+        log.info("Modelo ajustado en línea con %d observaciones en %.2f s: error de validación %.5f (antes %.5f)",
+                 len(y), segundos, error_candidato, error_vigente)
+        return self._resultado("aceptada", _ACEPTADAS, len(y), error_candidato, error_vigente, segundos)
+
+    def _resultado(self, resultado, contador, observaciones, error, error_referencia, segundos=0.0):
+        contador.inc()
+        self.cuentas[resultado] += 1
+        self.ultimo = {"resultado": resultado, "observaciones": observaciones, "error": error,
+                       "error_referencia": error_referencia, "segundos_ajuste": round(segundos, 3),
+                       "instante": time.time()}
+        return resultado
+
+    def estado(self):
+        """Resumen para /estado_servidores: observaciones recibidas, ajustes por resultado y el último ciclo."""
+        return {"observaciones": self.observaciones.total, "ajustes": dict(self.cuentas), "ultimo": self.ultimo}
+
+def crear_aprendizaje(especificacion, demand_predictor):
+    """
+    APRENDIZAJE_ONLINE: segundos entre ajustes del modelo con el coste observado (p. ej. "60"); vacío o "0"
+    lo desactiva. Devuelve el AprendizajeOnline ya en marcha o None.
+    """
+    intervalo = float(especificacion or 0)
+    if intervalo <= 0:
+        return None
+    log.info("Aprendizaje en línea del modelo cada %.0f s", intervalo)
+    return AprendizajeOnline(demand_predictor, intervalo).iniciar()
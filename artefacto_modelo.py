@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import time
+
+# Se incrementa cuando cambia la arquitectura o el formato de entrada del modelo
+VERSION_ARTEFACTO = 1
+
+def ruta_metadatos(model_path):
+    """Fichero de metadatos que acompaña al artefacto del modelo."""
+    return model_path + ".meta.json"
+
+def ruta_pesos(model_path):
+    """Búfer float32 con los pesos exportados para servir sin TensorFlow."""
+    return os.path.splitext(model_path)[0] + ".pesos.npy"
+
+def ruta_disposicion(ruta_pesos):
+    """JSON con la disposición de las capas dentro del búfer de pesos."""
+    return os.path.splitext(ruta_pesos)[0] + ".json"
+
+def ruta_checkpoint(model_path):
+    """Pesos del mejor epoch hasta el momento durante un entrenamiento largo (para reanudarlo)."""
+    return os.path.splitext(model_path)[0] + ".checkpoint.weights.h5"
+
+def huella_fichero(ruta):
+    """SHA-256 del contenido de un fichero."""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+def huella_datos(X, y, **configuracion):
+    """SHA-256 de los datos y la configuración de entrenamiento."""
+    contenido = json.dumps({"X": [list(map(float, fila)) for fila in X], "y": list(map(float, y)),
+                            "configuracion": configuracion}, sort_keys=True)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+def huella_ficheros(rutas, **configuracion):
+    """
+    SHA-256 de un conjunto de ficheros de datos por nombre, tamaño y fecha de modificación (sin leerlos,
+    que pueden ser muy grandes) y de la configuración de entrenamiento.
+    """
+    ficheros = []
+    for ruta in sorted(rutas):
+        estado = os.stat(ruta)
+        ficheros.append([os.path.basename(ruta), estado.st_size, estado.st_mtime_ns])
+    contenido = json.dumps({"ficheros": ficheros, "configuracion": configuracion}, sort_keys=True)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+def escribir_metadatos(model_path, huella, **extra):
+    """Guarda los metadatos del artefacto recién entrenado junto al modelo."""
+    metadatos = {
+        "version": VERSION_ARTEFACTO,
+        "huella_modelo": huella_fichero(model_path),
+        "huella_datos": huella,
+        "creado": time.strftime('%Y-%m-%d %H:%M:%S'),
+        **extra
+    }
+    ruta = ruta_metadatos(model_path)
+    with open(ruta + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(metadatos, f, indent=2)
+    os.replace(ruta + ".tmp", ruta)
+    return metadatos
+
+def leer_metadatos(model_path):
+    try:
+        with open(ruta_metadatos(model_path), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def artefacto_vigente(model_path, huella=None):
+    """
+    Indica si el modelo guardado está al día: existe, su contenido coincide con los metadatos,
+    la versión es la actual y, si se indica, se entrenó con los datos de esa huella.
+    """
+    metadatos = leer_metadatos(model_path)
+    if metadatos is None or not os.path.exists(model_path):
+        return False
+    if metadatos.get("version") != VERSION_ARTEFACTO or metadatos.get("huella_modelo") != huella_fichero(model_path):
+        return False
+    return huella is None or metadatos.get("huella_datos") == huella
@@ -1,23 +1,259 @@
+import hashlib
+import heapq
+import itertools
+import math
 import queue
+import threading
 import time
 import random
+from collections import OrderedDict
+from concurrencia import ContadorAtomico, ListaCopiaEnEscritura, TablaRayada
+from concurrent.futures import Future
+import json
+import logging
 import numpy as np
-from tensorflow import keras
-from sklearn.model_selection import train_test_split
 import os
-import tensorflow as tf
+from artefacto_modelo import huella_fichero, ruta_disposicion, ruta_pesos
+from metricas import COMPLETADAS, ESCALADOS, LATENCIA_ETAPA, SOLICITUDES_RECHAZADAS
+from planificador import ColaPlanificada, Planificador, ServicioSaturado
+from politicas_escalado import CAPACIDAD_SERVIDOR, PoliticaEscalado, crear_politica
+
+log = logging.getLogger(__name__)
+
+_LATENCIA_ESPERA_COLA = LATENCIA_ETAPA.etiquetas("espera_cola")
+_LATENCIA_PROCESAMIENTO = LATENCIA_ETAPA.etiquetas("procesamiento")
+_ESCALADOS_ARRIBA = ESCALADOS.etiquetas("arriba")
+_ESCALADOS_ABAJO = ESCALADOS.etiquetas("abajo")
+_SATURADO = SOLICITUDES_RECHAZADAS.etiquetas("saturado")
+_DESALOJADAS = SOLICITUDES_RECHAZADAS.etiquetas("desalojada")
+
+# Activaciones soportadas por el motor de inferencia NumPy
+ACTIVACIONES = {
+    "relu": lambda x: np.maximum(x, 0.0),
+    "linear": lambda x: x,
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "tanh": np.tanh,
+}
+
+class MotorInferenciaNumpy:
+    """Pase hacia delante del MLP con multiplicaciones de matrices NumPy, sin pasar por Keras."""
+    def __init__(self, capas):
+        self.capas = capas  # [(pesos, sesgo, activacion)]
+
+    @classmethod
+    def desde_modelo_keras(cls, model):
+        """Extrae una sola vez los pesos de las capas Dense del modelo cargado."""
+        capas = []
+        for capa in model.layers:
+            pesos = capa.get_weights()
+            if not pesos:
+                continue
+            activacion = capa.get_config().get("activation", "linear")
+            if activacion not in ACTIVACIONES:
+                raise ValueError(f"Activación no soportada por el motor NumPy: {activacion}")
+            capas.append((
+                np.ascontiguousarray(pesos[0], dtype=np.float32),
+                np.ascontiguousarray(pesos[1], dtype=np.float32),
+                activacion
+            ))
+        return cls(capas)
+
+    def guardar(self, ruta, **metadatos):
+        """
+        Exporta los pesos a un único búfer float32 (.npy) más un JSON con la disposición de las capas.
+        El búfer se puede abrir con mmap y compartir entre procesos sin copiarlo.
+        """
+        disposicion = []
+        partes = []
+        desplazamiento = 0
+        for pesos, sesgo, activacion in self.capas:
+            disposicion.append({"desplazamiento": desplazamiento, "entrada": pesos.shape[0],
+                                "salida": pesos.shape[1], "activacion": activacion})
+            partes += [pesos.ravel(), sesgo.ravel()]
+            desplazamiento += pesos.size + sesgo.size
+        np.save(ruta, np.concatenate(partes).astype(np.float32))
+        with open(ruta_disposicion(ruta), 'w', encoding='utf-8') as f:
+            json.dump({"capas": disposicion, **metadatos}, f, indent=2)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Abre un búfer exportado con guardar() en modo mmap de solo lectura; las capas son vistas sobre él."""
+        buffer = np.load(ruta, mmap_mode='r')
+        with open(ruta_disposicion(ruta), encoding='utf-8') as f:
+            disposicion = json.load(f)
+        capas = []
+        for capa in disposicion["capas"]:
+            inicio, entrada, salida = capa["desplazamiento"], capa["entrada"], capa["salida"]
+            pesos = buffer[inicio:inicio + entrada * salida].reshape(entrada, salida)
+            sesgo = buffer[inicio + entrada * salida:inicio + entrada * salida + salida]
+            capas.append((pesos, sesgo, capa["activacion"]))
+        return cls(capas)
+
+    def huella(self):
+        """Entero de 63 bits que identifica los pesos: el mismo en todos los procesos que cargan el mismo artefacto."""
+        h = hashlib.blake2b(digest_size=8)
+        for pesos, sesgo, activacion in self.capas:
+            h.update(np.ascontiguousarray(pesos, dtype=np.float32).tobytes())
+            h.update(np.ascontiguousarray(sesgo, dtype=np.float32).tobytes())
+            h.update(activacion.encode("ascii"))
+        return int.from_bytes(h.digest(), "little") >> 1
+
+    def predecir(self, X):
+        """Devuelve la predicción para cada fila de X como un vector 1-D."""
+        salida = np.asarray(X, dtype=np.float32)
+        for pesos, sesgo, activacion in self.capas:
+            salida = ACTIVACIONES[activacion](salida @ pesos + sesgo)
+        return salida[:, 0]
+
+class AgrupadorMicroLotes:
+    """Agrupa predicciones concurrentes durante una ventana corta y las puntúa en una sola llamada."""
+    def __init__(self, funcion_lote, ventana=0.002, max_filas=64):
+        self.funcion_lote = funcion_lote
+        self.ventana = ventana
+        self.max_filas = max_filas
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def enviar(self, vector):
+        """Encola un vector de características y espera a que su lote sea evaluado."""
+        futuro = Future()
+        self._cola.put((vector, futuro))
+        return futuro.result()
+
+    def _bucle(self):
+        while True:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + self.ventana
+            while len(lote) < self.max_filas:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            try:
+                resultados = self.funcion_lote(np.array([vector for vector, _ in lote], dtype=np.float32))
+            except Exception as e:
+                for _, futuro in lote:
+                    futuro.set_exception(e)
+                continue
+            for (_, futuro), resultado in zip(lote, resultados):
+                futuro.set_result(float(resultado))
+
+class CachePredicciones:
+    """Caché LRU acotada, con caducidad opcional, de predicciones indexadas por vector de características."""
+    def __init__(self, capacidad=1024, ttl=None):
+        self.capacidad = capacidad
+        self.ttl = ttl  # Segundos de validez de cada entrada, None para no caducar
+        self._entradas = OrderedDict()  # {clave: (prediccion, instante)}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        # Cambia en cada invalidación; una predicción calculada antes no se guarda después (ver guardar)
+        self.generacion = 0
+
+    def obtener(self, clave):
+        """Devuelve la predicción guardada o None si no está o ha caducado."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and self.ttl is not None and time.monotonic() - entrada[1] > self.ttl:
+                del self._entradas[clave]
+                self.desalojos += 1
+                entrada = None
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[0]
+
+    def guardar(self, clave, prediccion, generacion=None):
+        """
+        Guarda una predicción desalojando la menos usada si se supera la capacidad. Con `generacion` (la
+        que tenía la caché al empezar a calcularla) se descarta si entretanto se ha sustituido el modelo.
+        """
+        if self.capacidad <= 0:
+            return
+        with self._lock:
+            if generacion is not None and generacion != self.generacion:
+                return
+            self._entradas[clave] = (prediccion, time.monotonic())
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar(self):
+        """Vacía la caché, por ejemplo tras reentrenar el modelo."""
+        with self._lock:
+            self._entradas.clear()
+            self.generacion += 1
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "desalojos": self.desalojos
+            }
 
 class DemandPredictor:
-    def __init__(self, model_path="demand_predictor_model.h5"):
+    TIPOS = ("simple", "compleja", "codigo")
+
+    def __init__(self, model_path="demand_predictor_model.h5", micro_lotes=False, ventana_lote=0.002, max_filas_lote=64,
+                 cache_capacidad=1024, cache_ttl=None, precalcular_longitudes=None, backend="auto"):
         self.model_path = model_path
-        self.model = self.cargar_o_crear_modelo()
-        self.trained = os.path.exists(self.model_path)
+        # backend "numpy" sirve desde los pesos exportados sin importar TensorFlow; "keras" carga el .h5;
+        # "auto" usa los pesos exportados si existen y corresponden al .h5 actual
+        if backend == "auto":
+            backend = "numpy" if self.pesos_vigentes() else "keras"
+        self.backend = backend
+        if backend == "numpy":
+            self.model = None
+            self.motor = MotorInferenciaNumpy.cargar(ruta_pesos(model_path))
+            self.trained = True
+            log.info("Pesos del modelo cargados desde el artefacto NumPy.")
+        else:
+            self.model = self.cargar_o_crear_modelo()
+            self.trained = os.path.exists(self.model_path)
+            self.motor = MotorInferenciaNumpy.desde_modelo_keras(self.model)
+        # Con micro_lotes las peticiones concurrentes se puntúan juntas en un único pase
+        self.agrupador = AgrupadorMicroLotes(self.motor_predecir, ventana_lote, max_filas_lote) if micro_lotes else None
+        self.cache = CachePredicciones(cache_capacidad, cache_ttl)
+        # Versión de las predicciones (ver cache_textos.py): la huella del motor, o 0 sin entrenar (predicción 1.0)
+        self.version = self.motor.huella() if self.trained else 0
+        self.precalculo = None  # Rango de longitudes de la tabla precalculada, que se rehace al sustituir el motor
+        if precalcular_longitudes is not None:
+            self.precalcular(*precalcular_longitudes)
+
+    def pesos_vigentes(self):
+        """Indica si existen pesos exportados y se generaron a partir del .h5 actual (si lo hay)."""
+        ruta = ruta_pesos(self.model_path)
+        if not os.path.exists(ruta) or not os.path.exists(ruta_disposicion(ruta)):
+            return False
+        if not os.path.exists(self.model_path):
+            return True
+        with open(ruta_disposicion(ruta), encoding='utf-8') as f:
+            return json.load(f).get("huella_origen") == huella_fichero(self.model_path)
+
+    def exportar_pesos(self):
+        """Guarda los pesos del modelo Keras como artefacto NumPy para servir sin TensorFlow."""
+        ruta = ruta_pesos(self.model_path)
+        self.motor.guardar(ruta, huella_origen=huella_fichero(self.model_path))
+        log.info("Pesos exportados en %s", ruta)
+        return ruta
 
     def cargar_o_crear_modelo(self):
         """Carga el modelo desde el archivo si existe, de lo contrario crea uno nuevo."""
+        # TensorFlow se importa aquí y no al importar el módulo, para no pagar su coste si no se usa
+        from tensorflow import keras
         if os.path.exists(self.model_path):
             model = keras.models.load_model(self.model_path)
-            print("Modelo cargado desde el archivo.")
+            log.info("Modelo cargado desde el archivo.")
             # Volver a compilar el modelo después de cargarlo
             model.compile(optimizer='adam', loss=keras.losses.MeanSquaredError())
             self.trained = True
@@ -26,6 +262,7 @@ class DemandPredictor:
             return self.crear_modelo()
 
     def crear_modelo(self):
+        from tensorflow import keras
         model = keras.Sequential([
             keras.layers.Dense(128, activation='relu', input_shape=(4,)),
             keras.layers.Dense(64, activation='relu'),
@@ -36,6 +273,10 @@ class DemandPredictor:
 
     def train(self, X, y, epochs=100, validation_split=0.2):
         """Entrena el modelo de red neuronal."""
+        if self.model is None:
+            raise RuntimeError("El backend NumPy sólo sirve predicciones; entrena con backend='keras'")
+        import tensorflow as tf
+        from sklearn.model_selection import train_test_split
         X = np.array(X)
         y = np.array(y)
 
@@ -47,116 +288,648 @@ class DemandPredictor:
         val_dataset = tf.data.Dataset.from_tensor_slices((X_val, y_val)).batch(32)
 
         self.model.fit(train_dataset, epochs=epochs, validation_data=val_dataset)
-        self.trained = True
-        print("Modelo entrenado.")
+        self._guardar_entrenado()
+
+    def train_dataset(self, entrenamiento, validacion=None, epochs=100, callbacks=()):
+        """
+        Entrena con tf.data.Dataset ya agrupados en lotes de (vectores, demanda), p. ej. los que lee
+        datos_entrenamiento.py de la telemetría sin cargarla en memoria. Devuelve el historial de Keras.
+        """
+        if self.model is None:
+            raise RuntimeError("El backend NumPy sólo sirve predicciones; entrena con backend='keras'")
+        historial = self.model.fit(entrenamiento, validation_data=validacion, epochs=epochs, callbacks=list(callbacks), verbose=2)
+        self._guardar_entrenado()
+        return historial
+
+    def _guardar_entrenado(self):
+        # Las predicciones siguen saliendo del motor anterior hasta que el nuevo está completo
+        motor = MotorInferenciaNumpy.desde_modelo_keras(self.model)
+        log.info("Modelo entrenado.")
 
         # Guardar el modelo entrenado
         self.model.save(self.model_path)
-        print(f"Modelo guardado en {self.model_path}")
+        log.info("Modelo guardado en %s", self.model_path)
+        self.sustituir_motor(motor)
 
-    def predict(self, features):
-        """Predice la demanda de recursos para una solicitud."""
-        if not self.trained:
-            print("Advertencia: El modelo no ha sido entrenado. Se devuelve una predicción por defecto.")
-            return 1.0
-        feature_vector = [
+    def sustituir_motor(self, motor):
+        """
+        Pone a servir otro motor de inferencia (p. ej. el ajustado por aprendizaje_online.py). El cambio es
+        una sola asignación: cada predicción en curso usa entero el motor anterior o el nuevo, sin esperas.
+        Las predicciones cacheadas del anterior se descartan y la tabla precalculada se rehace.
+        """
+        self.motor = motor
+        self.trained = True
+        # Después del motor: una predicción del anterior nunca queda con la versión del nuevo
+        self.version = motor.huella()
+        # Las predicciones anteriores corresponden al modelo sustituido
+        self.cache.invalidar()
+        if self.precalculo is not None:
+            self.precalcular(*self.precalculo)
+
+    @staticmethod
+    def vector_caracteristicas(features):
+        """Convierte las características de una solicitud en el vector de entrada del modelo."""
+        return [
             features["longitud"],
             1 if features["tipo"] == "simple" else 0,
             1 if features["tipo"] == "compleja" else 0,
             1 if features["tipo"] == "codigo" else 0
         ]
-        predicted_demand = self.model.predict(np.array([feature_vector]))[0][0]
+
+    @classmethod
+    def matriz_caracteristicas(cls, longitudes, tipos):
+        """Vectores de entrada de muchas solicitudes a la vez (arrays de longitudes y de tipos), en float32."""
+        tipos = np.asarray(tipos)
+        return np.column_stack([np.asarray(longitudes, dtype=np.float32)] +
+                               [(tipos == tipo).astype(np.float32) for tipo in cls.TIPOS])
+
+    def motor_predecir(self, X):
+        """Evalúa un lote de vectores con el motor NumPy vigente."""
+        return self.motor.predecir(X)
+
+    def predict(self, features):
+        """Predice la demanda de recursos para una solicitud."""
+        if not self.trained:
+            log.warning("El modelo no ha sido entrenado. Se devuelve una predicción por defecto.")
+            return 1.0
+        feature_vector = self.vector_caracteristicas(features)
+        clave = tuple(feature_vector)
+        predicted_demand = self.cache.obtener(clave)
+        if predicted_demand is not None:
+            return predicted_demand
+        generacion = self.cache.generacion
+        if self.agrupador is not None:
+            predicted_demand = self.agrupador.enviar(feature_vector)
+        else:
+            predicted_demand = float(self.motor_predecir(np.array([feature_vector], dtype=np.float32))[0])
+        self.cache.guardar(clave, predicted_demand, generacion)
         return predicted_demand
 
+    def predict_lote(self, lista_features):
+        """Predice la demanda de varias solicitudes; sólo los vectores no cacheados llegan al motor."""
+        if not self.trained:
+            return np.ones(len(lista_features), dtype=np.float32)
+        resultado = np.empty(len(lista_features), dtype=np.float32)
+        pendientes = {}  # {clave: [posiciones]}
+        for i, features in enumerate(lista_features):
+            clave = tuple(self.vector_caracteristicas(features))
+            prediccion = self.cache.obtener(clave)
+            if prediccion is None:
+                pendientes.setdefault(clave, []).append(i)
+            else:
+                resultado[i] = prediccion
+        if pendientes:
+            claves = list(pendientes)
+            generacion = self.cache.generacion
+            predicciones = self.motor_predecir(np.array(claves, dtype=np.float32))
+            for clave, prediccion in zip(claves, predicciones):
+                self.cache.guardar(clave, float(prediccion), generacion)
+                resultado[pendientes[clave]] = prediccion
+        return resultado
+
+    def precalcular(self, longitud_min, longitud_max):
+        """Rellena la caché con la tabla completa de predicciones para un rango de longitudes."""
+        claves = [tuple(self.vector_caracteristicas({"longitud": longitud, "tipo": tipo}))
+                  for longitud in range(longitud_min, longitud_max + 1) for tipo in self.TIPOS]
+        self.cache.capacidad = max(self.cache.capacidad, len(claves))
+        self.precalculo = (longitud_min, longitud_max)
+        if not self.trained:
+            return
+        generacion = self.cache.generacion
+        predicciones = self.motor_predecir(np.array(claves, dtype=np.float32))
+        for clave, prediccion in zip(claves, predicciones):
+            self.cache.guardar(clave, float(prediccion), generacion)
+
+    def comprobar_equivalencia(self, X, tolerancia=1e-4):
+        """Compara el motor NumPy con model.predict de Keras y devuelve la diferencia máxima."""
+        if self.model is None:
+            raise RuntimeError("La comparación con Keras requiere backend='keras'")
+        X = np.asarray(X, dtype=np.float32)
+        esperado = self.model.predict(X, verbose=0)[:, 0]
+        diferencia = float(np.max(np.abs(self.motor_predecir(X) - esperado)))
+        if diferencia > tolerancia:
+            raise AssertionError(f"El motor NumPy difiere de Keras en {diferencia:.2e} (tolerancia {tolerancia:.0e})")
+        return diferencia
+
+# Segundos de procesamiento simulado por carácter de la solicitud
+COSTE_POR_CARACTER = 0.01
+
+def coste_procesamiento(caracteristicas):
+    """Tiempo que tarda un servidor simulado en procesar una solicitud."""
+    return caracteristicas["longitud"] * COSTE_POR_CARACTER
+
+# Unidad de la demanda predicha: la del modelo entrenado con los datos de ejemplo (1 una consulta simple,
+# 5 un bloque de código), en la que están la capacidad de un servidor de las políticas de escalado y la
+# prioridad y el envejecimiento de las colas (planificador.py). Una unidad son SEGUNDOS_POR_UNIDAD segundos
+# de servidor; el coste observado, en segundos, se pasa a esta unidad antes de entrenar con él.
+SEGUNDOS_POR_UNIDAD = 1 / CAPACIDAD_SERVIDOR
+
+def demanda_observada(segundos):
+    """Unidades de demanda de una solicitud que ha ocupado el servidor `segundos` segundos."""
+    return segundos / SEGUNDOS_POR_UNIDAD
+
+# Ciclo de vida de un servidor: arrancando -> listo -> drenando -> detenido
+ESTADO_ARRANCANDO = "arrancando"
+ESTADO_LISTO = "listo"
+ESTADO_DRENANDO = "drenando"
+ESTADO_DETENIDO = "detenido"
+
 class ServidorSimulado:
-    def __init__(self, id):
+    def __init__(self, id, al_completar=None, tiempo_arranque=5, escala_tiempo=1.0):
         self.id = id
-        self.carga = 0
-        self.arrancando = True  # Atributo para simular el arranque
-        self.tiempo_arranque = 5
-        print(f"Servidor {self.id}: Iniciando...")
+        # carga y trabajo_pendiente se modifican desde los hilos que asignan y desde el hilo de trabajo
+        self._carga = ContadorAtomico(0)
+        self._trabajo_pendiente = ContadorAtomico(0.0)  # Demanda predicha de las solicitudes encoladas o en curso
+        self.escala_tiempo = escala_tiempo  # Multiplica el tiempo de procesamiento simulado (0 en las pruebas de estrés)
+        self.estado = ESTADO_ARRANCANDO
+        self.tiempo_arranque = tiempo_arranque
+        self.cola = ColaPlanificada()  # Solicitudes asignadas pendientes de procesar, por prioridad (ver planificador.py)
+        self._lock_cola = threading.Lock()  # Ordena encolar frente a detener para no encolar tras la marca de parada
+        self.al_completar = al_completar  # Llamada con (ticket, resultado) al terminar cada solicitud
+        self.listo = threading.Event()
+        self.peso = 1  # Peso relativo para el reparto round-robin ponderado
+        self.atendidas = 0
+        self.tiempo_ocupado = 0.0
+        self.instante_listo = None
+        log.info("Servidor %s: Iniciando...", self.id)
+        # El arranque se simula en el propio hilo de trabajo para no bloquear a quien crea el servidor
+        self.hilo = threading.Thread(target=self._bucle_trabajo, daemon=True)
+        self.hilo.start()
+
+    @property
+    def carga(self):
+        return self._carga.valor
+
+    @property
+    def trabajo_pendiente(self):
+        return self._trabajo_pendiente.valor
+
+    @property
+    def arrancando(self):
+        return self.estado == ESTADO_ARRANCANDO
+
+    def esperar_listo(self, timeout=None):
+        """Bloquea hasta que el servidor termina de arrancar."""
+        return self.listo.wait(timeout)
+
+    def encolar(self, ticket, caracteristicas, timestamp, demanda=0.0, clave=None):
+        """
+        Añade una solicitud a la cola del servidor con la clave de prioridad `clave` (por defecto, el orden
+        de llegada) y suma su coste estimado a la carga. Devuelve False sin encolarla si el servidor ya se
+        está deteniendo.
+        """
+        with self._lock_cola:
+            if self.estado in (ESTADO_DRENANDO, ESTADO_DETENIDO):
+                return False
+            self._carga.sumar(coste_procesamiento(caracteristicas))
+            self._trabajo_pendiente.sumar(demanda)
+            self.cola.put((ticket, caracteristicas, timestamp, demanda), timestamp if clave is None else clave)
+            return True
+
+    def desalojar(self, clave):
+        """Saca de la cola la solicitud de peor prioridad si es peor que `clave` y la devuelve (o None)."""
+        elemento = self.cola.desalojar_peor(clave)
+        if elemento is not None:
+            _, caracteristicas, _, demanda = elemento
+            self._carga.sumar(-coste_procesamiento(caracteristicas))
+            self._trabajo_pendiente.sumar(-demanda)
+        return elemento
+
+    def utilizacion(self):
+        """Fracción del tiempo desde que está listo que el servidor ha pasado procesando."""
+        if self.instante_listo is None:
+            return 0.0
+        transcurrido = time.time() - self.instante_listo
+        return min(1.0, self.tiempo_ocupado / transcurrido) if transcurrido > 0 else 0.0
+
+    def detener(self):
+        """Pasa el servidor a drenando; el hilo de trabajo termina en cuanto vacíe su cola."""
+        with self._lock_cola:
+            self.estado = ESTADO_DRENANDO
+            # La marca de parada no se puede desalojar: un servidor con la cola llena también se detiene
+            self.cola.put(None, math.inf, desalojable=False)
+
+    def _bucle_trabajo(self):
         time.sleep(self.tiempo_arranque)
-        self.arrancando = False
-        print(f"Servidor {self.id}: Listo para procesar solicitudes.")
+        if self.estado == ESTADO_ARRANCANDO:
+            self.estado = ESTADO_LISTO
+        self.instante_listo = time.time()
+        self.listo.set()
+        log.info("Servidor %s: Listo para procesar solicitudes.", self.id)
+        while True:
+            elemento = self.cola.get()
+            if elemento is None:
+                self.cola.task_done()
+                self.estado = ESTADO_DETENIDO
+                log.info("Servidor %s: Detenido.", self.id)
+                break
+            ticket, caracteristicas, timestamp, demanda = elemento
+            resultado = self.procesar_solicitud(caracteristicas, timestamp)
+            self._trabajo_pendiente.sumar(-demanda)
+            self.atendidas += 1
+            if resultado is not None:
+                self.tiempo_ocupado += resultado["tiempo_procesamiento"]
+                resultado["demanda_predicha"] = demanda
+            if self.al_completar is not None:
+                self.al_completar(ticket, resultado)
+            self.cola.task_done()
 
     def procesar_solicitud(self, caracteristicas, timestamp):
         """Simula el procesamiento de una solicitud."""
         if self.arrancando:
-            print(f"Servidor {self.id}: No se puede procesar la solicitud, el servidor está arrancando.")
+            log.warning("Servidor %s: No se puede procesar la solicitud, el servidor está arrancando.", self.id)
             return
-        print(f"Servidor {self.id}: Procesando solicitud. Características: {caracteristicas}")
-        tiempo_procesamiento = caracteristicas["longitud"] * 0.01
-        self.carga += tiempo_procesamiento
-        time.sleep(tiempo_procesamiento)
-        self.carga -= tiempo_procesamiento
+        log.debug("Servidor %s: Procesando solicitud. Características: %s", self.id, caracteristicas)
+        tiempo_procesamiento = coste_procesamiento(caracteristicas)
+        inicio = time.time()
+        time.sleep(tiempo_procesamiento * self.escala_tiempo)
+        carga = self._carga.sumar(-tiempo_procesamiento)
         tiempo_respuesta = time.time() - timestamp
-        print(f"Servidor {self.id}: Solicitud completada. Tiempo de respuesta: {tiempo_respuesta:.4f} segundos. Carga actual: {self.carga:.2f}")
+        log.debug("Servidor %s: Solicitud completada. Tiempo de respuesta: %.4f segundos. Carga actual: %.2f", self.id, tiempo_respuesta, carga)
+        return {
+            "servidor": self.id,
+            "espera_cola": inicio - timestamp,
+            "tiempo_procesamiento": tiempo_procesamiento,
+            "tiempo_respuesta": tiempo_respuesta
+        }
+
+class EstrategiaBalanceo:
+    """Elige a qué servidor listo se envía cada solicitud."""
+    def elegir(self, servidores, demanda):
+        raise NotImplementedError
+
+    def asignado(self, servidor, demanda):
+        """Se llama tras encolar una solicitud en el servidor elegido."""
+
+    def completado(self, servidor, demanda):
+        """Se llama cuando el servidor termina una solicitud."""
+
+class EstrategiaMenorCarga(EstrategiaBalanceo):
+    """Comportamiento original: el servidor con menor carga estimada."""
+    def elegir(self, servidores, demanda):
+        return min(servidores, key=lambda s: s.carga)
+
+class EstrategiaMenorTrabajoPendiente(EstrategiaBalanceo):
+    """
+    El servidor con menos demanda predicha pendiente, mantenido en un montículo.
+    Las entradas obsoletas se descartan al extraerlas (invalidación perezosa por versión).
+    """
+    def __init__(self):
+        self.monticulo = []  # (trabajo_pendiente, version, id, servidor)
+        self.versiones = {}  # {id: version vigente}
+        self.contador = itertools.count()
+        self.lock = threading.Lock()
+
+    def _actualizar(self, servidor):
+        version = next(self.contador)
+        self.versiones[servidor.id] = version
+        heapq.heappush(self.monticulo, (servidor.trabajo_pendiente, version, servidor.id, servidor))
+
+    def elegir(self, servidores, demanda):
+        candidatos = {s.id for s in servidores}
+        with self.lock:
+            for servidor in servidores:
+                if servidor.id not in self.versiones:
+                    self._actualizar(servidor)
+            apartados = []
+            elegido = None
+            while self.monticulo:
+                entrada = self.monticulo[0]
+                if self.versiones.get(entrada[2]) != entrada[1]:
+                    heapq.heappop(self.monticulo)
+                elif entrada[2] not in candidatos:
+                    # Sigue siendo válida pero el servidor no está disponible ahora
+                    apartados.append(heapq.heappop(self.monticulo))
+                else:
+                    elegido = entrada[3]
+                    break
+            for entrada in apartados:
+                heapq.heappush(self.monticulo, entrada)
+            if elegido is None:
+                return min(servidores, key=lambda s: s.trabajo_pendiente)
+            return elegido
+
+    def asignado(self, servidor, demanda):
+        with self.lock:
+            self._actualizar(servidor)
+
+    def completado(self, servidor, demanda):
+        with self.lock:
+            self._actualizar(servidor)
+
+class EstrategiaDosOpciones(EstrategiaBalanceo):
+    """Power of two choices: dos servidores al azar y se queda el de menos trabajo pendiente."""
+    def elegir(self, servidores, demanda):
+        if len(servidores) < 2:
+            return servidores[0]
+        a, b = random.sample(servidores, 2)
+        return a if a.trabajo_pendiente <= b.trabajo_pendiente else b
+
+class EstrategiaColaMasCorta(EstrategiaBalanceo):
+    """Join-shortest-queue: el servidor con menos solicitudes en cola."""
+    def elegir(self, servidores, demanda):
+        return min(servidores, key=lambda s: s.cola.qsize())
+
+class EstrategiaRoundRobinPonderado(EstrategiaBalanceo):
+    """Round-robin ponderado suave: cada servidor recibe solicitudes en proporción a su peso."""
+    def __init__(self):
+        self.actual = {}  # {id: peso efectivo acumulado}
+        self.lock = threading.Lock()
+
+    def elegir(self, servidores, demanda):
+        with self.lock:
+            total = 0
+            elegido = None
+            for servidor in servidores:
+                self.actual[servidor.id] = self.actual.get(servidor.id, 0) + servidor.peso
+                total += servidor.peso
+                if elegido is None or self.actual[servidor.id] > self.actual[elegido.id]:
+                    elegido = servidor
+            self.actual[elegido.id] -= total
+            return elegido
+
+ESTRATEGIAS = {
+    "menor_carga": EstrategiaMenorCarga,
+    "menor_trabajo": EstrategiaMenorTrabajoPendiente,
+    "dos_opciones": EstrategiaDosOpciones,
+    "cola_mas_corta": EstrategiaColaMasCorta,
+    "round_robin": EstrategiaRoundRobinPonderado,
+}
+
+def crear_estrategia(nombre):
+    """Instancia una estrategia de balanceo por su nombre en ESTRATEGIAS."""
+    if nombre not in ESTRATEGIAS:
+        raise ValueError(f"Estrategia de balanceo desconocida: {nombre}. Opciones: {', '.join(ESTRATEGIAS)}")
+    return ESTRATEGIAS[nombre]()
 
 class AsignadorRecursos:
-    def __init__(self, num_servidores_inicial, demand_predictor):
+    def __init__(self, num_servidores_inicial, demand_predictor, max_tickets=10000, tamano_reserva=1, tiempo_arranque=5,
+                 politica_escalado="umbral", config_escalado=None, estrategia_balanceo="menor_carga",
+                 reloj=time.time, fabrica_servidor=ServidorSimulado, persistencia=None, telemetria=None, aprendizaje=None,
+                 planificador=None):
         self.num_servidores_max = 5
-        self.servidores = [ServidorSimulado(i) for i in range(num_servidores_inicial)]
+        self.persistencia = persistencia  # Registra las solicitudes encoladas y completadas (ver persistencia.py)
+        self.telemetria = telemetria  # Recibe la espera en cola y el procesamiento de cada solicitud (ver telemetria.py)
+        self.aprendizaje = aprendizaje  # Recibe el coste observado de cada solicitud (ver aprendizaje_online.py)
+        # Prioridad de las solicitudes en las colas y capacidad del pool (ver planificador.py)
+        self.planificador = planificador or Planificador()
+        # Plazas ocupadas de la capacidad: solicitudes admitidas que aún no han terminado (en cola o en proceso).
+        # Se reservan con un incremento atómico, así que solicitudes concurrentes no pueden superar la capacidad
+        self._plazas = ContadorAtomico(0)
+        # reloj y fabrica_servidor permiten ejecutar el asignador sobre un reloj virtual (ver simulador.py)
+        self.reloj = reloj
+        self.fabrica_servidor = fabrica_servidor
+        self.estrategia = estrategia_balanceo if isinstance(estrategia_balanceo, EstrategiaBalanceo) else crear_estrategia(estrategia_balanceo)
+        # La política se elige por nombre (ver politicas_escalado.POLITICAS) o se pasa ya instanciada
+        if isinstance(politica_escalado, PoliticaEscalado):
+            self.politica_escalado = politica_escalado
+        else:
+            config = {"max_servidores": self.num_servidores_max, "reloj": reloj, **(config_escalado or {})}
+            self.politica_escalado = crear_politica(politica_escalado, **config)
+        self.tiempo_arranque = tiempo_arranque
+        self.siguiente_id_servidor = itertools.count()
+        # Listas copia-en-escritura: las peticiones las recorren sin lock mientras el escalado las modifica;
+        # lock_escalado serializa las decisiones y modificaciones del pool
+        self.lock_escalado = threading.RLock()
+        self.servidores = ListaCopiaEnEscritura(self.nuevo_servidor() for _ in range(num_servidores_inicial))
+        # Servidores de reserva ya arrancados que se incorporan al instante al escalar
+        self.tamano_reserva = tamano_reserva
+        self.reserva = ListaCopiaEnEscritura()
+        self.reponer_reserva()
+        # Los servidores iniciales arrancan en paralelo; se espera a que estén listos antes de atender
+        for servidor in self.servidores:
+            servidor.esperar_listo()
         self.demand_predictor = demand_predictor
-        self.umbral_escalado_superior = 5
-        self.umbral_escalado_inferior = 1
-        self.cola_solicitudes = queue.Queue()
         self.intervalo_impresion = 10
-        self.ultimo_tiempo_impresion = time.time()
-
-    def asignar(self, user_id, caracteristicas):
-        """Asigna una solicitud a la cola."""
-        predicted_demand = self.demand_predictor.predict(caracteristicas)
-        self.cola_solicitudes.put((user_id, caracteristicas, predicted_demand, time.time()))
-        print(f"Solicitud de usuario {user_id} encolada. Demanda predicha: {predicted_demand:.2f}")
-        self.procesar_solicitudes()
+        self.ultimo_tiempo_impresion = self.reloj()
+        # {ticket: estado de la solicitud}, repartido en franjas con su propio lock y los más antiguos descartados
+        self.tickets = TablaRayada(capacidad=max_tickets)
+        self.max_tickets = max_tickets
+        self.siguiente_ticket = itertools.count(1)  # next() es atómico en CPython
+
+    def asignar(self, user_id, caracteristicas, predicted_demand=None, perfil=None):
+        """
+        Encola la solicitud en un servidor y devuelve (ticket, servidor_id) sin esperar a que se procese.
+        Si ya se conoce la demanda predicha (p. ej. calculada en un lote) no se vuelve a predecir. El perfil
+        del usuario pesa en su prioridad. Lanza ServicioSaturado si el pool está lleno (ver admitir).
+        """
+        if predicted_demand is None:
+            predicted_demand = self.demand_predictor.predict(caracteristicas)
+        self.politica_escalado.registrar(predicted_demand)
+        timestamp = self.reloj()
+        clave = self.planificador.clave(predicted_demand, perfil, timestamp)
+        self.admitir(clave)
+        ticket, servidor_id = self._encolar_admitida(user_id, caracteristicas, predicted_demand, timestamp, clave)
+        log.debug("Solicitud de usuario %s encolada con ticket %s. Demanda predicha: %.2f", user_id, ticket, predicted_demand)
         self.comprobar_escalado()
-        return "encolada"
+        return ticket, servidor_id
+
+    def asignar_lote(self, solicitudes, demandas, perfiles=None):
+        """
+        Encola una lista de (user_id, caracteristicas) con sus demandas ya predichas (y los perfiles de sus
+        usuarios) y devuelve por cada una (ticket, servidor_id) o la ServicioSaturado que la rechaza.
+        El escalado se comprueba una sola vez al final.
+        """
+        timestamp = self.reloj()
+        asignaciones = []
+        for (user_id, caracteristicas), demanda, perfil in zip(solicitudes, demandas, perfiles or itertools.repeat(None)):
+            self.politica_escalado.registrar(demanda)
+            clave = self.planificador.clave(demanda, perfil, timestamp)
+            try:
+                self.admitir(clave)
+            except ServicioSaturado as e:
+                asignaciones.append(e)
+                continue
+            asignaciones.append(self._encolar_admitida(user_id, caracteristicas, demanda, timestamp, clave))
+        if asignaciones:
+            log.debug("%d solicitudes encoladas en lote", len(asignaciones))
+            self.comprobar_escalado()
+        return asignaciones
+
+    def admitir(self, clave):
+        """
+        Reserva una plaza para una solicitud nueva con la clave de prioridad `clave`. Con el pool lleno se
+        desaloja la solicitud encolada de peor prioridad, si es peor que la nueva, y la nueva ocupa su plaza;
+        si no, la nueva se rechaza con ServicioSaturado. La plaza se libera en completar_ticket.
+        """
+        if self._plazas.sumar(1) <= self.planificador.capacidad:
+            return
+        self._plazas.sumar(-1)
+        candidatos = [(s.cola.peor_clave(), s) for s in self.servidores]
+        candidatos = [(peor, s) for peor, s in candidatos if peor is not None]
+        elemento = None
+        if candidatos:
+            _, servidor = max(candidatos, key=lambda candidato: candidato[0])
+            elemento = servidor.desalojar(clave)
+        if elemento is None:
+            _SATURADO.inc()
+            listos = self.servidores_listos()
+            raise ServicioSaturado("Servicio saturado, inténtalo más tarde",
+                                   min((s.carga for s in listos), default=1.0))
+        ticket, _, _, demanda = elemento
+        self.estrategia.completado(servidor, demanda)
+        if self.persistencia is not None:
+            self.persistencia.registrar_completada(ticket)
+        rechazo = ServicioSaturado("Solicitud desalojada de la cola por saturación", 1.0)
+        self.tickets.modificar(ticket, estado="rechazada", resultado=rechazo.cuerpo())
+        _DESALOJADAS.inc()
+        log.debug("Solicitud con ticket %s desalojada del servidor %s por saturación", ticket, servidor.id)
+
+    def _encolar_admitida(self, user_id, caracteristicas, predicted_demand, timestamp, clave):
+        """
+        Registra y encola una solicitud que ya tiene plaza (ver admitir) y devuelve (ticket, servidor_id).
+        Si falla el registro o el envío a un servidor se libera la plaza: la solicitud no llegará a completar_ticket.
+        """
+        try:
+            ticket = self._nuevo_ticket(user_id, caracteristicas, predicted_demand)
+            if self.persistencia is not None:
+                self.persistencia.registrar_encolada(ticket, user_id, caracteristicas)
+            return ticket, self.procesar_solicitudes(ticket, user_id, caracteristicas, predicted_demand, timestamp, clave)
+        except BaseException:
+            self._plazas.sumar(-1)
+            raise
+
+    def _nuevo_ticket(self, user_id, caracteristicas, predicted_demand):
+        """Reserva el siguiente ticket y registra su estado inicial."""
+        ticket = next(self.siguiente_ticket)
+        self.tickets.insertar(ticket, {
+            "estado": "encolada",
+            "user_id": user_id,
+            "tipo": caracteristicas["tipo"],
+            "longitud": caracteristicas["longitud"],
+            "demanda_predicha": float(predicted_demand),
+            "servidor": None,
+            "resultado": None
+        })
+        return ticket
 
-    def procesar_solicitudes(self):
-        """Procesa solicitudes de la cola, asignándolas a servidores libres."""
-        servidor_elegido = min(self.servidores, key=lambda s: s.carga)
-        if not servidor_elegido.arrancando and not self.cola_solicitudes.empty():
-            user_id, caracteristicas, predicted_demand, timestamp = self.cola_solicitudes.get()
-            print(f"Asignando solicitud de usuario {user_id} al servidor {servidor_elegido.id} con demanda predicha de: {predicted_demand}")
-            servidor_elegido.procesar_solicitud(caracteristicas, timestamp)
-            self.cola_solicitudes.task_done()
+    def procesar_solicitudes(self, ticket, user_id, caracteristicas, predicted_demand, timestamp, clave=None):
+        """Envía la solicitud a la cola del servidor listo que elija la estrategia y devuelve su id."""
+        demanda = max(0.0, float(predicted_demand))
+        while True:
+            # Si ninguno está listo la solicitud espera en la cola de uno que aún arranca
+            candidatos = self.servidores_listos() or self.servidores.instantanea()
+            servidor_elegido = self.estrategia.elegir(candidatos, demanda)
+            # Si otro hilo retiró el servidor después de tomar la instantánea se elige de nuevo
+            if servidor_elegido.encolar(ticket, caracteristicas, timestamp, demanda, clave) is not False:
+                break
+        log.debug("Asignando solicitud de usuario %s al servidor %s con demanda predicha de: %s", user_id, servidor_elegido.id, predicted_demand)
+        self.tickets.modificar(ticket, servidor=servidor_elegido.id)
+        self.estrategia.asignado(servidor_elegido, demanda)
+        return servidor_elegido.id
+
+    def completar_ticket(self, ticket, resultado):
+        """Marca un ticket como completado con el resultado devuelto por el servidor y libera su plaza."""
+        self._plazas.sumar(-1)
+        if self.persistencia is not None:
+            self.persistencia.registrar_completada(ticket)
+        estado = self.tickets.modificar(ticket, estado="completada", resultado=resultado)
+        if resultado is not None:
+            if self.telemetria is not None:
+                self.telemetria.registrar_completada(ticket, resultado, estado)
+            if self.aprendizaje is not None and estado is not None:
+                self.aprendizaje.observar(estado, resultado["tiempo_procesamiento"])
+            COMPLETADAS.inc()
+            _LATENCIA_ESPERA_COLA.observar(resultado["espera_cola"])
+            _LATENCIA_PROCESAMIENTO.observar(resultado["tiempo_procesamiento"])
+            servidor = next((s for s in self.servidores if s.id == resultado["servidor"]), None)
+            if servidor is not None:
+                self.estrategia.completado(servidor, resultado["demanda_predicha"])
+
+    def estado_ticket(self, ticket):
+        """Devuelve una copia del estado de un ticket o None si no existe o ya se purgó."""
+        return self.tickets.copia(ticket)
+
+    def informe_utilizacion(self):
+        """Estado, cola, trabajo pendiente y utilización de cada servidor del pool."""
+        return [{
+            "id": s.id,
+            "estado": s.estado,
+            "cola": s.cola.qsize(),
+            "trabajo_pendiente": s.trabajo_pendiente,
+            "atendidas": s.atendidas,
+            "utilizacion": s.utilizacion()
+        } for s in self.servidores]
+
+    def longitud_cola(self):
+        """Número total de solicitudes pendientes en las colas de los servidores."""
+        return sum(s.cola.qsize() for s in self.servidores)
+
+    def servidores_listos(self):
+        """Servidores del pool que ya pueden recibir solicitudes."""
+        return [s for s in self.servidores if s.estado == ESTADO_LISTO]
+
+    def nuevo_servidor(self):
+        """Crea un servidor que arranca en segundo plano."""
+        return self.fabrica_servidor(next(self.siguiente_id_servidor), self.completar_ticket, self.tiempo_arranque)
+
+    def reponer_reserva(self):
+        """Arranca en segundo plano los servidores de reserva que falten."""
+        with self.lock_escalado:
+            while len(self.reserva) < self.tamano_reserva:
+                self.reserva.append(self.nuevo_servidor())
 
     def crear_servidor(self):
-        """Añade un nuevo servidor a la lista de servidores."""
-        if len(self.servidores) < self.num_servidores_max:
-            nuevo_servidor_id = len(self.servidores)
-            self.servidores.append(ServidorSimulado(nuevo_servidor_id))
-            print(f"Nuevo servidor creado con ID {nuevo_servidor_id}. Total de servidores: {len(self.servidores)}")
-        else:
-            print(f"No se pueden crear más servidores. Se ha alcanzado el límite máximo de {self.num_servidores_max} servidores.")
+        """Añade un servidor al pool, tomándolo de la reserva si hay alguno ya arrancado."""
+        with self.lock_escalado:
+            if len(self.servidores) < self.num_servidores_max:
+                disponibles = [s for s in self.reserva if s.estado == ESTADO_LISTO]
+                if disponibles:
+                    nuevo_servidor = disponibles[0]
+                    self.reserva.remove(nuevo_servidor)
+                else:
+                    nuevo_servidor = self.nuevo_servidor()
+                self.servidores.append(nuevo_servidor)
+                self.reponer_reserva()
+                _ESCALADOS_ARRIBA.inc()
+                log.info("Nuevo servidor incorporado con ID %s (%s). Total de servidores: %d", nuevo_servidor.id, nuevo_servidor.estado, len(self.servidores))
+            else:
+                log.debug("No se pueden crear más servidores. Se ha alcanzado el límite máximo de %d servidores.", self.num_servidores_max)
 
     def eliminar_servidor(self):
-        """Elimina un servidor de la lista de servidores, si hay más de uno."""
-        if len(self.servidores) > 1:
-            servidor_a_eliminar = self.servidores.pop()
-            print(f"Servidor {servidor_a_eliminar.id} eliminado. Total de servidores: {len(self.servidores)}")
-        else:
-            print("No se pueden eliminar más servidores. Se ha alcanzado el mínimo de 1 servidor.")
+        """Retira un servidor del pool, si queda al menos otro listo."""
+        with self.lock_escalado:
+            listos = self.servidores_listos()
+            if len(listos) > 1:
+                servidor_a_eliminar = listos[-1]
+                self.servidores.remove(servidor_a_eliminar)
+                # El servidor pasa a drenando y termina las solicitudes que ya tenía encoladas antes de parar
+                servidor_a_eliminar.detener()
+                _ESCALADOS_ABAJO.inc()
+                log.info("Servidor %s eliminado. Total de servidores: %d", servidor_a_eliminar.id, len(self.servidores))
+            else:
+                log.debug("No se pueden eliminar más servidores. Se ha alcanzado el mínimo de 1 servidor listo.")
 
     def comprobar_escalado(self):
-        """Comprueba la carga total y escala el número de servidores si es necesario."""
-        carga_total = sum(s.carga for s in self.servidores if not s.arrancando)
-        num_servidores_activos = sum(1 for s in self.servidores if not s.arrancando)
-        print(f"Carga total del sistema: {carga_total:.2f}, servidores activos: {num_servidores_activos}")
+        """Consulta a la política de escalado y añade o retira un servidor si lo indica."""
+        # Si otro hilo ya está evaluando el escalado no se espera: su decisión cubre la carga actual
+        if not self.lock_escalado.acquire(blocking=False):
+            return
+        try:
+            listos = self.servidores_listos()
+            carga_total = sum(s.carga for s in listos)
+            num_servidores_activos = len(listos)
+            log.debug("Carga total del sistema: %.2f, servidores activos: %d", carga_total, num_servidores_activos)
 
-        if carga_total > self.umbral_escalado_superior and len(self.servidores) < self.num_servidores_max:
-            self.crear_servidor()
-        elif carga_total < self.umbral_escalado_inferior and len(self.servidores) > 1:
-            self.eliminar_servidor()
-        self.imprimir_estado()
+            # Los servidores que aún arrancan cuentan para no volver a escalar por la misma demanda
+            decision = self.politica_escalado.decidir(len(self.servidores), carga_total)
+            if decision > 0:
+                self.crear_servidor()
+            elif decision < 0:
+                self.eliminar_servidor()
+            self.imprimir_estado()
+        finally:
+            self.lock_escalado.release()
 
     def imprimir_estado(self):
-        """Imprime el estado actual de los servidores y la cola de solicitudes."""
-        ahora = time.time()
+        """Registra cada `intervalo_impresion` segundos el estado de los servidores y la cola de solicitudes."""
+        if not log.isEnabledFor(logging.INFO):
+            return
+        ahora = self.reloj()
         if ahora - self.ultimo_tiempo_impresion > self.intervalo_impresion:
-            print("\n--- Estado del Sistema ---")
-            for servidor in self.servidores:
-                print(f"Servidor {servidor.id}: Carga actual = {servidor.carga:.2f}, Arrancando = {servidor.arrancando}")
-            print(f"Longitud de la cola de solicitudes: {self.cola_solicitudes.qsize()}")
-            print("--------------------------\n")
-            self.ultimo_tiempo_impresion = ahora
\ No newline at end of file
+            lineas = [f"Servidor {servidor.id}: Carga actual = {servidor.carga:.2f}, Cola = {servidor.cola.qsize()}, Estado = {servidor.estado}, Utilización = {servidor.utilizacion():.0%}"
+                      for servidor in self.servidores]
+            lineas.append(f"Servidores de reserva: {len(self.reserva)}")
+            lineas.append(f"Longitud de la cola de solicitudes: {self.longitud_cola()}")
+            log.info("Estado del sistema:\n  %s", "\n  ".join(lineas))
+            self.ultimo_tiempo_impresion = ahora
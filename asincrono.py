@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import os
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from metricas import ERRORES
+from servicio import TAMANO_BLOQUE_LOTE, bloques, codificar_ndjson, decodificar_ndjson, resultados_error
+
+log = logging.getLogger(__name__)
+
+# Piezas asyncio comunes a los frontales ASGI (app_asgi.py con un único proceso y app_cluster.py
+# con los usuarios repartidos entre varios procesos).
+VENTANA_LOTE = float(os.environ.get("VENTANA_LOTE", "0.001"))
+MAX_FILAS_LOTE = int(os.environ.get("MAX_FILAS_LOTE", "256"))
+
+class AgrupadorAsincrono:
+    """
+    Versión asyncio de AgrupadorMicroLotes: reúne las peticiones que llegan durante `ventana` segundos
+    y ejecuta funcion_lote(lista) en un ejecutor sin bloquear el bucle de eventos (o en el propio bucle si
+    ejecutor es None, para funciones muy baratas).
+    funcion_lote devuelve un resultado por elemento; si uno es una excepción sólo falla esa petición.
+    """
+    def __init__(self, funcion_lote, ejecutor, ventana=VENTANA_LOTE, max_filas=MAX_FILAS_LOTE):
+        self.funcion_lote = funcion_lote
+        self.ejecutor = ejecutor
+        self.ventana = ventana
+        self.max_filas = max_filas
+        self._cola = None
+        self._tarea = None
+
+    def iniciar(self):
+        self._cola = asyncio.Queue()
+        self._tarea = asyncio.get_running_loop().create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+
+    async def enviar(self, elemento):
+        """Encola un elemento y espera al resultado de su lote."""
+        futuro = asyncio.get_running_loop().create_future()
+        self._cola.put_nowait((elemento, futuro))
+        return await futuro
+
+    async def _bucle(self):
+        bucle = asyncio.get_running_loop()
+        while True:
+            lote = [await self._cola.get()]
+            if self.ventana > 0:
+                await asyncio.sleep(self.ventana)
+            while len(lote) < self.max_filas and not self._cola.empty():
+                lote.append(self._cola.get_nowait())
+            try:
+                elementos = [e for e, _ in lote]
+                if self.ejecutor is None:
+                    resultados = self.funcion_lote(elementos)
+                else:
+                    resultados = await bucle.run_in_executor(self.ejecutor, self.funcion_lote, elementos)
+            except Exception as e:
+                resultados = [e] * len(lote)
+            for (_, futuro), resultado in zip(lote, resultados):
+                if futuro.done():
+                    continue  # El cliente se desconectó
+                if isinstance(resultado, Exception):
+                    futuro.set_exception(resultado)
+                else:
+                    futuro.set_result(resultado)
+
+class SolicitudesEnBloque:
+    """
+    Endpoint ASGI de /solicitudes: acepta un array JSON o NDJSON (una solicitud por línea) y devuelve
+    NDJSON con un resultado por solicitud. Con NDJSON el cuerpo se lee por trozos y cada bloque se procesa
+    con la corrutina procesar_bloque(bloque, primer_indice) y se envía en cuanto llega, sin esperar al final.
+    Un bloque que falla se responde con un error por solicitud y se sigue con el siguiente.
+    """
+    def __init__(self, procesar_bloque):
+        self.procesar_bloque = procesar_bloque
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        if 'ndjson' in request.headers.get('content-type', ''):
+            bloques_datos = self._bloques_ndjson(request.stream())
+        else:
+            try:
+                datos = await request.json()
+            except ValueError:
+                datos = None
+            if not isinstance(datos, list):
+                respuesta = JSONResponse({'error': 'Se esperaba un array JSON o NDJSON'}, status_code=400)
+                await respuesta(scope, receive, send)
+                return
+            bloques_datos = self._bloques_lista(datos)
+
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/x-ndjson')]})
+        indice = 0
+        async for bloque in bloques_datos:
+            try:
+                resultados = await self.procesar_bloque(bloque, indice)
+            except Exception:
+                ERRORES.etiquetas('/solicitudes').inc()
+                log.exception("Error al procesar un bloque de /solicitudes")
+                resultados = resultados_error(bloque, indice)
+            indice += len(bloque)
+            await send({'type': 'http.response.body', 'body': codificar_ndjson(resultados), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    @staticmethod
+    async def _bloques_lista(datos):
+        for bloque in bloques(datos):
+            yield bloque
+
+    @staticmethod
+    async def _bloques_ndjson(flujo):
+        # Se procesa lo recibido en cada trozo del cuerpo, hasta TAMANO_BLOQUE_LOTE líneas de cada vez
+        resto = b''
+        async for trozo in flujo:
+            lineas = (resto + trozo).split(b'\n')
+            resto = lineas.pop()
+            for inicio in range(0, len(lineas), TAMANO_BLOQUE_LOTE):
+                datos = decodificar_ndjson(lineas[inicio:inicio + TAMANO_BLOQUE_LOTE])
+                if datos:
+                    yield datos
+        datos = decodificar_ndjson([resto])
+        if datos:
+            yield datos
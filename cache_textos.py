@@ -0,0 +1,229 @@
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from metricas import CACHE_TEXTOS, METRICAS
+
+# Caché de contenido de /solicitud: el tráfico repite unas pocas decenas de textos, así que cada texto ya
+# visto se asocia a sus características y a la demanda predicha, y una solicitud con un texto conocido sólo
+# pasa por la parte de cada usuario (admisión, encolado y perfil), sin analizar el texto ni llamar al modelo.
+# Hay dos niveles:
+#  - la caché de cada proceso, indexada por el texto tal cual, LRU y acotada en entradas y en caracteres;
+#  - opcionalmente una tabla en memoria compartida (un fichero en /dev/shm proyectado con mmap) que usan a la
+#    vez todos los procesos que la abren, p. ej. los nodos de cluster.py: un texto analizado en uno no se
+#    vuelve a analizar en los demás. Se indexa por la clave de contenido del analizador (el texto normalizado).
+# Cada entrada guarda la versión del modelo que predijo su demanda (DemandPredictor.version); con otro modelo,
+# p. ej. tras un ajuste en línea, se reutilizan las características y la demanda se vuelve a predecir.
+
+_LOCAL = CACHE_TEXTOS.etiquetas("local")
+_COMPARTIDA = CACHE_TEXTOS.etiquetas("compartida")
+_FALLOS = CACHE_TEXTOS.etiquetas("fallo")
+
+CAPACIDAD = 4096
+MAX_CARACTERES = 1 << 22
+ENTRADAS_COMPARTIDA = 65536
+
+# Disposición de la tabla compartida: una cabecera y conjuntos de VIAS entradas de CAMPOS enteros de 64 bits:
+# clave (2), último uso, suma de control, versión del modelo, longitud, tipo, palabras, palabras clave,
+# símbolos de código y la demanda (los bits del float64)
+MAGICO = 0x5458544845434143
+FORMATO = 1
+CABECERA = 8
+VIAS = 8
+CAMPOS = 11
+_CLAVE = struct.Struct("<qq")
+_ENTERO = struct.Struct("<q")
+_REAL = struct.Struct("<d")
+
+def directorio_compartido():
+    """/dev/shm (memoria, en Linux) si existe; si no, el directorio temporal."""
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+def _control(fila):
+    # Suma de control de la clave y el contenido (no del último uso, que cambia con cada acierto); hash() de
+    # enteros da lo mismo en todos los procesos. 0 queda para las entradas vacías o a medio escribir.
+    return hash((fila[0], fila[1], *fila[4:])) or 1
+
+class TablaCompartida:
+    """
+    Tabla asociativa por conjuntos de VIAS entradas en un fichero proyectado en memoria, que varios procesos
+    abren y usan a la vez sin locks: cada entrada lleva una suma de control de su contenido y la que se lee
+    a medio escribir por otro proceso no la cumple y cuenta como fallo. En cada conjunto se sustituye la
+    entrada usada hace más tiempo. El fichero se crea con `entradas` si no existe; si existe se usa con su
+    tamaño.
+    """
+    def __init__(self, ruta, entradas=ENTRADAS_COMPARTIDA):
+        self.ruta = ruta
+        descriptor = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(descriptor).st_size == 0:
+                # Relleno con ceros: todas las entradas vacías
+                os.ftruncate(descriptor, 8 * (CABECERA + max(1, -(-entradas // VIAS)) * VIAS * CAMPOS))
+            self._mapa = mmap.mmap(descriptor, os.fstat(descriptor).st_size)
+        finally:
+            os.close(descriptor)
+        enteros = np.frombuffer(self._mapa, dtype=np.int64)
+        if enteros[0] == 0:
+            enteros[:2] = (MAGICO, FORMATO)
+        elif enteros[0] != MAGICO or enteros[1] != FORMATO:
+            raise ValueError(f"{ruta} no es una caché de textos con el formato {FORMATO}")
+        self.conjuntos = (len(enteros) - CABECERA) // (VIAS * CAMPOS)
+        self._tabla = enteros[CABECERA:CABECERA + self.conjuntos * VIAS * CAMPOS].reshape(self.conjuntos, VIAS, CAMPOS)
+        self._claves = self._tabla[:, :, :2]
+
+    @property
+    def entradas(self):
+        return self.conjuntos * VIAS
+
+    def obtener(self, clave):
+        """Devuelve los valores guardados con la clave (16 bytes) o None."""
+        a, b = _CLAVE.unpack(clave)
+        conjunto = a % self.conjuntos
+        try:
+            via = self._claves[conjunto].tolist().index([a, b])
+        except ValueError:
+            return None
+        fila = self._tabla[conjunto, via].tolist()
+        if fila[0] != a or fila[1] != b or fila[3] != _control(fila):
+            return None
+        self._tabla[conjunto, via, 2] = time.monotonic_ns()
+        return fila[4:]
+
+    def guardar(self, clave, valores):
+        """Guarda CAMPOS - 4 enteros con la clave, en su entrada si ya estaba o en la menos usada del conjunto."""
+        a, b = _CLAVE.unpack(clave)
+        conjunto = a % self.conjuntos
+        claves = self._claves[conjunto].tolist()
+        via = claves.index([a, b]) if [a, b] in claves else int(np.argmin(self._tabla[conjunto, :, 2]))
+        fila = [a, b, time.monotonic_ns(), 0, *valores]
+        self._tabla[conjunto, via, 3] = 0  # Inválida mientras se escribe
+        self._tabla[conjunto, via] = fila
+        self._tabla[conjunto, via, 3] = _control(fila)
+
+    def ocupadas(self):
+        return int(np.count_nonzero(self._tabla[:, :, 3]))
+
+    def cerrar(self):
+        self._tabla = self._claves = None
+        try:
+            self._mapa.close()
+        except BufferError:
+            pass  # Queda alguna vista en uso; el mapa se libera con ella
+
+class CacheTextos:
+    """
+    Características y demanda predicha de los textos ya vistos (ver arriba). La caché del proceso guarda
+    hasta `capacidad` textos y `max_caracteres` caracteres entre todos (un texto más largo no se guarda), y
+    desaloja el usado hace más tiempo. `compartida` es la TablaCompartida común a varios procesos o None.
+    """
+    def __init__(self, analizador, capacidad=CAPACIDAD, max_caracteres=MAX_CARACTERES, compartida=None):
+        self.analizador = analizador
+        self.capacidad = capacidad
+        self.max_caracteres = max_caracteres
+        self.compartida = compartida
+        # En la tabla compartida el tipo se guarda como su posición en esta lista (la misma en todos los
+        # procesos con el mismo analizador, que forma parte de la clave)
+        self.tipos = list(dict.fromkeys([*analizador.prioridad, analizador.tipo_por_defecto]))
+        self._posicion_tipo = {tipo: i for i, tipo in enumerate(self.tipos)}
+        self._entradas = OrderedDict()  # {texto: (características, demanda, versión del modelo)}
+        self.caracteres = 0
+        self.desalojos = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, texto, version):
+        """
+        (características, demanda) del texto, con la demanda None si se predijo con un modelo distinto de
+        `version`, o None si el texto no está. Las características son una copia que se puede modificar.
+        """
+        with self._lock:
+            entrada = self._entradas.get(texto)
+            if entrada is not None:
+                self._entradas.move_to_end(texto)
+        if entrada is not None:
+            _LOCAL.inc()
+        elif self.compartida is not None and (entrada := self._obtener_compartida(texto)) is not None:
+            _COMPARTIDA.inc()
+            self._guardar_local(texto, entrada)
+        else:
+            _FALLOS.inc()
+            return None
+        caracteristicas, demanda, version_entrada = entrada
+        return dict(caracteristicas), demanda if version_entrada == version else None
+
+    def guardar(self, texto, caracteristicas, demanda, version):
+        """Guarda las características del texto y la demanda que predijo el modelo `version`."""
+        entrada = (dict(caracteristicas), float(demanda), version)
+        self._guardar_local(texto, entrada)
+        posicion_tipo = self._posicion_tipo.get(caracteristicas["tipo"])
+        if self.compartida is not None and posicion_tipo is not None:
+            self.compartida.guardar(self.analizador.clave(texto), [
+                version, caracteristicas["longitud"], posicion_tipo, caracteristicas["palabras"],
+                caracteristicas["palabras_clave"], caracteristicas["simbolos_codigo"],
+                _ENTERO.unpack(_REAL.pack(entrada[1]))[0]])
+
+    def _obtener_compartida(self, texto):
+        valores = self.compartida.obtener(self.analizador.clave(texto))
+        if valores is None or not 0 <= valores[2] < len(self.tipos):
+            return None
+        version, longitud, posicion_tipo, palabras, palabras_clave, simbolos, demanda = valores
+        caracteristicas = {"longitud": longitud, "tipo": self.tipos[posicion_tipo], "palabras": palabras,
+                           "palabras_clave": palabras_clave, "simbolos_codigo": simbolos}
+        return caracteristicas, _REAL.unpack(_ENTERO.pack(demanda))[0], version
+
+    def _guardar_local(self, texto, entrada):
+        if len(texto) > self.max_caracteres:
+            return
+        with self._lock:
+            if texto not in self._entradas:
+                self.caracteres += len(texto)
+            self._entradas[texto] = entrada
+            self._entradas.move_to_end(texto)
+            while len(self._entradas) > self.capacidad or self.caracteres > self.max_caracteres:
+                desalojado, _ = self._entradas.popitem(last=False)
+                self.caracteres -= len(desalojado)
+                self.desalojos += 1
+
+    def estadisticas(self):
+        """Resumen para /estado_servidores."""
+        with self._lock:
+            estado = {"entradas": len(self._entradas), "caracteres": self.caracteres, "desalojos": self.desalojos}
+        estado.update(aciertos_local=int(_LOCAL.valor), aciertos_compartida=int(_COMPARTIDA.valor),
+                      fallos=int(_FALLOS.valor), tasa_aciertos=tasa_aciertos())
+        if self.compartida is not None:
+            estado["compartida"] = {"ruta": self.compartida.ruta, "entradas": self.compartida.entradas,
+                                    "ocupadas": self.compartida.ocupadas()}
+        return estado
+
+    def cerrar(self):
+        if self.compartida is not None:
+            self.compartida.cerrar()
+
+def tasa_aciertos():
+    """Fracción de las consultas de este proceso resueltas por la caché (local o compartida)."""
+    aciertos = _LOCAL.valor + _COMPARTIDA.valor
+    total = aciertos + _FALLOS.valor
+    return aciertos / total if total else 0.0
+
+def crear_cache_textos(entorno, analizador):
+    """
+    CACHE_TEXTOS = "ENTRADAS[:CARACTERES]" de la caché de cada proceso (por defecto 4096 textos y 4 Mi
+    caracteres; "0" la desactiva). CACHE_TEXTOS_COMPARTIDA = "RUTA[:ENTRADAS]" del fichero de la tabla en
+    memoria compartida (p. ej. /dev/shm/cache_textos; por defecto 65536 entradas, 88 bytes cada una) que
+    usan todos los procesos que lo abren, como los trabajadores de `uvicorn --workers`; vacío, por defecto,
+    sin tabla compartida (cluster.py crea una para sus nodos). El fichero no se borra al terminar: con otro
+    modelo o con otras palabras clave sus entradas no se usan, así que se puede reutilizar entre arranques.
+    """
+    capacidad, _, caracteres = entorno.get("CACHE_TEXTOS", str(CAPACIDAD)).partition(":")
+    if int(capacidad) <= 0:
+        return None
+    compartida = None
+    ruta, _, entradas = entorno.get("CACHE_TEXTOS_COMPARTIDA", "").partition(":")
+    if ruta:
+        compartida = TablaCompartida(ruta, int(entradas or ENTRADAS_COMPARTIDA))
+    METRICAS.indicador("cache_textos_tasa_aciertos", "Fracción de las consultas a la caché de textos resueltas sin analizar el texto",
+                       tasa_aciertos)
+    return CacheTextos(analizador, int(capacidad), int(caracteres or MAX_CARACTERES), compartida)
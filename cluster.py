@@ -0,0 +1,359 @@
+import bisect
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import util
+from multiprocessing.managers import BaseManager
+from gestor_usuarios import GestorUsuarios
+from asignador_recursos import DemandPredictor
+from cache_textos import directorio_compartido
+from metricas import METRICAS, formatear
+from persistencia import crear_persistencia
+from planificador import rechazo_desde_cuerpo
+from registro import configurar_registro
+from telemetria import crear_telemetria
+from servicio import Servicio, SolicitudNoValida, crear_asignador, cuerpo_resultado, preparar_modelo, reencolar_pendientes
+
+# Despliegue con varios procesos: los usuarios se reparten por hashing consistente de su user_id entre
+# nodos (procesos) que tienen cada uno su propia parte de los perfiles e historiales, de modo que el análisis,
+# la predicción y el registro de usuarios distintos se ejecutan en paralelo en varios núcleos. Todas las
+# solicitudes de un usuario pasan por su nodo y en orden, así que los perfiles son los mismos que con un
+# único proceso. El pool de servidores, sus colas y los tickets son un estado único para todo el cluster que
+# vive detrás de un backend intercambiable (ESTADOS_CLUSTER):
+#   "local"   el pool está en el propio proceso y los nodos son hilos (desarrollo y pruebas)
+#   "proceso" el pool está en un proceso servidor de multiprocessing.managers y los nodos en procesos propios
+#             que lo usan a través de un socket local, como lo harían con un almacén externo
+# Con PERSISTENCIA cada nodo y el pool escriben en su propio fichero o directorio (ver especificacion_nodo);
+# la telemetría de todos va al mismo directorio, con el origen en el nombre de cada fichero. Salvo que se
+# indique otra con CACHE_TEXTOS_COMPARTIDA, los nodos comparten una caché de textos en memoria que se borra
+# al cerrar el cluster (ver cache_textos.py): un texto analizado en un nodo no se vuelve a analizar en otro.
+# El reparto depende del número de nodos: si cambia entre reinicios, los usuarios que cambian de nodo
+# (≈1/N de ellos por cada nodo añadido o quitado) empiezan sin historial en el nuevo.
+
+class AnilloConsistente:
+    """
+    Reparto de claves entre nodos por hashing consistente: cada nodo ocupa `replicas` puntos de un anillo
+    de 64 bits y una clave pertenece al primer punto que la sigue. Al añadir o quitar un nodo sólo cambian
+    de dueño las claves de sus tramos, no casi todas como con hash(clave) % N. El hash es blake2b y no
+    hash(), que cambia de un proceso a otro.
+    """
+    def __init__(self, nodos=(), replicas=64):
+        self.replicas = replicas
+        self._puntos = []  # Ordenados
+        self._duenos = []  # Nodo de cada punto
+        for nodo in nodos:
+            self.agregar(nodo)
+
+    @staticmethod
+    def _hash(texto):
+        return int.from_bytes(hashlib.blake2b(texto.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def agregar(self, nodo):
+        for replica in range(self.replicas):
+            punto = self._hash(f"{nodo}#{replica}")
+            posicion = bisect.bisect(self._puntos, punto)
+            self._puntos.insert(posicion, punto)
+            self._duenos.insert(posicion, nodo)
+
+    def quitar(self, nodo):
+        puntos = [(p, d) for p, d in zip(self._puntos, self._duenos) if d != nodo]
+        self._puntos = [p for p, _ in puntos]
+        self._duenos = [d for _, d in puntos]
+
+    def nodo(self, clave):
+        if not self._puntos:
+            raise LookupError("El anillo no tiene nodos")
+        posicion = bisect.bisect(self._puntos, self._hash(str(clave)))
+        return self._duenos[posicion % len(self._duenos)]
+
+def especificacion_nodo(especificacion, nombre):
+    """
+    PERSISTENCIA propia de un nodo o del pool a partir de la del servicio:
+    "wal:estado" -> "wal:estado-nodo0" y "sqlite:estado.db" -> "sqlite:estado-nodo0.db".
+    """
+    if not especificacion:
+        return ""
+    tipo, _, ruta = especificacion.partition(":")
+    base, extension = os.path.splitext(ruta or ("estado.db" if tipo == "sqlite" else "estado"))
+    return f"{tipo}:{base}-{nombre}{extension}"
+
+def crear_pool(entorno):
+    """
+    Crea el pool de servidores único del cluster con su propia persistencia (sólo de la cola) y telemetría
+    (sólo de las solicitudes completadas), y vuelve a encolar las que quedaron pendientes en el último reinicio.
+    """
+    persistencia = crear_persistencia(especificacion_nodo(entorno.get("PERSISTENCIA", ""), "pool"))
+    telemetria = crear_telemetria(entorno.get("TELEMETRIA", "telemetria"), "pool")
+    # En el proceso servidor no se ejecutan los atexit: se cierra con los finalizadores de multiprocessing
+    util.Finalize(persistencia, persistencia.cerrar, exitpriority=10)
+    if telemetria is not None:
+        util.Finalize(telemetria, telemetria.cerrar, exitpriority=10)
+    pendientes = persistencia.cargar(GestorUsuarios())
+    pool = crear_asignador(entorno, DemandPredictor(backend=entorno.get("BACKEND_MODELO", "auto")), persistencia, telemetria)
+    reencolar_pendientes(pool, pendientes)
+    return pool
+
+class EstadoClusterLocal:
+    """Pool en el mismo proceso: los nodos (hilos) usan directamente el mismo objeto."""
+    nodos_en_procesos = False
+
+    def __init__(self, entorno):
+        self.pool = crear_pool(entorno)
+
+    def conectar(self):
+        return self.pool
+
+    def cerrar(self):
+        pass
+
+_pool = None  # Pool del proceso servidor de EstadoClusterProceso
+
+def _iniciar_pool(entorno):
+    global _pool
+    configurar_registro(entorno)
+    _pool = crear_pool(entorno)
+
+def _pool_compartido():
+    return _pool
+
+def _metricas_pool():
+    return METRICAS
+
+class ServidorEstado(BaseManager):
+    """Proceso servidor que aloja el pool; atiende a cada conexión en su propio hilo."""
+
+ServidorEstado.register("pool", callable=_pool_compartido,
+                        exposed=("asignar", "asignar_lote", "estado_ticket", "informe_utilizacion", "longitud_cola"))
+ServidorEstado.register("metricas", callable=_metricas_pool, exposed=("muestras",))
+
+class EstadoClusterProceso:
+    """
+    Pool en un proceso servidor aparte (multiprocessing.managers). Cada llamada al pool es un mensaje por
+    un socket local, así que los nodos lo usan por bloques (asignar_lote) y no solicitud a solicitud.
+    Sólo viajan a los nodos la dirección y la clave, de modo que sirve con cualquier método de arranque.
+    """
+    nodos_en_procesos = True
+
+    def __init__(self, entorno, contexto):
+        self._servidor = ServidorEstado(ctx=contexto)
+        self._servidor.start(_iniciar_pool, (entorno,))  # Vuelve cuando el pool ya está creado
+        self.direccion = self._servidor.address
+        self.clave = bytes(multiprocessing.current_process().authkey)
+
+    def __getstate__(self):
+        return {"direccion": self.direccion, "clave": self.clave}
+
+    def _cliente(self):
+        cliente = ServidorEstado(address=self.direccion, authkey=self.clave)
+        cliente.connect()
+        return cliente
+
+    def conectar(self):
+        return self._cliente().pool()
+
+    def muestras_metricas(self):
+        """Métricas del proceso servidor (las del pool: colas, servidores, espera y procesamiento)."""
+        return self._cliente().metricas().muestras()
+
+    def cerrar(self):
+        self._servidor.shutdown()
+
+ESTADOS_CLUSTER = ("local", "proceso")
+
+def crear_estado_cluster(nombre, entorno, contexto):
+    if nombre == "local":
+        return EstadoClusterLocal(entorno)
+    if nombre == "proceso":
+        return EstadoClusterProceso(entorno, contexto)
+    raise ValueError(f"Estado de cluster desconocido: {nombre}. Opciones: {', '.join(ESTADOS_CLUSTER)}")
+
+def _bucle_nodo(indice, conexion, estado, entorno):
+    """Nodo del cluster: atiende por `conexion` las peticiones sobre los usuarios de su parte del anillo."""
+    entorno = {**entorno, "PERSISTENCIA": especificacion_nodo(entorno.get("PERSISTENCIA", ""), f"nodo{indice}"),
+               "ORIGEN_TELEMETRIA": f"nodo{indice}"}
+    configurar_registro(entorno)
+    servicio = Servicio(entorno=entorno, asignador_recursos=estado.conectar())
+    conexion.send(("listo", servicio.tiempos_arranque))
+    while True:
+        tipo, *argumentos = conexion.recv()
+        try:
+            if tipo == "procesar_lote":
+                respuesta = servicio.procesar_lote(*argumentos)
+            elif tipo == "actualizar_perfiles":
+                respuesta = servicio.actualizar_perfiles()
+            elif tipo == "perfiles":
+                respuesta = dict(servicio.gestor_usuarios.perfiles)
+            elif tipo == "metricas":
+                respuesta = METRICAS.muestras()
+            elif tipo == "parar":
+                servicio.cerrar()
+                conexion.send(("ok", None))
+                return
+            else:
+                raise ValueError(f"Mensaje desconocido: {tipo}")
+        except Exception as e:
+            conexion.send(("error", f"{type(e).__name__}: {e}"))
+        else:
+            conexion.send(("ok", respuesta))
+
+class Cluster:
+    """
+    Frontal del cluster: arranca el pool compartido y `num_nodos` nodos, y enruta cada solicitud al nodo
+    dueño de su user_id. Cada nodo atiende un mensaje cada vez (su conexión está protegida por un lock),
+    pero nodos distintos trabajan a la vez.
+    """
+    def __init__(self, num_nodos=None, estado="proceso", entorno=os.environ, replicas=64):
+        self.tiempos_arranque = {}
+        inicio_arranque = time.perf_counter()
+        entorno = dict(entorno)
+        # El modelo se entrena (si hace falta) una sola vez aquí y los nodos sólo lo cargan
+        inicio = time.perf_counter()
+        if preparar_modelo(entorno.get("MODO_ARRANQUE", "cargar")):
+            self.tiempos_arranque["entrenamiento"] = time.perf_counter() - inicio
+        entorno["MODO_ARRANQUE"] = "solo_cargar"
+        self.ruta_cache_textos = None
+        if "CACHE_TEXTOS_COMPARTIDA" not in entorno and entorno.get("CACHE_TEXTOS") != "0":
+            self.ruta_cache_textos = os.path.join(directorio_compartido(), f"cache_textos_{os.getpid()}_{id(self)}")
+            entorno["CACHE_TEXTOS_COMPARTIDA"] = self.ruta_cache_textos
+
+        # spawn: los nodos no heredan hilos ni locks a medio usar del proceso que los lanza
+        contexto = multiprocessing.get_context("spawn")
+        inicio = time.perf_counter()
+        self.estado = crear_estado_cluster(estado, entorno, contexto)
+        self.pool = self.estado.conectar()
+        self.tiempos_arranque["pool"] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        self.num_nodos = num_nodos or os.cpu_count() or 1
+        self.anillo = AnilloConsistente(range(self.num_nodos), replicas)
+        self.conexiones, self.locks, self.nodos = [], [], []
+        for indice in range(self.num_nodos):
+            extremo, extremo_nodo = multiprocessing.Pipe()
+            if self.estado.nodos_en_procesos:
+                nodo = contexto.Process(target=_bucle_nodo, args=(indice, extremo_nodo, self.estado, entorno),
+                                        name=f"nodo{indice}", daemon=True)
+            else:
+                nodo = threading.Thread(target=_bucle_nodo, args=(indice, extremo_nodo, self.estado, entorno),
+                                        name=f"nodo{indice}", daemon=True)
+            nodo.start()
+            self.conexiones.append(extremo)
+            self.locks.append(threading.Lock())
+            self.nodos.append(nodo)
+        # Los nodos arrancan en paralelo; se espera a que todos hayan cargado su estado y el modelo
+        for extremo in self.conexiones:
+            extremo.recv()
+        self.tiempos_arranque["nodos"] = time.perf_counter() - inicio
+        self.tiempos_arranque["total"] = time.perf_counter() - inicio_arranque
+
+    def nodo(self, user_id):
+        return self.anillo.nodo(user_id)
+
+    def _nodo_de(self, data):
+        # Los cuerpos sin un user_id válido van a cualquier nodo, que los rechaza al validarlos
+        if isinstance(data, dict) and isinstance(data.get("user_id"), str):
+            return self.nodo(data["user_id"])
+        return 0
+
+    def _pedir(self, indice, *mensaje):
+        with self.locks[indice]:
+            self.conexiones[indice].send(mensaje)
+            return self._respuesta(indice)
+
+    def _respuesta(self, indice):
+        estado, valor = self.conexiones[indice].recv()
+        if estado == "error":
+            raise RuntimeError(f"Nodo {indice}: {valor}")
+        return valor
+
+    def procesar_nodo(self, indice, datos):
+        """Procesa en el nodo `indice` cuerpos de solicitudes que ya se sabe que son suyos."""
+        return self._pedir(indice, "procesar_lote", datos)
+
+    def procesar_lote(self, datos, primer_indice=0):
+        """
+        Equivalente a Servicio.procesar_lote para todo el cluster: reparte el bloque por nodos, los deja
+        trabajar a la vez y devuelve los resultados en el orden de `datos`.
+        """
+        grupos = {}  # {nodo: [posición en datos]}
+        for posicion, data in enumerate(datos):
+            grupos.setdefault(self._nodo_de(data), []).append(posicion)
+        indices = sorted(grupos)  # Siempre en el mismo orden para no bloquearse con otro hilo
+        for indice in indices:
+            self.locks[indice].acquire()
+        try:
+            for indice in indices:
+                self.conexiones[indice].send(("procesar_lote", [datos[p] for p in grupos[indice]]))
+            # Se leen las respuestas de todos los nodos antes de lanzar el error de alguno: una respuesta que
+            # se quedara en su conexión sería la que recibiría la siguiente petición a ese nodo
+            respuestas, error = {}, None
+            for indice in indices:
+                try:
+                    respuestas[indice] = self._respuesta(indice)
+                except RuntimeError as e:
+                    error = error or e
+            if error is not None:
+                raise error
+            resultados = [None] * len(datos)
+            for indice in indices:
+                for posicion, resultado in zip(grupos[indice], respuestas[indice]):
+                    resultado['indice'] = primer_indice + posicion
+                    resultados[posicion] = resultado
+            return resultados
+        finally:
+            for indice in indices:
+                self.locks[indice].release()
+
+    def procesar(self, data):
+        """Procesa el cuerpo de una /solicitud en el nodo de su usuario y devuelve la misma respuesta que Servicio.procesar."""
+        Servicio.validar(data)
+        resultado = self.procesar_nodo(self._nodo_de(data), [data])[0]
+        if 'codigo' in resultado:
+            raise rechazo_desde_cuerpo(resultado)
+        if 'error' in resultado:
+            raise SolicitudNoValida(resultado['error'])
+        del resultado['indice']
+        return {'mensaje': 'Solicitud procesada correctamente', **resultado}
+
+    def resultado(self, ticket):
+        return cuerpo_resultado(ticket, self.pool.estado_ticket(ticket))
+
+    def estado_servidores(self):
+        return {'servidores': self.pool.informe_utilizacion(), 'nodos': self.num_nodos, 'arranque': self.tiempos_arranque}
+
+    def actualizar_perfiles(self):
+        for indice in range(self.num_nodos):
+            self._pedir(indice, "actualizar_perfiles")
+
+    def perfiles(self):
+        """Perfiles de todos los usuarios del cluster (cada uno está en un único nodo)."""
+        perfiles = {}
+        for indice in range(self.num_nodos):
+            perfiles.update(self._pedir(indice, "perfiles"))
+        return perfiles
+
+    def metricas(self):
+        """
+        Texto de /metrics de todo el cluster. Con los nodos en procesos se reúnen las métricas del frontal,
+        de cada nodo y del pool, distinguidas por la etiqueta origen; con hilos todos comparten el registro.
+        """
+        if not self.estado.nodos_en_procesos:
+            return METRICAS.exposicion()
+        muestras = {"frontal": METRICAS.muestras()}
+        for indice in range(self.num_nodos):
+            muestras[f"nodo{indice}"] = self._pedir(indice, "metricas")
+        muestras["pool"] = self.estado.muestras_metricas()
+        return formatear(muestras)
+
+    def cerrar(self):
+        for indice in range(self.num_nodos):
+            self._pedir(indice, "parar")
+        for nodo in self.nodos:
+            nodo.join(timeout=10)
+        self.estado.cerrar()
+        if self.ruta_cache_textos is not None:
+            try:
+                os.remove(self.ruta_cache_textos)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,67 @@
+import argparse
+import json
+from asignador_recursos import DemandPredictor
+from perfiles_usuario import PERFILES
+from planificador import ENVEJECIMIENTO, Planificador
+from simulador import PredictorCoste, Simulador, percentiles
+
+# Compara la latencia de las solicitudes ligeras bajo sobrecarga mixta con cada configuración de las colas
+# (ver planificador.py), en el simulador de eventos discretos: un pool fijo de servidores recibe a la vez
+# las consultas simples de muchos clientes básicos y las solicitudes complejas y de código de muchos
+# avanzados, más de lo que puede atender. La misma carga (misma semilla) se repite con cada configuración.
+CONFIGURACIONES = {
+    "fifo": {"orden": "fifo", "capacidad": None, "limite_usuario": None},
+    "sjf": {"orden": "sjf", "capacidad": None, "limite_usuario": None},
+    "sjf+capacidad": {"orden": "sjf", "capacidad": 500, "limite_usuario": None},
+    "sjf+capacidad+limite": {"orden": "sjf", "capacidad": 500, "limite_usuario": "2:4"},
+}
+CUANTILES = (50, 99, 99.9)
+
+def ejecutar(configuracion, predictor, args):
+    simulador = Simulador(predictor, semilla=args.semilla, num_servidores_inicial=args.servidores, tamano_reserva=0,
+                          limite_usuario=configuracion["limite_usuario"],
+                          planificador=Planificador(configuracion["orden"], args.envejecimiento,
+                                                    configuracion["capacidad"] or float("inf")),
+                          config_escalado={"min_servidores": args.servidores, "max_servidores": args.servidores})
+    for nombre, clientes in (("basico", args.basicos), ("avanzado", args.avanzados)):
+        for _ in range(clientes):
+            simulador.cliente(PERFILES[nombre], args.duracion)
+    informe = simulador.ejecutar(hasta=args.duracion + args.margen)
+    tipos = sorted(set(simulador.latencias_por_tipo) | set(simulador.rechazadas))
+    return {
+        "latencia_por_tipo": {tipo: percentiles(simulador.latencias_por_tipo.get(tipo, []), CUANTILES) for tipo in tipos},
+        "completadas_por_tipo": {tipo: len(simulador.latencias_por_tipo.get(tipo, [])) for tipo in tipos},
+        "rechazadas_por_tipo": {tipo: sum(simulador.rechazadas.get(tipo, {}).values()) for tipo in tipos},
+        "sin_terminar": len(simulador.llegadas),
+        "cola_max": informe["cola_max"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de las solicitudes ligeras bajo sobrecarga mixta por configuración de las colas")
+    parser.add_argument("--configuraciones", nargs="+", choices=list(CONFIGURACIONES), default=list(CONFIGURACIONES))
+    parser.add_argument("--duracion", type=float, default=600, help="Segundos simulados de llegadas")
+    parser.add_argument("--margen", type=float, default=60, help="Segundos simulados tras las llegadas para terminar las colas")
+    parser.add_argument("--servidores", type=int, default=2)
+    parser.add_argument("--basicos", type=int, default=10, help="Clientes del perfil básico (consultas simples)")
+    parser.add_argument("--avanzados", type=int, default=12, help="Clientes del perfil avanzado (complejas y código)")
+    parser.add_argument("--envejecimiento", type=float, default=ENVEJECIMIENTO)
+    parser.add_argument("--predictor", choices=["modelo", "coste"], default="modelo")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Imprime el resultado en JSON")
+    args = parser.parse_args()
+
+    predictor = DemandPredictor() if args.predictor == "modelo" else PredictorCoste()
+    resultados = {nombre: ejecutar(CONFIGURACIONES[nombre], predictor, args) for nombre in args.configuraciones}
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+    print(f"{args.servidores} servidores, {args.basicos} clientes básicos y {args.avanzados} avanzados durante {args.duracion:.0f} s simulados")
+    print(f"{'configuración':<22} {'tipo':<9} {'p50 s':>8} {'p99 s':>8} {'p99.9 s':>8} {'completadas':>12} {'rechazadas':>11}")
+    for nombre, r in resultados.items():
+        for tipo, latencia in r["latencia_por_tipo"].items():
+            valores = " ".join(f"{v:>8.2f}" if v is not None else f"{'-':>8}" for v in latencia.values())
+            print(f"{nombre:<22} {tipo:<9} {valores} {r['completadas_por_tipo'][tipo]:>12} {r['rechazadas_por_tipo'][tipo]:>11}")
+        print(f"{'':<22} cola máxima {r['cola_max']}, sin terminar {r['sin_terminar']}")
+
+if __name__ == "__main__":
+    main()
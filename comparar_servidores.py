@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from generador_carga import ConexionHTTP
+from perfiles_usuario import PERFILES, generar_solicitud
+from simulador import percentiles
+
+# Compara el rendimiento de /solicitud servido por Flask (app.py), por ASGI (app_asgi.py) y por el
+# frontal del cluster (app_cluster.py, con NUM_NODOS nodos; por defecto uno por núcleo).
+# Cada servidor se arranca en su propio proceso y recibe la misma carga cerrada: `concurrencia`
+# clientes que envían una solicitud tras otra durante `duracion` segundos. Los clientes hablan HTTP/1.1
+# directamente sobre asyncio (una ConexionHTTP de generador_carga.py cada uno) para que la carga consuma
+# poca CPU y no sea él el cuello de botella cuando comparte máquina con el servidor.
+COMANDOS = {
+    "flask": lambda puerto: [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(puerto)],
+    "asgi": lambda puerto: [sys.executable, "-m", "uvicorn", "app_asgi:app", "--port", str(puerto),
+                            "--no-access-log", "--log-level", "warning"],
+    "cluster": lambda puerto: [sys.executable, "-m", "uvicorn", "app_cluster:app", "--port", str(puerto),
+                               "--no-access-log", "--log-level", "warning"],
+}
+
+def arrancar(nombre, puerto, espera_max=120):
+    """Lanza el servidor y espera a que responda en /estado_servidores."""
+    # Sin los mensajes informativos (salvo que se pida otro NIVEL_LOG), que no forman parte de lo que se mide
+    entorno = {"NIVEL_LOG": "WARNING", **os.environ, "MODO_ARRANQUE": "solo_cargar"}
+    proceso = subprocess.Popen(COMANDOS[nombre](puerto), env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.monotonic() + espera_max
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor {nombre} terminó al arrancar (código {proceso.returncode})")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/estado_servidores", timeout=1) as respuesta:
+                if respuesta.status == 200:
+                    return proceso
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    proceso.terminate()
+    raise RuntimeError(f"El servidor {nombre} no respondió en {espera_max}s")
+
+def tiempo_cpu(pid):
+    """Segundos de CPU consumidos por un proceso (sólo Linux; None si no se puede leer /proc)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            campos = f.read().rsplit(")", 1)[1].split()
+        return (int(campos[11]) + int(campos[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+async def cliente(puerto, perfil, rng, fin, latencias, errores, lote):
+    """Envía solicitudes una a una a /solicitud o, con lote > 1, en grupos de `lote` a /solicitudes."""
+    conexion = ConexionHTTP(puerto)
+    while time.monotonic() < fin:
+        cuerpos = []
+        for _ in range(max(1, lote)):
+            user_id, _, texto = generar_solicitud(perfil, rng)
+            cuerpos.append({"user_id": user_id, "texto": texto})
+        inicio = time.perf_counter()
+        try:
+            if lote > 1:
+                codigo = await conexion.post_json("/solicitudes", cuerpos)
+            else:
+                codigo = await conexion.post_json("/solicitud", cuerpos[0])
+            if codigo == 200:
+                latencias.append(time.perf_counter() - inicio)
+            else:
+                errores.append(codigo)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            conexion.cerrar()
+            errores.append(type(e).__name__)
+    conexion.cerrar()
+
+async def medir(puerto, concurrencia, duracion, perfil, semilla, pid=None, lote=1):
+    """
+    Ejecuta la carga contra un servidor ya arrancado y devuelve rendimiento (en solicitudes individuales),
+    latencias (por petición HTTP) y CPU del servidor por solicitud.
+    """
+    latencias, errores = [], []
+    cpu_inicial = tiempo_cpu(pid) if pid is not None else None
+    inicio = time.monotonic()
+    fin = inicio + duracion
+    await asyncio.gather(*(cliente(puerto, PERFILES[perfil], random.Random(semilla + i), fin, latencias, errores, lote)
+                           for i in range(concurrencia)))
+    transcurrido = time.monotonic() - inicio
+    cpu_final = tiempo_cpu(pid) if pid is not None else None
+    completadas = len(latencias) * max(1, lote)
+    cpu_ms = None
+    if cpu_inicial is not None and cpu_final is not None and completadas:
+        cpu_ms = round((cpu_final - cpu_inicial) * 1000 / completadas, 3)
+    return {
+        "completadas": completadas,
+        "errores": len(errores),
+        "solicitudes_por_segundo": round(completadas / transcurrido, 1),
+        "latencia_ms": {p: round(v * 1000, 2) if v is not None else None for p, v in percentiles(latencias).items()},
+        "cpu_servidor_ms_por_solicitud": cpu_ms,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el rendimiento de /solicitud con Flask, ASGI y el cluster")
+    parser.add_argument("--servidores", nargs="+", choices=list(COMANDOS), default=list(COMANDOS))
+    parser.add_argument("--concurrencia", type=int, default=100, help="Clientes simultáneos")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de carga por servidor")
+    parser.add_argument("--perfil", choices=list(PERFILES), default="mixto")
+    parser.add_argument("--lote", type=int, default=1,
+                        help="Solicitudes por petición; con más de 1 se usa el endpoint /solicitudes")
+    parser.add_argument("--puerto", type=int, default=5050)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Imprime el resultado en JSON")
+    args = parser.parse_args()
+
+    resultados = {}
+    for nombre in args.servidores:
+        proceso = arrancar(nombre, args.puerto)
+        try:
+            resultados[nombre] = asyncio.run(medir(args.puerto, args.concurrencia, args.duracion, args.perfil,
+                                                    args.semilla, proceso.pid, args.lote))
+        finally:
+            proceso.terminate()
+            proceso.wait()
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+    print(f"{'servidor':<8} {'sol/s':>9} {'completadas':>12} {'errores':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'cpu ms/sol':>11}")
+    for nombre, r in resultados.items():
+        l = r["latencia_ms"]
+        print(f"{nombre:<8} {r['solicitudes_por_segundo']:>9} {r['completadas']:>12} {r['errores']:>8} "
+              f"{l['p50']:>8} {l['p95']:>8} {l['p99']:>8} {str(r['cpu_servidor_ms_por_solicitud']):>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+
+# Primitivas de sincronización para el estado compartido entre los hilos que atienden peticiones
+# (Flask con threaded=True, el ejecutor de app_asgi.py y los hilos de trabajo de los servidores).
+
+class LocksRayados:
+    """
+    Un conjunto fijo de locks repartidos por hash de la clave (lock striping): dos claves sólo
+    compiten si caen en la misma franja, en lugar de serializarse todas en un único lock global.
+    """
+    def __init__(self, num_franjas=64):
+        self.locks = [threading.Lock() for _ in range(num_franjas)]
+
+    def lock(self, clave):
+        return self.locks[hash(clave) % len(self.locks)]
+
+class ContadorAtomico:
+    """Número que se incrementa y decrementa de forma atómica desde varios hilos."""
+    __slots__ = ("_valor", "_lock")
+
+    def __init__(self, valor=0):
+        self._valor = valor
+        self._lock = threading.Lock()
+
+    def sumar(self, delta):
+        """Suma delta (que puede ser negativo) y devuelve el nuevo valor."""
+        with self._lock:
+            self._valor += delta
+            return self._valor
+
+    @property
+    def valor(self):
+        return self._valor
+
+class ListaCopiaEnEscritura:
+    """
+    Lista de lectura sin bloqueo: cada modificación publica una tupla nueva, así que quien la recorre
+    trabaja sobre una instantánea que no cambia aunque otro hilo añada o quite elementos a la vez.
+    Las escrituras (poco frecuentes, p. ej. al escalar) se serializan entre sí.
+    """
+    def __init__(self, elementos=()):
+        self._elementos = tuple(elementos)
+        self._lock = threading.Lock()
+
+    def instantanea(self):
+        return self._elementos
+
+    def append(self, elemento):
+        with self._lock:
+            self._elementos = self._elementos + (elemento,)
+
+    def remove(self, elemento):
+        with self._lock:
+            elementos = list(self._elementos)
+            elementos.remove(elemento)
+            self._elementos = tuple(elementos)
+
+    def __iter__(self):
+        return iter(self._elementos)
+
+    def __len__(self):
+        return len(self._elementos)
+
+    def __getitem__(self, indice):
+        return self._elementos[indice]
+
+    def __contains__(self, elemento):
+        return elemento in self._elementos
+
+    def __bool__(self):
+        return bool(self._elementos)
+
+class TablaRayada:
+    """
+    Diccionario repartido en franjas, cada una con su lock y su OrderedDict, con capacidad total acotada:
+    al superarla cada franja descarta sus entradas más antiguas. Con claves consecutivas (tickets)
+    las franjas se llenan por igual y el descarte equivale a descartar las más antiguas de toda la tabla.
+    """
+    def __init__(self, num_franjas=16, capacidad=None):
+        self.franjas = [(threading.Lock(), OrderedDict()) for _ in range(num_franjas)]
+        self.capacidad_franja = None if capacidad is None else max(1, -(-capacidad // num_franjas))
+
+    def _franja(self, clave):
+        return self.franjas[hash(clave) % len(self.franjas)]
+
+    def insertar(self, clave, valor):
+        lock, entradas = self._franja(clave)
+        with lock:
+            entradas[clave] = valor
+            if self.capacidad_franja is not None:
+                while len(entradas) > self.capacidad_franja:
+                    entradas.popitem(last=False)
+
+    def modificar(self, clave, **campos):
+        """Actualiza campos del diccionario guardado en la clave, si sigue en la tabla, y lo devuelve (o None)."""
+        lock, entradas = self._franja(clave)
+        with lock:
+            valor = entradas.get(clave)
+            if valor is not None:
+                valor.update(campos)
+            return valor
+
+    def copia(self, clave):
+        """Copia del diccionario guardado en la clave, o None si no existe o ya se descartó."""
+        lock, entradas = self._franja(clave)
+        with lock:
+            valor = entradas.get(clave)
+            return dict(valor) if valor is not None else None
+
+    def __contains__(self, clave):
+        return clave in self._franja(clave)[1]
+
+    def __len__(self):
+        return sum(len(entradas) for _, entradas in self.franjas)
@@ -0,0 +1,106 @@
+import logging
+import time
+import numpy as np
+import tensorflow as tf
+import analitica
+import telemetria
+from asignador_recursos import DemandPredictor, demanda_observada
+
+log = logging.getLogger(__name__)
+
+# Datos de entrenamiento del modelo de demanda sacados del tráfico registrado: cada solicitud completada
+# es un ejemplo con sus características (longitud y tipo) y su coste observado: el tiempo de procesamiento
+# en el servidor, en segundos, pasado a unidades de demanda, las que predice el modelo servido (ver
+# asignador_recursos.SEGUNDOS_POR_UNIDAD). Los registros se leen por bloques y pasan a un tf.data.Dataset
+# con barajado y prefetch, así que el entrenamiento usa la misma memoria con un registro de 1 MB que con
+# uno de 100 GB.
+
+def bloques_telemetria(directorio):
+    """Genera (X, y) por bloques de las solicitudes completadas de la telemetría de `directorio`."""
+    for columnas in telemetria.iterar(directorio, "completadas"):
+        yield _ejemplos(columnas)
+
+def bloques_csv(ruta):
+    """
+    Genera (X, y) por bloques de un CSV con el formato de datos_simulacion.csv. El exportado de la telemetría
+    trae el tiempo de procesamiento; en los antiguos el coste es tiempo_fin - tiempo_inicio, al segundo.
+    """
+    for _, completadas in analitica.bloques_csv(ruta):
+        columnas = dict(completadas)
+        if np.isnan(columnas["tiempo_procesamiento"]).all():
+            columnas["tiempo_procesamiento"] = columnas["tiempo_respuesta"]
+        yield _ejemplos(columnas)
+
+def _ejemplos(columnas):
+    # Las filas de ficheros anteriores a que la telemetría guardase tipo y longitud no sirven para entrenar
+    validas = (columnas["tipo"] != "") & np.isfinite(columnas["tiempo_procesamiento"])
+    X = DemandPredictor.matriz_caracteristicas(columnas["longitud"][validas], columnas["tipo"][validas])
+    return X, demanda_observada(columnas["tiempo_procesamiento"][validas]).astype(np.float32)
+
+class FuenteRegistros:
+    """
+    Ejemplos de un registro (`fuente` es una función que devuelve un generador de bloques (X, y)) repartidos
+    en entrenamiento y validación de forma determinista: una de cada `1 / fraccion_validacion` filas va a
+    validación, así que el reparto es el mismo en cada epoch sin guardar índices. Cuenta las filas que
+    entrega para medir el rendimiento del entrenamiento.
+    """
+    def __init__(self, fuente, fraccion_validacion=0.1):
+        self.fuente = fuente
+        self.cada = max(2, round(1 / fraccion_validacion))
+        self.filas = {"entrenamiento": 0, "validacion": 0}
+
+    def _generador(self, parte, tamano_lote, barajar):
+        vistas = 0
+        for X, y in self.fuente():
+            validacion = (np.arange(vistas, vistas + len(y)) % self.cada) == 0
+            vistas += len(y)
+            mascara = validacion if parte == "validacion" else ~validacion
+            X, y = X[mascara], y[mascara]
+            self.filas[parte] += len(y)
+            if barajar is not None:
+                orden = barajar.permutation(len(y))
+                X, y = X[orden], y[orden]
+            for inicio in range(0, len(y), tamano_lote):
+                yield X[inicio:inicio + tamano_lote], y[inicio:inicio + tamano_lote]
+
+    def dataset(self, parte, tamano_lote=256, buffer_barajado=65536, semilla=0):
+        """
+        tf.data.Dataset de una parte ("entrenamiento" o "validacion") en lotes de `tamano_lote` filas.
+        El de entrenamiento se baraja en dos niveles: las filas dentro de cada bloque leído (con NumPy) y
+        los lotes entre bloques con un búfer de `buffer_barajado` filas, que es la memoria que ocupa, no
+        el registro. Barajar lotes ya formados y no fila a fila evita que tf.data trate cada fila por
+        separado. Los dos se leen por delante del entrenamiento con prefetch.
+        """
+        firma = (tf.TensorSpec((None, len(DemandPredictor.TIPOS) + 1), tf.float32), tf.TensorSpec((None,), tf.float32))
+        barajar = np.random.default_rng(semilla) if parte == "entrenamiento" else None
+        dataset = tf.data.Dataset.from_generator(lambda: self._generador(parte, tamano_lote, barajar), output_signature=firma)
+        if barajar is not None:
+            dataset = dataset.shuffle(max(1, buffer_barajado // tamano_lote), seed=semilla, reshuffle_each_iteration=True)
+        return dataset.prefetch(tf.data.AUTOTUNE)
+
+class MedidorRendimiento(tf.keras.callbacks.Callback):
+    """Registra las filas por segundo de cada epoch y acumula el total del entrenamiento."""
+    def __init__(self, fuente):
+        super().__init__()
+        self.fuente = fuente
+        self.segundos = 0.0
+        self.filas = 0
+        self.epochs = 0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._inicio = time.perf_counter()
+        self._filas_inicio = self.fuente.filas["entrenamiento"]
+
+    def on_epoch_end(self, epoch, logs=None):
+        segundos = time.perf_counter() - self._inicio
+        filas = self.fuente.filas["entrenamiento"] - self._filas_inicio
+        self.segundos += segundos
+        self.filas += filas
+        self.epochs += 1
+        log.info("Epoch %d: %d filas en %.2f s (%.0f filas/s), loss=%.5f, val_loss=%s", epoch + 1, filas, segundos,
+                 filas / segundos if segundos > 0 else 0.0, (logs or {}).get("loss", float("nan")),
+                 (logs or {}).get("val_loss"))
+
+    @property
+    def filas_por_segundo(self):
+        return self.filas / self.segundos if self.segundos > 0 else 0.0
@@ -0,0 +1,159 @@
+import argparse
+import glob
+import os
+import time
+from artefacto_modelo import artefacto_vigente, escribir_metadatos, huella_datos, huella_ficheros, leer_metadatos, ruta_checkpoint
+from registro import configurar_registro
+
+# Datos de entrenamiento de ejemplo (puedes agregar más o usar un archivo CSV). La demanda de estos datos
+# define la unidad en que predice el modelo (ver asignador_recursos.SEGUNDOS_POR_UNIDAD)
+DATOS_ENTRENAMIENTO = [
+    ({"longitud": len("Consulta general"), "tipo": "simple"}, 1),
+    ({"longitud": len("Análisis de datos y predicciones"), "tipo": "compleja"}, 3),
+    ({"longitud": len("Ejecución de código Python"), "tipo": "codigo"}, 5),
+    ({"longitud": len("Otra consulta simple"), "tipo": "simple"}, 1),
+    ({"longitud": len("Solicitud compleja de análisis"), "tipo": "compleja"}, 4),
+    ({"longitud": len("Otro ejemplo de código"), "tipo": "codigo"}, 6)  # Nuevo dato
+]
+
+EPOCHS = 100
+
+# Entrenamiento con el tráfico registrado (ver datos_entrenamiento.py): lotes, búfer de barajado, fracción
+# de validación y epochs sin mejorar la pérdida de validación antes de parar
+TAMANO_LOTE = 256
+BUFFER_BARAJADO = 65536
+FRACCION_VALIDACION = 0.1
+PACIENCIA = 5
+
+def preparar_datos(datos=DATOS_ENTRENAMIENTO):
+    """Convierte los pares (características, demanda) en las listas X, y del entrenamiento."""
+    from asignador_recursos import DemandPredictor
+    X = [DemandPredictor.vector_caracteristicas(features) for features, _ in datos]
+    y = [demand for _, demand in datos]
+    return X, y
+
+def huella_actual(epochs=EPOCHS):
+    """Huella de los datos y parámetros de entrenamiento por defecto."""
+    X, y = preparar_datos()
+    return huella_datos(X, y, epochs=epochs)
+
+def unidad_demanda():
+    """Metadatos de la unidad en que predice el modelo: segundos de servidor por unidad de demanda."""
+    from asignador_recursos import SEGUNDOS_POR_UNIDAD
+    return {"segundos_por_unidad": SEGUNDOS_POR_UNIDAD}
+
+def modelo_vigente(model_path="demand_predictor_model.h5"):
+    """
+    Indica si el modelo guardado está al día para servir. Uno entrenado con registros (metadato "fuente")
+    lo está mientras no cambie el fichero y prediga en la unidad de demanda actual (los anteriores a
+    segundos_por_unidad aprendían segundos); el de los datos de ejemplo, si se entrenó con los actuales.
+    """
+    metadatos = leer_metadatos(model_path)
+    if metadatos is not None and metadatos.get("fuente"):
+        unidad_actual = metadatos.get("segundos_por_unidad") == unidad_demanda()["segundos_por_unidad"]
+        return unidad_actual and artefacto_vigente(model_path)
+    return artefacto_vigente(model_path, huella_actual())
+
+def entrenar(model_path="demand_predictor_model.h5", epochs=EPOCHS, forzar=False):
+    """Entrena y guarda el modelo si el artefacto no está al día (o siempre con forzar)."""
+    X, y = preparar_datos()
+    huella = huella_datos(X, y, epochs=epochs)
+    if not forzar and artefacto_vigente(model_path, huella):
+        print(f"El modelo {model_path} ya está al día; no se reentrena.")
+        return False
+    from asignador_recursos import DemandPredictor
+    demand_predictor = DemandPredictor(model_path, backend="keras")
+    inicio = time.perf_counter()
+    demand_predictor.train(X, y, epochs=epochs)
+    escribir_metadatos(model_path, huella, epochs=epochs, filas=len(X),
+                       segundos_entrenamiento=round(time.perf_counter() - inicio, 3), **unidad_demanda())
+    demand_predictor.exportar_pesos()
+    return True
+
+def entrenar_desde_registros(model_path="demand_predictor_model.h5", telemetria=None, csv=None, epochs=EPOCHS,
+                             tamano_lote=TAMANO_LOTE, buffer_barajado=BUFFER_BARAJADO,
+                             fraccion_validacion=FRACCION_VALIDACION, paciencia=PACIENCIA, reanudar=False):
+    """
+    Entrena el modelo con el coste observado de las solicitudes completadas en el directorio de `telemetria`
+    o en un `csv` de simulación, pasado a unidades de demanda, leyendo los registros por bloques en cada epoch. Para cuando la pérdida de
+    validación deja de mejorar durante `paciencia` epochs y se queda con los pesos del mejor; esos pesos se
+    guardan al final de cada epoch que mejora y con `reanudar` se parte de ellos. Devuelve los metadatos.
+    """
+    import tensorflow as tf
+    from asignador_recursos import DemandPredictor
+    from datos_entrenamiento import FuenteRegistros, MedidorRendimiento, bloques_csv, bloques_telemetria
+    if telemetria:
+        fuente, ficheros, descripcion = (lambda: bloques_telemetria(telemetria),
+                                         glob.glob(os.path.join(telemetria, "completadas-*.tlm")), f"telemetria:{telemetria}")
+    else:
+        fuente, ficheros, descripcion = lambda: bloques_csv(csv), [csv], f"csv:{csv}"
+    registros = FuenteRegistros(fuente, fraccion_validacion)
+    entrenamiento = registros.dataset("entrenamiento", tamano_lote, buffer_barajado)
+    validacion = registros.dataset("validacion", tamano_lote)
+
+    demand_predictor = DemandPredictor(model_path, backend="keras")
+    checkpoint = ruta_checkpoint(model_path)
+    if reanudar and os.path.exists(checkpoint):
+        demand_predictor.model.load_weights(checkpoint)
+    medidor = MedidorRendimiento(registros)
+    callbacks = [
+        medidor,
+        tf.keras.callbacks.EarlyStopping(monitor="val_loss", patience=paciencia, restore_best_weights=True),
+        tf.keras.callbacks.ModelCheckpoint(checkpoint, monitor="val_loss", save_best_only=True, save_weights_only=True),
+    ]
+    inicio = time.perf_counter()
+    historial = demand_predictor.train_dataset(entrenamiento, validacion, epochs, callbacks)
+    segundos = time.perf_counter() - inicio
+    configuracion = {"tamano_lote": tamano_lote, "buffer_barajado": buffer_barajado,
+                     "fraccion_validacion": fraccion_validacion, "paciencia": paciencia}
+    metadatos = escribir_metadatos(model_path, huella_ficheros(ficheros, epochs=epochs, **configuracion),
+                                   fuente=descripcion, epochs=epochs, epochs_ejecutados=medidor.epochs,
+                                   filas=medidor.filas // max(medidor.epochs, 1),
+                                   filas_validacion=registros.filas["validacion"] // max(medidor.epochs, 1),
+                                   mejor_val_loss=min(historial.history.get("val_loss", [float("nan")])),
+                                   filas_por_segundo=round(medidor.filas_por_segundo),
+                                   segundos_entrenamiento=round(segundos, 3), **configuracion, **unidad_demanda())
+    demand_predictor.exportar_pesos()
+    return metadatos
+
+def exportar(model_path="demand_predictor_model.h5"):
+    """Exporta los pesos del .h5 existente al artefacto NumPy de servicio."""
+    from asignador_recursos import DemandPredictor
+    return DemandPredictor(model_path, backend="keras").exportar_pesos()
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrena el modelo de predicción de demanda")
+    parser.add_argument("--modelo", default="demand_predictor_model.h5")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--forzar", action="store_true", help="Reentrena aunque el artefacto esté al día")
+    parser.add_argument("--registrar", action="store_true",
+                        help="No entrena: escribe los metadatos del modelo existente con los datos actuales")
+    parser.add_argument("--exportar", action="store_true",
+                        help="No entrena: exporta los pesos del modelo existente para servir sin TensorFlow")
+    registros = parser.add_mutually_exclusive_group()
+    registros.add_argument("--telemetria", help="Entrena con las solicitudes completadas de este directorio de telemetría")
+    registros.add_argument("--csv", help="Entrena con un CSV con el formato de datos_simulacion.csv")
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE)
+    parser.add_argument("--buffer-barajado", type=int, default=BUFFER_BARAJADO)
+    parser.add_argument("--validacion", type=float, default=FRACCION_VALIDACION, help="Fracción de filas para validación")
+    parser.add_argument("--paciencia", type=int, default=PACIENCIA)
+    parser.add_argument("--reanudar", action="store_true", help="Parte de los pesos del último checkpoint")
+    args = parser.parse_args()
+    configurar_registro()
+    if args.telemetria or args.csv:
+        metadatos = entrenar_desde_registros(args.modelo, args.telemetria, args.csv, args.epochs, args.lote,
+                                             args.buffer_barajado, args.validacion, args.paciencia, args.reanudar)
+        print(f"{metadatos['epochs_ejecutados']} epochs de {metadatos['filas']} filas en {metadatos['segundos_entrenamiento']:.1f} s "
+              f"({metadatos['filas_por_segundo']} filas/s); mejor val_loss={metadatos['mejor_val_loss']:.5f}")
+    elif args.exportar:
+        exportar(args.modelo)
+    elif args.registrar:
+        X, y = preparar_datos()
+        escribir_metadatos(args.modelo, huella_datos(X, y, epochs=args.epochs), epochs=args.epochs, filas=len(X),
+                           **unidad_demanda())
+        print(f"Metadatos registrados para {args.modelo}")
+    else:
+        entrenar(args.modelo, args.epochs, args.forzar)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,532 @@
+import argparse
+import asyncio
+import importlib
+import io
+import json
+import math
+import random
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import numpy as np
+from perfiles_usuario import PERFILES, generar_solicitud
+
+# Generador de carga de lazo abierto para /solicitud. Las solicitudes llegan según un proceso de Poisson
+# de tasa fija, por escalones o en rampa, sin esperar a que respondan las anteriores: un servidor lento
+# acumula solicitudes en vuelo en vez de frenar la carga, como haría un cliente de lazo cerrado justo cuando
+# más interesa medir. Cada solicitud sale de una mezcla de perfiles de perfiles_usuario.PERFILES y su
+# latencia se cuenta desde el instante en que debía enviarse, en histogramas de precisión relativa fija.
+# El destino es un servidor HTTP (con conexiones persistentes reutilizadas) o una aplicación ASGI o WSGI
+# cargada en el propio proceso, sin red:
+#   python generador_carga.py --destino http://127.0.0.1:8000 --llegadas rampa:10:500 --duracion 120
+#   python generador_carga.py --destino asgi:app_asgi:app --mezcla basico=3,avanzado=1 --llegadas poisson:200
+# usuario_basico.py, usuario_intermedio.py, usuario_avanzado.py y prueba_requests.py lo lanzan con su perfil.
+CUANTILES = (50, 90, 99, 99.9)
+
+class HistogramaLatencias:
+    """
+    Histograma de latencias al estilo de HdrHistogram: cuenta los valores en microsegundos en cubos cuyo
+    ancho crece con el valor, con `bits_precision` bits significativos (error relativo menor que
+    2 ** (1 - bits_precision), un 0,8 % con 8, o de 1 µs por debajo de 2 ** bits_precision µs) hasta
+    `maximo` segundos, en unos miles de contadores.
+    La memoria no depende del número de valores y dos histogramas se suman contador a contador.
+    """
+    def __init__(self, maximo=3600.0, bits_precision=8):
+        self.bits = bits_precision
+        self.maximo_us = int(maximo * 1e6)
+        self.contadores = np.zeros(self._indice(self.maximo_us) + 1, dtype=np.int64)
+        self.total = 0
+        self.suma = 0.0
+        self.minimo = math.inf
+        self.maximo = 0.0
+
+    def _indice(self, microsegundos):
+        # Los valores de `bits` bits o menos van uno por cubo; los mayores pierden los bits menos significativos
+        desplazamiento = max(0, microsegundos.bit_length() - self.bits)
+        return (desplazamiento << (self.bits - 1)) + (microsegundos >> desplazamiento)
+
+    def _valor(self, indice):
+        # Mayor valor del cubo, como HdrHistogram, para que los percentiles no se queden cortos
+        mitad = 1 << (self.bits - 1)
+        desplazamiento = max(0, indice // mitad - 1)
+        return ((indice - (desplazamiento << (self.bits - 1)) + 1) << desplazamiento) - 1
+
+    def registrar(self, segundos):
+        microsegundos = min(self.maximo_us, max(0, int(segundos * 1e6)))
+        self.contadores[self._indice(microsegundos)] += 1
+        self.total += 1
+        self.suma += segundos
+        self.minimo = min(self.minimo, segundos)
+        self.maximo = max(self.maximo, segundos)
+
+    def sumar(self, otro):
+        self.contadores += otro.contadores
+        self.total += otro.total
+        self.suma += otro.suma
+        self.minimo = min(self.minimo, otro.minimo)
+        self.maximo = max(self.maximo, otro.maximo)
+
+    def percentiles(self, cuantiles=CUANTILES):
+        """{"p50": segundos, ...} como simulador.percentiles; None sin valores."""
+        if not self.total:
+            return {f"p{q}": None for q in cuantiles}
+        acumulados = np.cumsum(self.contadores)
+        resultado = {}
+        for q in cuantiles:
+            indice = int(np.searchsorted(acumulados, max(1, math.ceil(self.total * q / 100))))
+            resultado[f"p{q}"] = min(self._valor(indice) / 1e6, self.maximo)
+        return resultado
+
+    def resumen(self, cuantiles=CUANTILES):
+        """Media, mínimo, percentiles y máximo en milisegundos."""
+        if not self.total:
+            return {"media": None, "min": None, **self.percentiles(cuantiles), "max": None}
+        valores = {"media": self.suma / self.total, "min": self.minimo, **self.percentiles(cuantiles), "max": self.maximo}
+        return {clave: round(v * 1000, 3) for clave, v in valores.items()}
+
+class Llegadas:
+    """
+    Instantes de llegada (segundos desde el inicio) de un proceso de Poisson con tasa `tasa(t)` solicitudes
+    por segundo, nunca mayor que `tasa_max`: se generan a la tasa máxima y cada una se queda con
+    probabilidad tasa(t) / tasa_max.
+    """
+    def __init__(self, tasa, tasa_max, descripcion):
+        self.tasa = tasa
+        self.tasa_max = tasa_max
+        self.descripcion = descripcion
+
+    def instantes(self, rng, duracion=None):
+        instante = 0.0
+        while self.tasa_max > 0:
+            instante += rng.expovariate(self.tasa_max)
+            if duracion and instante >= duracion:
+                return
+            if rng.random() * self.tasa_max < self.tasa(instante):
+                yield instante
+
+def crear_llegadas(especificacion, duracion=None):
+    """
+    --llegadas: "poisson:TASA" (tasa fija), "escalon:T1,T2,...:SEGUNDOS" (cada tasa durante SEGUNDOS; la
+    última se mantiene) o "rampa:DESDE:HASTA[:SEGUNDOS]" (de DESDE a HASTA en SEGUNDOS, por defecto toda
+    la duración, y después HASTA). Las tasas son solicitudes por segundo.
+    """
+    tipo, _, resto = especificacion.partition(":")
+    partes = resto.split(":")
+    try:
+        if tipo == "poisson" and len(partes) == 1:
+            tasa = float(partes[0])
+            return Llegadas(lambda t: tasa, tasa, f"Poisson a {tasa:g}/s")
+        if tipo == "escalon" and len(partes) == 2:
+            tasas = [float(t) for t in partes[0].split(",")]
+            paso = float(partes[1])
+            return Llegadas(lambda t: tasas[min(int(t // paso), len(tasas) - 1)], max(tasas),
+                            f"escalones de {paso:g} s a {', '.join(f'{t:g}' for t in tasas)}/s")
+        if tipo == "rampa" and len(partes) in (2, 3):
+            desde, hasta = float(partes[0]), float(partes[1])
+            segundos = float(partes[2]) if len(partes) == 3 else duracion
+            if not segundos:
+                raise ValueError("la rampa necesita su duración o --duracion")
+            return Llegadas(lambda t: desde + (hasta - desde) * min(1.0, t / segundos), max(desde, hasta),
+                            f"rampa de {desde:g}/s a {hasta:g}/s en {segundos:g} s")
+    except ValueError as e:
+        raise ValueError(f"Llegadas no válidas: {especificacion} ({e})") from None
+    raise ValueError(f"Llegadas no válidas: {especificacion}. Formatos: poisson:TASA, escalon:T1,T2,...:SEGUNDOS, "
+                     f"rampa:DESDE:HASTA[:SEGUNDOS]")
+
+def tasa_perfil(perfil):
+    """Solicitudes por segundo de los clientes de un perfil con su pausa media (lo que enviaba su antiguo script)."""
+    return perfil["clientes"] / (sum(perfil["pausa"]) / 2)
+
+def crear_mezcla(especificacion):
+    """
+    --mezcla: perfiles de perfiles_usuario.PERFILES con su peso ("basico=3,avanzado=1"). Un perfil sin
+    peso pesa su tasa natural (tasa_perfil). Devuelve {perfil: peso}.
+    """
+    mezcla = {}
+    for parte in especificacion.split(","):
+        nombre, _, peso = parte.strip().partition("=")
+        if nombre not in PERFILES:
+            raise ValueError(f"Perfil desconocido: {nombre}. Opciones: {', '.join(PERFILES)}")
+        mezcla[nombre] = float(peso) if peso else tasa_perfil(PERFILES[nombre])
+    return mezcla
+
+class ConexionHTTP:
+    """Conexión HTTP/1.1 persistente mínima; se reabre si el servidor la cierra (p. ej. Flask responde con HTTP/1.0)."""
+    def __init__(self, puerto, host="127.0.0.1"):
+        self.puerto = puerto
+        self.host = host
+        self.lector = self.escritor = None
+
+    async def post_json(self, ruta, cuerpo):
+        if self.escritor is None:
+            self.lector, self.escritor = await asyncio.open_connection(self.host, self.puerto)
+        datos = json.dumps(cuerpo).encode("utf-8")
+        self.escritor.write(f"POST {ruta} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                            f"Content-Length: {len(datos)}\r\n\r\n".encode("ascii") + datos)
+        cabecera = await self.lector.readuntil(b"\r\n\r\n")
+        lineas = cabecera.decode("latin-1").split("\r\n")
+        version, codigo = lineas[0].split(" ", 2)[:2]
+        cabeceras = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lineas[1:] if l)}
+        if "content-length" in cabeceras:
+            await self.lector.readexactly(int(cabeceras["content-length"]))
+        elif cabeceras.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                tamano = int((await self.lector.readuntil(b"\r\n")).split(b";")[0], 16)
+                await self.lector.readexactly(tamano + 2)
+                if tamano == 0:
+                    break
+        else:
+            await self.lector.read()
+            cabeceras["connection"] = "close"
+        if cabeceras.get("connection", "").lower() == "close" or version == "HTTP/1.0":
+            self.cerrar()
+        return int(codigo)
+
+    def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+        self.lector = self.escritor = None
+
+class TransporteHTTP:
+    """Hasta `conexiones` ConexionHTTP persistentes con un servidor; cada petición toma una libre o espera."""
+    def __init__(self, host, puerto, conexiones=64):
+        self.host = host
+        self.puerto = puerto
+        self.conexiones = conexiones
+        self._libres = []
+        self._semaforo = None
+
+    async def abrir(self):
+        self._semaforo = asyncio.Semaphore(self.conexiones)
+
+    async def post_json(self, ruta, cuerpo):
+        async with self._semaforo:
+            conexion = self._libres.pop() if self._libres else ConexionHTTP(self.puerto, self.host)
+            try:
+                codigo = await conexion.post_json(ruta, cuerpo)
+            except BaseException:
+                # También si se cancela por timeout: la respuesta pendiente dejaría la conexión desincronizada
+                conexion.cerrar()
+                raise
+            self._libres.append(conexion)
+            return codigo
+
+    async def cerrar(self):
+        for conexion in self._libres:
+            conexion.cerrar()
+        self._libres.clear()
+
+class TransporteASGI:
+    """Aplicación ASGI (p. ej. app_asgi:app) llamada en el propio bucle de eventos, con su ciclo de vida."""
+    def __init__(self, app):
+        self.app = app
+        self._estado = {}
+        self._entrada_ciclo = self._salida_ciclo = self._tarea_ciclo = None
+
+    async def abrir(self):
+        self._entrada_ciclo, self._salida_ciclo = asyncio.Queue(), asyncio.Queue()
+        self._tarea_ciclo = asyncio.get_running_loop().create_task(self._ciclo_vida())
+        await self._entrada_ciclo.put({"type": "lifespan.startup"})
+        mensaje = await self._salida_ciclo.get()
+        if mensaje["type"] == "lifespan.startup.failed":
+            raise RuntimeError(f"La aplicación ASGI no arrancó: {mensaje.get('message', '')}")
+
+    async def _ciclo_vida(self):
+        try:
+            await self.app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": self._estado},
+                           self._entrada_ciclo.get, self._salida_ciclo.put)
+        except Exception:
+            pass  # Aplicación sin ciclo de vida
+        finally:
+            await self._salida_ciclo.put({"type": "lifespan.fin"})
+
+    async def post_json(self, ruta, cuerpo):
+        datos = json.dumps(cuerpo).encode("utf-8")
+        alcance = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+            "path": ruta, "raw_path": ruta.encode("ascii"), "query_string": b"", "root_path": "",
+            "headers": [(b"host", b"local"), (b"content-type", b"application/json"),
+                        (b"content-length", str(len(datos)).encode("ascii"))],
+            "client": ("127.0.0.1", 0), "server": ("local", 80), "state": dict(self._estado),
+        }
+        leido = False
+        respondida = asyncio.Event()
+        codigo = None
+
+        async def recibir():
+            nonlocal leido
+            if not leido:
+                leido = True
+                return {"type": "http.request", "body": datos, "more_body": False}
+            await respondida.wait()
+            return {"type": "http.disconnect"}
+
+        async def enviar(mensaje):
+            nonlocal codigo
+            if mensaje["type"] == "http.response.start":
+                codigo = mensaje["status"]
+            elif mensaje["type"] == "http.response.body" and not mensaje.get("more_body", False):
+                respondida.set()
+
+        try:
+            await self.app(alcance, recibir, enviar)
+        finally:
+            respondida.set()
+        return codigo
+
+    async def cerrar(self):
+        if self._tarea_ciclo is not None and not self._tarea_ciclo.done():
+            await self._entrada_ciclo.put({"type": "lifespan.shutdown"})
+            await self._tarea_ciclo
+
+class TransporteWSGI:
+    """Aplicación WSGI (p. ej. app:app) llamada en el propio proceso desde `hilos` hilos."""
+    def __init__(self, app, hilos=32):
+        self.app = app
+        self.ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="wsgi")
+
+    async def abrir(self):
+        pass
+
+    async def post_json(self, ruta, cuerpo):
+        datos = json.dumps(cuerpo).encode("utf-8")
+        return await asyncio.get_running_loop().run_in_executor(self.ejecutor, self._llamar, ruta, datos)
+
+    def _llamar(self, ruta, datos):
+        estado = []
+
+        def iniciar_respuesta(status, cabeceras, exc_info=None):
+            estado.append(status)
+            return lambda _: None
+
+        entorno = {
+            "REQUEST_METHOD": "POST", "SCRIPT_NAME": "", "PATH_INFO": ruta, "QUERY_STRING": "",
+            "CONTENT_TYPE": "application/json", "CONTENT_LENGTH": str(len(datos)), "SERVER_NAME": "local",
+            "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1", "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.version": (1, 0), "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(datos),
+            "wsgi.errors": sys.stderr, "wsgi.multithread": True, "wsgi.multiprocess": False, "wsgi.run_once": False,
+        }
+        respuesta = self.app(entorno, iniciar_respuesta)
+        try:
+            for _ in respuesta:
+                pass
+        finally:
+            if hasattr(respuesta, "close"):
+                respuesta.close()
+        return int(estado[0].split(" ", 1)[0])
+
+    async def cerrar(self):
+        self.ejecutor.shutdown(wait=False)
+
+def crear_transporte(destino, conexiones=64):
+    """
+    --destino: URL de un servidor ("http://127.0.0.1:5000") o "asgi:MODULO:ATRIBUTO" / "wsgi:MODULO:ATRIBUTO"
+    para cargar la aplicación en este proceso (p. ej. asgi:app_asgi:app o wsgi:app:app).
+    """
+    tipo, _, resto = destino.partition(":")
+    if tipo in ("asgi", "wsgi"):
+        modulo, _, atributo = resto.partition(":")
+        app = getattr(importlib.import_module(modulo), atributo or "app")
+        return TransporteASGI(app) if tipo == "asgi" else TransporteWSGI(app, conexiones)
+    url = urlsplit(destino)
+    if url.scheme != "http" or not url.hostname:
+        raise ValueError(f"Destino no válido: {destino}. Formatos: http://HOST:PUERTO, asgi:MODULO:APP, wsgi:MODULO:APP")
+    return TransporteHTTP(url.hostname, url.port or 80, conexiones)
+
+class Estadisticas:
+    """Latencias de las respuestas 200 y respuestas por código (o por excepción) de un grupo de solicitudes."""
+    def __init__(self):
+        self.histograma = HistogramaLatencias()
+        self.codigos = Counter()
+        self.enviadas = 0
+
+    def registrar(self, codigo, latencia):
+        self.codigos[codigo] += 1
+        if codigo == 200:
+            self.histograma.registrar(latencia)
+
+    def resumen(self, segundos):
+        return {
+            "enviadas": self.enviadas,
+            "completadas_por_segundo": round(self.codigos[200] / segundos, 1) if segundos > 0 else None,
+            "codigos": {str(codigo): n for codigo, n in sorted(self.codigos.items(), key=lambda c: str(c[0]))},
+            "latencia_ms": self.histograma.resumen(),
+        }
+
+class GeneradorCarga:
+    """
+    Envía a /solicitud las solicitudes de la mezcla de perfiles `mezcla` ({perfil: peso}) en los instantes
+    de `llegadas` durante `duracion` segundos (None: hasta que se interrumpa). Con `max_en_vuelo` solicitudes
+    sin respuesta, las nuevas se descartan en lugar de retrasarse. Con `usuarios`, cada perfil reparte sus
+    solicitudes entre ese número de usuarios propios en lugar de los de PERFILES.
+    Acumula estadísticas totales, por perfil, por tipo de solicitud y por ventanas de `ventana` segundos;
+    `al_cerrar_ventana(indice, estadisticas)` se llama al terminar cada ventana.
+    """
+    def __init__(self, transporte, mezcla, llegadas, duracion=None, usuarios=None, max_en_vuelo=10000, timeout=30.0,
+                 ventana=10.0, semilla=0, al_cerrar_ventana=None):
+        self.transporte = transporte
+        self.llegadas = llegadas
+        self.duracion = duracion
+        self.max_en_vuelo = max_en_vuelo
+        self.timeout = timeout
+        self.ventana = ventana
+        self.al_cerrar_ventana = al_cerrar_ventana
+        self.rng = random.Random(semilla)
+        self.perfiles = {nombre: PERFILES[nombre] if not usuarios else
+                         {**PERFILES[nombre], "usuarios": [f"user_{nombre}_{i}" for i in range(usuarios)]}
+                         for nombre in mezcla}
+        self.nombres = list(mezcla)
+        self.pesos = [mezcla[nombre] for nombre in self.nombres]
+        self.total = Estadisticas()
+        self.por_perfil = {nombre: Estadisticas() for nombre in self.nombres}
+        self.por_tipo = {}
+        self.ventanas = []
+        self.en_vuelo = set()
+        self.retraso_max = 0.0  # Mayor retraso del generador sobre el instante previsto de un envío
+        self.segundos = 0.0
+        self.inicio = None
+        self._informadas = 0
+
+    def _ventana(self, instante):
+        indice = max(0, int((instante - self.inicio) // self.ventana))
+        while len(self.ventanas) <= indice:
+            self.ventanas.append(Estadisticas())
+        return self.ventanas[indice]
+
+    async def ejecutar(self):
+        bucle = asyncio.get_running_loop()
+        self.inicio = bucle.time()
+        informador = bucle.create_task(self._informar()) if self.al_cerrar_ventana else None
+        try:
+            for instante in self.llegadas.instantes(self.rng, self.duracion):
+                programada = self.inicio + instante
+                espera = programada - bucle.time()
+                self.retraso_max = max(self.retraso_max, -espera)
+                await asyncio.sleep(max(0.0, espera))
+                nombre = self.rng.choices(self.nombres, weights=self.pesos)[0]
+                user_id, tipo, texto = generar_solicitud(self.perfiles[nombre], self.rng)
+                grupos = (self.total, self.por_perfil[nombre], self.por_tipo.setdefault(tipo, Estadisticas()))
+                for estadisticas in (*grupos, self._ventana(programada)):
+                    estadisticas.enviadas += 1
+                if len(self.en_vuelo) >= self.max_en_vuelo:
+                    for estadisticas in grupos:
+                        estadisticas.registrar("descartada", 0.0)
+                    continue
+                tarea = bucle.create_task(self._enviar(programada, grupos, {"user_id": user_id, "texto": texto}))
+                self.en_vuelo.add(tarea)
+                tarea.add_done_callback(self.en_vuelo.discard)
+            if self.en_vuelo:
+                await asyncio.wait(self.en_vuelo)
+        finally:
+            self.segundos = bucle.time() - self.inicio
+            if informador is not None:
+                informador.cancel()
+                while self._informadas < len(self.ventanas):
+                    self._cerrar_ventana()
+
+    async def _enviar(self, programada, grupos, cuerpo):
+        try:
+            codigo = await asyncio.wait_for(self.transporte.post_json("/solicitud", cuerpo), self.timeout)
+        except TimeoutError:
+            codigo = "timeout"
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            codigo = type(e).__name__
+        ahora = asyncio.get_running_loop().time()
+        for estadisticas in (*grupos, self._ventana(ahora)):
+            estadisticas.registrar(codigo, ahora - programada)
+
+    async def _informar(self):
+        while True:
+            await asyncio.sleep(self.inicio + (self._informadas + 1) * self.ventana - asyncio.get_running_loop().time())
+            self._cerrar_ventana()
+
+    def _cerrar_ventana(self):
+        self.al_cerrar_ventana(self._informadas, self._ventana(self.inicio + self._informadas * self.ventana))
+        self._informadas += 1
+
+    def informe(self):
+        return {
+            "llegadas": self.llegadas.descripcion,
+            "segundos": round(self.segundos, 3),
+            "retraso_max_generador_ms": round(self.retraso_max * 1000, 3),
+            "total": self.total.resumen(self.segundos),
+            "por_perfil": {nombre: e.resumen(self.segundos) for nombre, e in self.por_perfil.items()},
+            "por_tipo": {tipo: e.resumen(self.segundos) for tipo, e in sorted(self.por_tipo.items())},
+            "ventanas": [{"inicio": i * self.ventana, "tasa_objetivo": round(self.llegadas.tasa((i + 0.5) * self.ventana), 1),
+                          **e.resumen(self.ventana)} for i, e in enumerate(self.ventanas)],
+        }
+
+async def _sesion(transporte, corrutina):
+    await transporte.abrir()
+    try:
+        return await corrutina(transporte)
+    finally:
+        await transporte.cerrar()
+
+def _fila(nombre, resumen):
+    codigos = resumen["codigos"]
+    otros = sum(n for codigo, n in codigos.items() if codigo not in ("200", "429", "503"))
+    latencia = " ".join(f"{v:>9.2f}" if v is not None else f"{'-':>9}"
+                        for v in (resumen["latencia_ms"][c] for c in ("p50", "p99", "p99.9", "max")))
+    return (f"{nombre:<20} {resumen['enviadas']:>9} {str(resumen['completadas_por_segundo']):>9} "
+            f"{codigos.get('429', 0):>7} {codigos.get('503', 0):>7} {otros:>7} {latencia}")
+
+CABECERA = f"{'':<20} {'enviadas':>9} {'200/s':>9} {'429':>7} {'503':>7} {'otros':>7} {'p50 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9} {'max ms':>9}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generador de carga de lazo abierto para /solicitud")
+    parser.add_argument("--destino", default="http://127.0.0.1:5000",
+                        help="URL del servidor o asgi:MODULO:APP / wsgi:MODULO:APP en este proceso")
+    parser.add_argument("--mezcla", default="basico,intermedio,avanzado",
+                        help="Perfiles con su peso, p. ej. basico=3,avanzado=1 (sin peso: su tasa natural)")
+    parser.add_argument("--llegadas", help="poisson:TASA, escalon:T1,T2,...:SEGUNDOS o rampa:DESDE:HASTA[:SEGUNDOS] "
+                                           "(por defecto Poisson a la tasa natural de los perfiles)")
+    parser.add_argument("--duracion", type=float, default=60.0, help="Segundos de carga; 0 hasta Ctrl+C")
+    parser.add_argument("--usuarios", type=int, help="Usuarios distintos por perfil (por defecto los de PERFILES)")
+    parser.add_argument("--conexiones", type=int, default=64, help="Conexiones persistentes (o hilos con wsgi:)")
+    parser.add_argument("--max-en-vuelo", type=int, default=10000, help="Solicitudes sin respuesta antes de descartar")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--ventana", type=float, default=10.0, help="Segundos de cada línea de progreso")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--actualizar-perfiles", action="store_true", help="Llama a /actualizar_perfiles al terminar")
+    parser.add_argument("--json", action="store_true", help="Imprime el resultado en JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        mezcla = crear_mezcla(args.mezcla)
+        llegadas = crear_llegadas(args.llegadas or f"poisson:{sum(tasa_perfil(PERFILES[n]) for n in mezcla):.3f}",
+                                  args.duracion or None)
+        transporte = crear_transporte(args.destino, args.conexiones)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def progreso(indice, estadisticas):
+        print(_fila(f"{indice * args.ventana:>7.0f} s a {llegadas.tasa((indice + 0.5) * args.ventana):>6.1f}/s",
+                    estadisticas.resumen(args.ventana)), flush=True)
+
+    generador = GeneradorCarga(transporte, mezcla, llegadas, args.duracion or None, args.usuarios, args.max_en_vuelo,
+                               args.timeout, args.ventana, args.semilla, None if args.json else progreso)
+    if not args.json:
+        print(f"{args.destino}: {llegadas.descripcion}, mezcla {', '.join(f'{n}={p:g}' for n, p in mezcla.items())}")
+        print(CABECERA)
+    try:
+        asyncio.run(_sesion(transporte, lambda _: generador.ejecutar()))
+    except KeyboardInterrupt:
+        print("Carga interrumpida", file=sys.stderr)
+    if args.actualizar_perfiles:
+        asyncio.run(_sesion(crear_transporte(args.destino), lambda t: t.post_json("/actualizar_perfiles", {})))
+
+    informe = generador.informe()
+    if args.json:
+        print(json.dumps(informe, indent=2))
+        return
+    print(f"\n{informe['segundos']:.1f} s, retraso máximo del generador {informe['retraso_max_generador_ms']:.1f} ms")
+    print(CABECERA)
+    print(_fila("total", informe["total"]))
+    for grupo in ("por_perfil", "por_tipo"):
+        for nombre, resumen in informe[grupo].items():
+            print(_fila(nombre, resumen))
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,125 @@
-class GestorUsuarios:
+import time
+from concurrencia import LocksRayados
+from historial_columnar import HistorialColumnar
+
+class ContadoresUsuario:
+    """Contadores de solicitudes de un usuario con los que se decide su perfil."""
+    __slots__ = ("total", "complejas", "codigo", "instante")
+
     def __init__(self):
+        self.total = 0
+        self.complejas = 0
+        self.codigo = 0
+        self.instante = 0.0  # Instante de la última solicitud, para el decaimiento
+
+class GestorUsuarios:
+    def __init__(self, ventana=None, semivida=None, retencion=1000, retencion_segundos=None, persistencia=None,
+                 num_franjas=64):
+        if ventana is not None and retencion_segundos is not None:
+            raise ValueError("La ventana por número de solicitudes no es compatible con la retención por antigüedad")
         self.perfiles = {}  # {user_id: perfil}
-        self.historial = {}  # {user_id: [lista de solicitudes]}
+        self.contadores = {}  # {user_id: ContadoresUsuario}
+        # Opcional: contar sólo las últimas `ventana` solicitudes, o que cada solicitud
+        # pese la mitad cada `semivida` segundos. Sin ninguno se cuenta todo el historial.
+        self.ventana = ventana
+        self.semivida = semivida
+        # El historial retiene al menos la ventana para saber qué solicitud sale de ella
+        self.historial = HistorialColumnar(max(retencion, ventana or 0), retencion_segundos)
+        # Backend opcional (ver persistencia.py) que recibe cada cambio para poder restaurarlo al reiniciar
+        self.persistencia = persistencia
+        # Las operaciones de un usuario se serializan con el lock de su franja; usuarios de franjas
+        # distintas se atienden en paralelo. También mantiene el orden de sus eventos en la persistencia.
+        self.locks = LocksRayados(num_franjas)
+
+    def restaurar(self):
+        """Carga el estado guardado por la persistencia y devuelve las solicitudes que quedaron en cola."""
+        if self.persistencia is None:
+            return []
+        return self.persistencia.cargar(self)
 
     def obtener_perfil(self, user_id):
         """
         Obtiene el perfil de un usuario. Si no existe, lo crea con un perfil básico.
         """
-        if user_id not in self.perfiles:
-            self.perfiles[user_id] = "basico"
-            self.historial[user_id] = []
-        return self.perfiles[user_id]
+        perfil = self.perfiles.get(user_id)
+        if perfil is None:
+            with self.locks.lock(user_id):
+                if user_id not in self.perfiles:
+                    self.historial.crear(user_id)
+                    self.perfiles[user_id] = "basico"
+                perfil = self.perfiles[user_id]
+        return perfil
+
+    def perfil_actual(self, user_id):
+        """
+        Perfil de un usuario sin darlo de alta: básico si todavía no existe.
+        """
+        return self.perfiles.get(user_id, "basico")
 
     def registrar_solicitud(self, user_id, solicitud):
         """
-        Registra una solicitud en el historial del usuario.
+        Registra una solicitud en el historial del usuario y actualiza sus contadores.
         """
-        if user_id not in self.historial:
-            self.historial[user_id] = []
-        self.historial[user_id].append(solicitud)
+        self._registrar(user_id, solicitud, time.time())
+
+    def _registrar(self, user_id, solicitud, ahora):
+        with self.locks.lock(user_id):
+            self._registrar_sin_lock(user_id, solicitud, ahora)
+
+    def _registrar_sin_lock(self, user_id, solicitud, ahora):
+        tipo = solicitud["tipo"]
+        contadores = self.contadores.get(user_id)
+        if contadores is None:
+            contadores = self.contadores[user_id] = ContadoresUsuario()
+        if self.semivida is not None:
+            if contadores.total:
+                factor = 0.5 ** ((ahora - contadores.instante) / self.semivida)
+                contadores.total *= factor
+                contadores.complejas *= factor
+                contadores.codigo *= factor
+        elif self.ventana is not None and self.historial.num_solicitudes(user_id) >= self.ventana:
+            # La solicitud que queda fuera de la ventana se lee del propio historial
+            self._sumar(contadores, self.historial.tipo_desde_final(user_id, self.ventana), -1)
+        contadores.instante = ahora
+        self._sumar(contadores, tipo, 1)
+        self.historial.agregar(user_id, solicitud["longitud"], tipo, ahora)
+        if self.persistencia is not None:
+            self.persistencia.registrar_solicitud(user_id, ahora, solicitud["longitud"], tipo, contadores)
+
+    @staticmethod
+    def _sumar(contadores, tipo, cantidad):
+        contadores.total += cantidad
+        if tipo == "compleja":
+            contadores.complejas += cantidad
+        elif tipo == "codigo":
+            contadores.codigo += cantidad
 
     def actualizar_perfil(self, user_id):
         """
-        Actualiza el perfil del usuario en función de su historial de solicitudes.
+        Actualiza el perfil del usuario en función de los contadores de su historial.
         """
-        if user_id not in self.historial:
+        if user_id not in self.contadores:
             return
 
-        historial = self.historial[user_id]
-        num_solicitudes = len(historial)
-        num_complejas = sum(1 for s in historial if s["tipo"] == "compleja")
-        num_codigo = sum(1 for s in historial if s["tipo"] == "codigo")
-
-        if num_solicitudes >= 15 and num_codigo >= 5:
-            self.perfiles[user_id] = "avanzado"
-        elif num_solicitudes >= 10 and num_complejas >= 3:
-            self.perfiles[user_id] = "intermedio"
-        else:
-            self.perfiles[user_id] = "basico"
-    
+        with self.locks.lock(user_id):
+            contadores = self.contadores[user_id]
+            num_solicitudes, num_complejas, num_codigo = contadores.total, contadores.complejas, contadores.codigo
+
+            if num_solicitudes >= 15 and num_codigo >= 5:
+                perfil = "avanzado"
+            elif num_solicitudes >= 10 and num_complejas >= 3:
+                perfil = "intermedio"
+            else:
+                perfil = "basico"
+            if self.perfiles.get(user_id) != perfil:
+                self.perfiles[user_id] = perfil
+                if self.persistencia is not None:
+                    self.persistencia.registrar_perfil(user_id, perfil)
+
     def actualizar_perfiles(self):
       """
       Actualiza los perfiles de todos los usuarios registrados.
       """
-      for user_id in self.historial.keys():
-          self.actualizar_perfil(user_id)
\ No newline at end of file
+      # Se recorre una copia de las claves: otros hilos pueden dar de alta usuarios mientras tanto
+      for user_id in list(self.contadores):
+          self.actualizar_perfil(user_id)
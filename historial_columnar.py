@@ -0,0 +1,197 @@
+import threading
+import time
+import numpy as np
+
+# Registro empaquetado de una solicitud: 8 + 2 + 1 = 11 bytes
+DTYPE_SOLICITUD = np.dtype([("timestamp", "<f8"), ("longitud", "<u2"), ("tipo", "u1")])
+
+class TablaTipos:
+    """Interna los tipos de solicitud como códigos uint8."""
+    def __init__(self, tipos=("simple", "compleja", "codigo")):
+        self.nombres = []
+        self.codigos = {}
+        self._lock = threading.Lock()
+        for tipo in tipos:
+            self.codigo(tipo)
+
+    def codigo(self, tipo):
+        codigo = self.codigos.get(tipo)
+        if codigo is None:
+            with self._lock:
+                codigo = self.codigos.get(tipo)
+                if codigo is None:
+                    if len(self.nombres) >= 256:
+                        raise ValueError("No caben más de 256 tipos de solicitud en un uint8")
+                    self.nombres.append(tipo)
+                    codigo = self.codigos[tipo] = len(self.nombres) - 1
+        return codigo
+
+    def nombre(self, codigo):
+        return self.nombres[codigo]
+
+class RegistroUsuario:
+    """Búfer circular de solicitudes de un usuario; crece por duplicación hasta la retención."""
+    __slots__ = ("datos", "inicio", "tamano")
+
+    def __init__(self, capacidad_inicial):
+        self.datos = np.zeros(capacidad_inicial, dtype=DTYPE_SOLICITUD)
+        self.inicio = 0
+        self.tamano = 0
+
+    def ordenado(self):
+        """Vista (o copia si el búfer da la vuelta) de los registros en orden cronológico."""
+        fin = self.inicio + self.tamano
+        if fin <= len(self.datos):
+            return self.datos[self.inicio:fin]
+        return np.concatenate((self.datos[self.inicio:], self.datos[:fin - len(self.datos)]))
+
+class HistorialColumnar:
+    """
+    Historial de solicitudes por usuario en búferes circulares NumPy de registros empaquetados
+    (timestamp, longitud:uint16, tipo:uint8), con retención por número de registros y por antigüedad.
+    """
+    def __init__(self, retencion=1000, retencion_segundos=None, capacidad_inicial=4, tipos=None):
+        self.retencion = retencion
+        self.retencion_segundos = retencion_segundos
+        self.capacidad_inicial = min(capacidad_inicial, retencion)
+        self.tipos = tipos or TablaTipos()
+        self.usuarios = {}  # {user_id: RegistroUsuario}
+        # Usuarios cuyo historial aún está en disco: {user_id: clave} y cargador(clave) -> array de registros
+        self.perezosos = {}
+        self.cargador = None
+        self._lock_carga = threading.Lock()
+
+    def __contains__(self, user_id):
+        return user_id in self.usuarios or user_id in self.perezosos
+
+    def __len__(self):
+        return len(self.usuarios) + len(self.perezosos)
+
+    def keys(self):
+        # Se copia perezosos antes que usuarios: un usuario que se carga entre ambas copias
+        # aparece en las dos (y se deduplica) en lugar de en ninguna
+        perezosos = list(self.perezosos)
+        return list(dict.fromkeys(list(self.usuarios) + perezosos))
+
+    def cargar_perezoso(self, claves, cargador):
+        """
+        Registra historiales que se leerán de disco la primera vez que se usen,
+        de modo que el arranque no depende del tamaño del historial.
+        """
+        self.perezosos.update(claves)
+        self.cargador = cargador
+
+    def _registro(self, user_id):
+        registro = self.usuarios.get(user_id)
+        if registro is None and user_id in self.perezosos:
+            with self._lock_carga:
+                registro = self.usuarios.get(user_id)
+                if registro is None and user_id in self.perezosos:
+                    datos = np.asarray(self.cargador(self.perezosos[user_id]), dtype=DTYPE_SOLICITUD)[-self.retencion:]
+                    capacidad = self.capacidad_inicial
+                    while capacidad < len(datos):
+                        capacidad *= 2
+                    registro = RegistroUsuario(min(capacidad, self.retencion))
+                    registro.datos[:len(datos)] = datos
+                    registro.tamano = len(datos)
+                    # Se publica en usuarios antes de quitarlo de perezosos para que nunca parezca no existir
+                    self.usuarios[user_id] = registro
+                    del self.perezosos[user_id]
+        return registro
+
+    def crear(self, user_id):
+        """Crea el historial vacío de un usuario si no existe."""
+        registro = self._registro(user_id)
+        if registro is None:
+            registro = self.usuarios[user_id] = RegistroUsuario(self.capacidad_inicial)
+        return registro
+
+    def agregar(self, user_id, longitud, tipo, timestamp=None):
+        """Añade una solicitud al historial del usuario, descartando las que exceden la retención."""
+        registro = self.crear(user_id)
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.retencion_segundos is not None:
+            self._caducar(registro, timestamp - self.retencion_segundos)
+        capacidad = len(registro.datos)
+        if registro.tamano == capacidad and capacidad < self.retencion:
+            # Se duplica la capacidad dejando los registros en orden desde la posición 0
+            nuevos = np.zeros(min(capacidad * 2, self.retencion), dtype=DTYPE_SOLICITUD)
+            nuevos[:registro.tamano] = registro.ordenado()
+            registro.datos = nuevos
+            registro.inicio = 0
+            capacidad = len(nuevos)
+        posicion = (registro.inicio + registro.tamano) % capacidad
+        registro.datos[posicion] = (timestamp, min(longitud, 0xFFFF), self.tipos.codigo(tipo))
+        if registro.tamano == capacidad:
+            registro.inicio = (registro.inicio + 1) % capacidad
+        else:
+            registro.tamano += 1
+
+    def _caducar(self, registro, limite):
+        capacidad = len(registro.datos)
+        while registro.tamano and registro.datos[registro.inicio]["timestamp"] < limite:
+            registro.inicio = (registro.inicio + 1) % capacidad
+            registro.tamano -= 1
+
+    def num_solicitudes(self, user_id):
+        registro = self._registro(user_id)
+        return registro.tamano if registro is not None else 0
+
+    def tipo_desde_final(self, user_id, posicion):
+        """Tipo de la solicitud situada `posicion` registros antes de la última (1 = la última)."""
+        registro = self._registro(user_id)
+        if posicion > registro.tamano:
+            return None
+        indice = (registro.inicio + registro.tamano - posicion) % len(registro.datos)
+        return self.tipos.nombre(int(registro.datos[indice]["tipo"]))
+
+    def registros(self, user_id, ultimos=None, desde=None):
+        """Array estructurado de las solicitudes del usuario en orden cronológico."""
+        registro = self._registro(user_id)
+        if registro is None:
+            return np.empty(0, dtype=DTYPE_SOLICITUD)
+        datos = registro.ordenado()
+        if desde is not None:
+            datos = datos[datos["timestamp"] >= desde]
+        if ultimos is not None:
+            datos = datos[-ultimos:] if ultimos else datos[:0]
+        return datos
+
+    def contar_tipos(self, user_id, ultimos=None, desde=None):
+        """{tipo: número de solicitudes} del usuario, calculado con np.bincount."""
+        codigos = self.registros(user_id, ultimos, desde)["tipo"]
+        cuentas = np.bincount(codigos, minlength=len(self.tipos.nombres))
+        return {nombre: int(cuentas[i]) for i, nombre in enumerate(self.tipos.nombres)}
+
+    def lista(self, user_id):
+        """Historial del usuario como lista de diccionarios, con el formato de AnalizadorSolicitudes."""
+        return [{"longitud": int(r["longitud"]), "tipo": self.tipos.nombre(int(r["tipo"]))}
+                for r in self.registros(user_id)]
+
+    def columnas(self, desde=None, hasta=None):
+        """
+        Todas las solicitudes retenidas como columnas para analítica:
+        (user_ids, índice de usuario por fila, timestamp, longitud, tipo).
+        """
+        user_ids = self.keys()
+        bloques = [self._registro(u).ordenado() for u in user_ids]
+        tamanos = np.array([len(b) for b in bloques], dtype=np.int64)
+        datos = np.concatenate(bloques) if bloques else np.empty(0, dtype=DTYPE_SOLICITUD)
+        indices = np.repeat(np.arange(len(user_ids), dtype=np.int32), tamanos)
+        mascara = np.ones(len(datos), dtype=bool)
+        if desde is not None:
+            mascara &= datos["timestamp"] >= desde
+        if hasta is not None:
+            mascara &= datos["timestamp"] < hasta
+        return user_ids, indices[mascara], datos["timestamp"][mascara], datos["longitud"][mascara], datos["tipo"][mascara]
+
+    def exportar(self):
+        """Genera (user_id, registros) de todos los usuarios sin cargar en memoria los que siguen en disco."""
+        for user_id, registro in list(self.usuarios.items()):
+            yield user_id, registro.ordenado()
+        for user_id, clave in list(self.perezosos.items()):
+            yield user_id, np.asarray(self.cargador(clave), dtype=DTYPE_SOLICITUD)[-self.retencion:]
+
+    def memoria(self):
+        """Bytes ocupados por los búferes de registros cargados en memoria."""
+        return sum(r.datos.nbytes for r in self.usuarios.values())
@@ -0,0 +1,170 @@
+import bisect
+import math
+import threading
+
+# Métricas del servicio en el formato de texto de Prometheus (GET /metrics), sin dependencias externas.
+# Cada proceso tiene su registro METRICAS con las métricas de abajo; en el cluster el frontal reúne las
+# de todos los procesos y las distingue con la etiqueta "origen".
+
+# Límites de los buckets de latencia en segundos: de 50 µs a 10 s
+BUCKETS_LATENCIA = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0)
+
+class _Contador:
+    __slots__ = ("valor", "_lock")
+
+    def __init__(self):
+        self.valor = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, cantidad=1):
+        with self._lock:
+            self.valor += cantidad
+
+class _Histograma:
+    __slots__ = ("limites", "cuentas", "suma", "_lock")
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.cuentas = [0] * (len(limites) + 1)  # El último es +Inf
+        self.suma = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, valor, veces=1):
+        """Registra `veces` observaciones de `valor` (p. ej. el tiempo medio por solicitud de un lote)."""
+        posicion = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            self.cuentas[posicion] += veces
+            self.suma += valor * veces
+
+class Metrica:
+    """
+    Familia de métricas con las mismas etiquetas. etiquetas(*valores) devuelve la serie de esos valores
+    (conviene guardarla si se usa en la ruta caliente); sin etiquetas, la propia familia actúa como serie.
+    """
+    def __init__(self, nombre, ayuda, tipo, nombres_etiquetas=(), crear=None, funcion=None):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.tipo = tipo
+        self.nombres_etiquetas = tuple(nombres_etiquetas)
+        self._crear = crear
+        self.funcion = funcion  # Indicadores: se evalúa al exportar y devuelve el valor o {valores de etiquetas: valor}
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def etiquetas(self, *valores):
+        serie = self._series.get(valores)
+        if serie is None:
+            if len(valores) != len(self.nombres_etiquetas):
+                raise ValueError(f"{self.nombre} espera las etiquetas {self.nombres_etiquetas}")
+            with self._lock:
+                serie = self._series.setdefault(valores, self._crear())
+        return serie
+
+    def inc(self, cantidad=1):
+        self.etiquetas().inc(cantidad)
+
+    def observar(self, valor, veces=1):
+        self.etiquetas().observar(valor, veces)
+
+    def muestras(self):
+        """Lista de (nombre de la muestra, {etiqueta: valor}, valor) de todas las series."""
+        if self.funcion is not None:
+            valor = self.funcion()
+            valores = valor if isinstance(valor, dict) else {(): valor}
+            return [(self.nombre, dict(zip(self.nombres_etiquetas, clave)), v) for clave, v in valores.items()]
+        muestras = []
+        for clave, serie in list(self._series.items()):
+            etiquetas = dict(zip(self.nombres_etiquetas, clave))
+            if self.tipo == "histogram":
+                with serie._lock:
+                    cuentas, suma = list(serie.cuentas), serie.suma
+                acumulado = 0
+                for limite, cuenta in zip(serie.limites + (math.inf,), cuentas):
+                    acumulado += cuenta
+                    muestras.append((f"{self.nombre}_bucket", {**etiquetas, "le": _numero(limite)}, acumulado))
+                muestras.append((f"{self.nombre}_sum", etiquetas, suma))
+                muestras.append((f"{self.nombre}_count", etiquetas, acumulado))
+            else:
+                muestras.append((self.nombre, etiquetas, serie.valor))
+        return muestras
+
+class RegistroMetricas:
+    def __init__(self):
+        self.metricas = {}
+
+    def _registrar(self, metrica):
+        return self.metricas.setdefault(metrica.nombre, metrica)
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._registrar(Metrica(nombre, ayuda, "counter", etiquetas, crear=_Contador))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), limites=BUCKETS_LATENCIA):
+        return self._registrar(Metrica(nombre, ayuda, "histogram", etiquetas, crear=lambda: _Histograma(tuple(limites))))
+
+    def indicador(self, nombre, ayuda, funcion, etiquetas=()):
+        """Indicador calculado al exportar; si ya existe se sustituye su función (p. ej. por un pool nuevo)."""
+        metrica = self._registrar(Metrica(nombre, ayuda, "gauge", etiquetas))
+        metrica.funcion = funcion
+        return metrica
+
+    def muestras(self):
+        """Estado de todas las métricas como datos simples, para enviarlo de un proceso a otro."""
+        return [(m.nombre, m.tipo, m.ayuda, m.muestras()) for m in list(self.metricas.values())]
+
+    def exposicion(self):
+        return formatear({None: self.muestras()})
+
+def _numero(valor):
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    if float(valor).is_integer() and abs(valor) < 1e15:
+        return str(int(valor))
+    return repr(float(valor))
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    escapar = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in etiquetas.items()) + "}"
+
+def formatear(muestras_por_origen):
+    """
+    Texto de exposición de Prometheus a partir de {origen: RegistroMetricas.muestras()}. Con un origen
+    distinto de None sus series llevan la etiqueta origen="..."; cada familia se escribe una sola vez.
+    """
+    familias = {}  # {nombre: (tipo, ayuda, [líneas])}
+    for origen, muestras in muestras_por_origen.items():
+        for nombre, tipo, ayuda, series in muestras:
+            lineas = familias.setdefault(nombre, (tipo, ayuda, []))[2]
+            for nombre_muestra, etiquetas, valor in series:
+                if origen is not None:
+                    etiquetas = {"origen": origen, **etiquetas}
+                lineas.append(f"{nombre_muestra}{_etiquetas(etiquetas)} {_numero(valor)}")
+    salida = []
+    for nombre, (tipo, ayuda, lineas) in familias.items():
+        salida.append(f"# HELP {nombre} {ayuda}")
+        salida.append(f"# TYPE {nombre} {tipo}")
+        salida.extend(lineas)
+    return "\n".join(salida) + "\n"
+
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+METRICAS = RegistroMetricas()
+
+# Duración de cada etapa de una solicitud: analizar, predecir, perfil (registro y actualización),
+# encolar (asignación a un servidor), espera_cola y procesamiento (en el servidor)
+LATENCIA_ETAPA = METRICAS.histograma("latencia_etapa_segundos", "Duración de cada etapa del procesamiento de una solicitud", ("etapa",))
+SOLICITUDES = METRICAS.contador("solicitudes_total", "Solicitudes aceptadas por tipo", ("tipo",))
+SOLICITUDES_NO_VALIDAS = METRICAS.contador("solicitudes_no_validas_total", "Solicitudes rechazadas por datos no válidos")
+# Rechazos del control de admisión (ver planificador.py): limite_usuario (429), saturado (503) y desalojada
+# (encolada y sacada de la cola por otra de mejor prioridad con el pool lleno)
+SOLICITUDES_RECHAZADAS = METRICAS.contador("solicitudes_rechazadas_total", "Solicitudes no admitidas o desalojadas por motivo", ("motivo",))
+ERRORES = METRICAS.contador("errores_total", "Errores internos por ruta", ("ruta",))
+COMPLETADAS = METRICAS.contador("solicitudes_completadas_total", "Solicitudes procesadas por los servidores")
+ESCALADOS = METRICAS.contador("escalados_total", "Servidores añadidos o retirados por el autoescalado", ("sentido",))
+ACTUALIZACIONES_MODELO = METRICAS.contador("actualizaciones_modelo_total",
+                                           "Ajustes en línea del modelo por resultado (aceptada, rechazada, revertida)", ("resultado",))
+# Consultas a la caché de textos de /solicitud (ver cache_textos.py): local (en la del proceso), compartida
+# (en la tabla en memoria compartida entre procesos) o fallo (el texto se analiza)
+CACHE_TEXTOS = METRICAS.contador("cache_textos_total", "Consultas a la caché de textos por resultado", ("resultado",))
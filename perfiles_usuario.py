@@ -0,0 +1,56 @@
+# Perfiles de carga de los scripts de prueba: usuarios, textos por tipo de solicitud, peso de cada tipo,
+# pausa (mínima, máxima) en segundos entre solicitudes de un cliente y número de clientes concurrentes.
+PERFILES = {
+    "basico": {
+        "usuarios": ["user_basico_1", "user_basico_2", "user_basico_3"],
+        "textos": {
+            "simple": ["Consulta general", "Duda sobre el servicio", "Información de contacto"]
+        },
+        "pesos": {"simple": 1.0},
+        "pausa": (2, 5),
+        "clientes": 1
+    },
+    "intermedio": {
+        "usuarios": ["user_intermedio_1", "user_intermedio_2", "user_intermedio_3"],
+        "textos": {
+            "simple": ["Consulta sobre mi plan", "Duda sobre la factura", "Cambiar mi suscripción"],
+            "compleja": ["Análisis de datos de mi cuenta", "Informe de uso del último mes", "Solicitud de integración con API"],
+            "codigo": ["Ejecución de script simple", "Prueba de API"]
+        },
+        "pesos": {"simple": 0.4, "compleja": 0.4, "codigo": 0.2},
+        "pausa": (1, 3),
+        "clientes": 1
+    },
+    "avanzado": {
+        "usuarios": ["user_avanzado_1", "user_avanzado_2", "user_avanzado_3"],
+        "textos": {
+            "compleja": ["Análisis avanzado de datos", "Informe de rendimiento personalizado", "Predicciones de mercado", "Optimización de modelo de ML"],
+            "codigo": ["Ejecución de código Python complejo", "Automatización de tareas con scripts", "Integración de API avanzada", "Depuración de código"]
+        },
+        "pesos": {"compleja": 0.6, "codigo": 0.4},
+        "pausa": (0.5, 1.5),
+        "clientes": 1
+    },
+    "mixto": {
+        "usuarios": ["user123", "user456", "user789", "user000", "user111", "user222", "user333", "user444"],
+        "textos": {
+            "simple": ["Consulta general", "Duda sobre el servicio", "Información de contacto", "Horario de atención", "Estado de mi pedido", "Precios y planes", "Soporte técnico", "Hacer una reserva"],
+            "compleja": ["Análisis de datos y predicciones", "Solicitud compleja de análisis", "Informe detallado", "Estudio de mercado", "Integración con API", "Desarrollo personalizado", "Consulta de seguridad", "Auditoría de datos"],
+            "codigo": ["Ejecución de código Python", "Prueba de script", "Solicitud de API", "Integración de código", "Depuración de código", "Optimización de script", "Revisión de código", "Automatización de tareas"]
+        },
+        "pesos": {"simple": 1.0, "compleja": 1.0, "codigo": 1.0},
+        "pausa": (0.5, 2),
+        "clientes": 5
+    }
+}
+
+def generar_solicitud(perfil, rng):
+    """Devuelve (user_id, tipo, texto) de una solicitud aleatoria del perfil usando el generador rng."""
+    user_id = rng.choice(perfil["usuarios"])
+    tipos = list(perfil["pesos"])
+    tipo = rng.choices(tipos, weights=[perfil["pesos"][t] for t in tipos])[0]
+    return user_id, tipo, rng.choice(perfil["textos"][tipo])
+
+def pausa(perfil, rng):
+    """Segundos que espera un cliente del perfil antes de su siguiente solicitud."""
+    return rng.uniform(*perfil["pausa"])
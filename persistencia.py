@@ -0,0 +1,348 @@
+import json
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+import numpy as np
+from gestor_usuarios import ContadoresUsuario, GestorUsuarios
+from historial_columnar import DTYPE_SOLICITUD, TablaTipos
+
+# Eventos que se persisten (tuplas serializables en JSON):
+#   ("s", user_id, timestamp, longitud, tipo, total, complejas, codigo, instante)  solicitud registrada
+#   ("p", user_id, perfil)                                                        cambio de perfil
+#   ("e", ticket, user_id, caracteristicas)                                        solicitud encolada
+#   ("c", ticket)                                                                  solicitud completada
+
+class Persistencia:
+    """Persistencia nula: el estado sólo vive en memoria, como hasta ahora."""
+    def cargar(self, gestor):
+        """Restaura el estado guardado en el gestor y devuelve las solicitudes que quedaron en cola."""
+        return []
+
+    def registrar_solicitud(self, user_id, timestamp, longitud, tipo, contadores):
+        pass
+
+    def registrar_perfil(self, user_id, perfil):
+        pass
+
+    def registrar_encolada(self, ticket, user_id, caracteristicas):
+        pass
+
+    def registrar_completada(self, ticket):
+        pass
+
+    def cerrar(self):
+        pass
+
+class PersistenciaAsincrona(Persistencia):
+    """Base de los backends reales: encola los eventos y un hilo los escribe por lotes fuera de la ruta de la petición."""
+    def __init__(self, intervalo=0.05, tamano_lote=1000):
+        self.intervalo = intervalo
+        self.tamano_lote = tamano_lote
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def registrar_solicitud(self, user_id, timestamp, longitud, tipo, contadores):
+        self._cola.put(("s", user_id, timestamp, longitud, tipo,
+                        contadores.total, contadores.complejas, contadores.codigo, contadores.instante))
+
+    def registrar_perfil(self, user_id, perfil):
+        self._cola.put(("p", user_id, perfil))
+
+    def registrar_encolada(self, ticket, user_id, caracteristicas):
+        self._cola.put(("e", ticket, user_id, caracteristicas))
+
+    def registrar_completada(self, ticket):
+        self._cola.put(("c", ticket))
+
+    def cerrar(self):
+        """Escribe los eventos pendientes y detiene el hilo de escritura."""
+        self._cola.put(None)
+        self._hilo.join()
+
+    def _bucle(self):
+        while True:
+            lote = []
+            terminar = False
+            try:
+                lote.append(self._cola.get(timeout=self.intervalo))
+                while len(lote) < self.tamano_lote:
+                    lote.append(self._cola.get_nowait())
+            except queue.Empty:
+                pass
+            if None in lote:
+                terminar = True
+                lote = [evento for evento in lote if evento is not None]
+            if lote:
+                self.escribir_lote(lote)
+            self.tras_lote(terminar)
+            if terminar:
+                break
+
+    def escribir_lote(self, lote):
+        raise NotImplementedError
+
+    def tras_lote(self, terminar):
+        """Mantenimiento periódico del backend tras cada lote."""
+
+    @staticmethod
+    def aplicar(evento, gestor, pendientes):
+        """Aplica un evento al estado de un gestor y al diccionario {ticket: (user_id, caracteristicas)}."""
+        clase = evento[0]
+        if clase == "s":
+            _, user_id, timestamp, longitud, tipo, total, complejas, codigo, instante = evento
+            gestor.historial.agregar(user_id, longitud, tipo, timestamp)
+            contadores = gestor.contadores.get(user_id)
+            if contadores is None:
+                contadores = gestor.contadores[user_id] = ContadoresUsuario()
+            contadores.total, contadores.complejas, contadores.codigo, contadores.instante = total, complejas, codigo, instante
+            gestor.perfiles.setdefault(user_id, "basico")
+        elif clase == "p":
+            gestor.perfiles[evento[1]] = evento[2]
+        elif clase == "e":
+            pendientes[evento[1]] = (evento[2], evento[3])
+        elif clase == "c":
+            pendientes.pop(evento[1], None)
+
+    def descartar_pendientes(self, pendientes):
+        """Marca como completados los tickets restaurados; se volverán a encolar con tickets nuevos."""
+        for ticket in pendientes:
+            self.registrar_completada(ticket)
+        return [pendientes[ticket] for ticket in sorted(pendientes)]
+
+class PersistenciaWAL(PersistenciaAsincrona):
+    """
+    Log de escritura anticipada (JSON por líneas) más instantáneas periódicas en un directorio.
+
+    La instantánea K contiene el estado de los segmentos wal-N con N < K; al arrancar se carga la
+    instantánea indicada en ACTUAL y se reproducen los segmentos posteriores. El historial de la
+    instantánea se abre con mmap y cada usuario se lee la primera vez que se usa.
+    """
+    def __init__(self, directorio, intervalo_snapshot=300.0, sincronizar=True, retencion=1000, **config):
+        self.directorio = directorio
+        self.intervalo_snapshot = intervalo_snapshot
+        self.sincronizar = sincronizar
+        self.retencion = retencion
+        os.makedirs(directorio, exist_ok=True)
+        self.generacion_snapshot = self._leer_actual()
+        # Se escribe siempre en un segmento nuevo para no continuar una línea a medias tras un fallo
+        self.generacion = max([self.generacion_snapshot] + self._segmentos()) + 1
+        self.fichero = open(self._ruta_segmento(self.generacion), 'a', encoding='utf-8')
+        self.ultimo_snapshot = time.monotonic()
+        super().__init__(**config)
+
+    def _ruta_segmento(self, generacion):
+        return os.path.join(self.directorio, f"wal-{generacion:06d}.log")
+
+    def _ruta_snapshot(self, generacion):
+        return os.path.join(self.directorio, f"snapshot-{generacion:06d}")
+
+    def _leer_actual(self):
+        try:
+            with open(os.path.join(self.directorio, "ACTUAL"), encoding='utf-8') as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return 0
+
+    def _segmentos(self):
+        return sorted(int(nombre[4:10]) for nombre in os.listdir(self.directorio)
+                      if nombre.startswith("wal-") and nombre.endswith(".log"))
+
+    def cargar(self, gestor):
+        pendientes = self._cargar_en(gestor, self.generacion_snapshot, self.generacion)
+        return self.descartar_pendientes(pendientes)
+
+    def _cargar_en(self, gestor, generacion_snapshot, hasta):
+        """Carga la instantánea y reproduce los segmentos [generacion_snapshot, hasta) en el gestor."""
+        pendientes = {}
+        ruta = self._ruta_snapshot(generacion_snapshot)
+        if os.path.isdir(ruta):
+            with open(os.path.join(ruta, "estado.json"), encoding='utf-8') as f:
+                estado = json.load(f)
+            gestor.historial.tipos = TablaTipos(estado["tipos"])
+            desplazamientos = np.load(os.path.join(ruta, "desplazamientos.npy"))
+            ruta_historial = os.path.join(ruta, "historial.bin")
+            datos = (np.memmap(ruta_historial, dtype=DTYPE_SOLICITUD, mode='r')
+                     if os.path.getsize(ruta_historial) else np.empty(0, dtype=DTYPE_SOLICITUD))
+            gestor.historial.cargar_perezoso(
+                {user_id: i for i, user_id in enumerate(estado["usuarios"]) if desplazamientos[i + 1] > desplazamientos[i]},
+                lambda i: datos[desplazamientos[i]:desplazamientos[i + 1]])
+            for user_id, perfil, valores in zip(estado["usuarios"], estado["perfiles"], estado["contadores"]):
+                if perfil:
+                    gestor.perfiles[user_id] = perfil
+                if valores is not None:
+                    contadores = gestor.contadores[user_id] = ContadoresUsuario()
+                    contadores.total, contadores.complejas, contadores.codigo, contadores.instante = valores
+            pendientes = {int(ticket): tuple(valor) for ticket, valor in estado["pendientes"].items()}
+        for generacion in self._segmentos():
+            if generacion_snapshot <= generacion < hasta:
+                with open(self._ruta_segmento(generacion), encoding='utf-8') as f:
+                    for linea in f:
+                        try:
+                            evento = json.loads(linea)
+                        except ValueError:
+                            break  # Última línea incompleta tras un fallo
+                        self.aplicar(evento, gestor, pendientes)
+        return pendientes
+
+    def escribir_lote(self, lote):
+        self.fichero.write("".join(json.dumps(evento, ensure_ascii=False, separators=(',', ':')) + "\n" for evento in lote))
+        self.fichero.flush()
+        if self.sincronizar:
+            os.fsync(self.fichero.fileno())
+
+    def tras_lote(self, terminar):
+        # Al cerrar también se compacta para que el siguiente arranque sólo tenga que abrir la instantánea
+        if terminar or time.monotonic() - self.ultimo_snapshot >= self.intervalo_snapshot:
+            self.compactar()
+        if terminar:
+            self.fichero.close()
+
+    def compactar(self):
+        """Abre un segmento nuevo y funde la instantánea vigente con los segmentos cerrados en una nueva."""
+        self.fichero.close()
+        cerrado = self.generacion
+        self.generacion += 1
+        self.fichero = open(self._ruta_segmento(self.generacion), 'a', encoding='utf-8')
+        self.ultimo_snapshot = time.monotonic()
+
+        estado = GestorUsuarios(retencion=self.retencion)
+        pendientes = self._cargar_en(estado, self.generacion_snapshot, cerrado + 1)
+        nueva = cerrado + 1
+        self._escribir_snapshot(estado, pendientes, nueva)
+        anterior = self.generacion_snapshot
+        ruta_actual = os.path.join(self.directorio, "ACTUAL")
+        with open(ruta_actual + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(str(nueva))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ruta_actual + ".tmp", ruta_actual)
+        self.generacion_snapshot = nueva
+        # Los datos de la instantánea anterior que sigan mapeados en memoria siguen siendo legibles
+        shutil.rmtree(self._ruta_snapshot(anterior), ignore_errors=True)
+        for generacion in self._segmentos():
+            if generacion < nueva:
+                os.remove(self._ruta_segmento(generacion))
+
+    def _escribir_snapshot(self, estado, pendientes, generacion):
+        ruta = self._ruta_snapshot(generacion)
+        temporal = ruta + ".tmp"
+        shutil.rmtree(temporal, ignore_errors=True)
+        os.makedirs(temporal)
+        # El historial se escribe usuario a usuario para no tenerlo entero en memoria
+        usuarios = []
+        tamanos = []
+        with open(os.path.join(temporal, "historial.bin"), 'wb') as f:
+            for user_id, registros in estado.historial.exportar():
+                f.write(np.ascontiguousarray(registros).tobytes())
+                usuarios.append(user_id)
+                tamanos.append(len(registros))
+            f.flush()
+            os.fsync(f.fileno())
+        vistos = set(usuarios)
+        resto = [u for u in dict.fromkeys([*estado.perfiles, *estado.contadores]) if u not in vistos]
+        usuarios += resto
+        tamanos += [0] * len(resto)
+        desplazamientos = np.zeros(len(usuarios) + 1, dtype=np.int64)
+        np.cumsum(tamanos, out=desplazamientos[1:])
+        np.save(os.path.join(temporal, "desplazamientos.npy"), desplazamientos)
+        contadores = []
+        for user_id in usuarios:
+            c = estado.contadores.get(user_id)
+            contadores.append(None if c is None else [c.total, c.complejas, c.codigo, c.instante])
+        with open(os.path.join(temporal, "estado.json"), 'w', encoding='utf-8') as f:
+            json.dump({
+                "tipos": estado.historial.tipos.nombres,
+                "usuarios": usuarios,
+                "perfiles": [estado.perfiles.get(u, "") for u in usuarios],
+                "contadores": contadores,
+                "pendientes": {str(ticket): list(valor) for ticket, valor in pendientes.items()}
+            }, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(temporal, ruta)
+
+class PersistenciaSQLite(PersistenciaAsincrona):
+    """
+    Estado en una base SQLite en modo WAL. Al arrancar se leen contadores y perfiles;
+    el historial de cada usuario se consulta la primera vez que se usa.
+    """
+    def __init__(self, ruta, retencion=1000, **config):
+        self.ruta = ruta
+        self.retencion = retencion
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS usuarios (
+                user_id TEXT PRIMARY KEY, total REAL, complejas REAL, codigo REAL, instante REAL, perfil TEXT);
+            CREATE TABLE IF NOT EXISTS solicitudes (user_id TEXT, timestamp REAL, longitud INTEGER, tipo TEXT);
+            CREATE INDEX IF NOT EXISTS solicitudes_usuario ON solicitudes (user_id, timestamp);
+            CREATE TABLE IF NOT EXISTS cola (ticket INTEGER PRIMARY KEY, user_id TEXT, caracteristicas TEXT);
+        """)
+        self.conexion.commit()
+        self.lock_lectura = threading.Lock()
+        self.lectura = sqlite3.connect(ruta, check_same_thread=False)
+        super().__init__(**config)
+
+    def cargar(self, gestor):
+        for user_id, total, complejas, codigo, instante, perfil in self.lectura.execute("SELECT * FROM usuarios"):
+            if total is not None:
+                contadores = gestor.contadores[user_id] = ContadoresUsuario()
+                contadores.total, contadores.complejas, contadores.codigo, contadores.instante = total, complejas, codigo, instante
+            gestor.perfiles[user_id] = perfil or "basico"
+        tipos = gestor.historial.tipos
+
+        def cargador(user_id):
+            with self.lock_lectura:
+                filas = self.lectura.execute(
+                    "SELECT timestamp, longitud, tipo FROM solicitudes WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+                    (user_id, self.retencion)).fetchall()
+            return np.array([(t, l, tipos.codigo(tipo)) for t, l, tipo in reversed(filas)], dtype=DTYPE_SOLICITUD)
+
+        gestor.historial.cargar_perezoso({user_id: user_id for user_id in gestor.contadores}, cargador)
+        pendientes = {ticket: (user_id, json.loads(caracteristicas))
+                      for ticket, user_id, caracteristicas in self.lectura.execute("SELECT * FROM cola")}
+        return self.descartar_pendientes(pendientes)
+
+    def escribir_lote(self, lote):
+        with self.conexion:
+            for evento in lote:
+                clase = evento[0]
+                if clase == "s":
+                    _, user_id, timestamp, longitud, tipo, total, complejas, codigo, instante = evento
+                    self.conexion.execute("INSERT INTO solicitudes VALUES (?, ?, ?, ?)", (user_id, timestamp, longitud, tipo))
+                    self.conexion.execute(
+                        "INSERT INTO usuarios VALUES (?, ?, ?, ?, ?, 'basico') ON CONFLICT(user_id) DO UPDATE SET "
+                        "total = excluded.total, complejas = excluded.complejas, codigo = excluded.codigo, instante = excluded.instante",
+                        (user_id, total, complejas, codigo, instante))
+                elif clase == "p":
+                    self.conexion.execute(
+                        "INSERT INTO usuarios (user_id, perfil) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET perfil = excluded.perfil",
+                        (evento[1], evento[2]))
+                elif clase == "e":
+                    self.conexion.execute("INSERT OR REPLACE INTO cola VALUES (?, ?, ?)",
+                                          (evento[1], evento[2], json.dumps(evento[3], ensure_ascii=False)))
+                elif clase == "c":
+                    self.conexion.execute("DELETE FROM cola WHERE ticket = ?", (evento[1],))
+
+    def tras_lote(self, terminar):
+        if terminar:
+            self.conexion.close()
+
+def crear_persistencia(especificacion):
+    """
+    Crea el backend indicado como "wal:<directorio>" o "sqlite:<fichero>";
+    una especificación vacía devuelve la persistencia nula.
+    """
+    if not especificacion:
+        return Persistencia()
+    tipo, _, ruta = especificacion.partition(":")
+    if tipo == "wal":
+        return PersistenciaWAL(ruta or "estado")
+    if tipo == "sqlite":
+        return PersistenciaSQLite(ruta or "estado.db")
+    raise ValueError(f"Persistencia desconocida: {especificacion}")
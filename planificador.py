@@ -0,0 +1,224 @@
+import heapq
+import itertools
+import math
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+# Planificación y control de admisión del pool de servidores:
+#  - Cada servidor atiende su cola por prioridad y no por orden de llegada. Sale antes la solicitud con
+#    menor demanda predicha dividida por el peso del perfil de su usuario (primero el trabajo más corto,
+#    ponderado por perfil), y la espera la va adelantando (envejecimiento), así que ninguna se queda sin
+#    atender por muchas ligeras que lleguen.
+#  - El pool tiene una capacidad máxima de solicitudes en cola. Lleno, una solicitud nueva sólo entra si
+#    desaloja a la de peor prioridad encolada, que se da por rechazada; si no, se rechaza ella (503).
+#  - Opcionalmente cada usuario tiene una cubeta de tokens con la tasa y la ráfaga de su perfil (429).
+# Los rechazos se deciden sin esperar, antes de registrar la solicitud en el historial del usuario.
+
+# Peso de cada perfil en la prioridad: la demanda de un usuario básico cuenta como la mitad que la de uno
+# avanzado, de modo que sus consultas ligeras no esperan detrás de las ráfagas de código de los avanzados
+PESOS_PERFIL = {"basico": 2.0, "intermedio": 1.5, "avanzado": 1.0}
+# Unidades de demanda (ver asignador_recursos.SEGUNDOS_POR_UNIDAD) que gana una solicitud por cada segundo de espera
+ENVEJECIMIENTO = 0.02
+# Solicitudes en cola (o en proceso) en todo el pool
+CAPACIDAD = 50000
+ORDENES = ("sjf", "fifo")
+
+class SolicitudRechazada(Exception):
+    """Solicitud no admitida; `codigo` es el estado HTTP y `reintentar_en` los segundos para Retry-After."""
+    codigo = 503
+    motivo = "saturado"
+
+    def __init__(self, mensaje, reintentar_en=1.0):
+        super().__init__(mensaje, reintentar_en)
+        self.mensaje = mensaje
+        self.reintentar_en = reintentar_en
+
+    def __str__(self):
+        return self.mensaje
+
+    def cuerpo(self):
+        """Campos de la respuesta de rechazo (también de cada elemento rechazado de /solicitudes)."""
+        return {'error': self.mensaje, 'codigo': self.codigo, 'reintentar_en': self.reintentar_en}
+
+class LimiteUsuarioExcedido(SolicitudRechazada):
+    codigo = 429
+    motivo = "limite_usuario"
+
+class ServicioSaturado(SolicitudRechazada):
+    codigo = 503
+    motivo = "saturado"
+
+def rechazo_desde_cuerpo(cuerpo):
+    """Vuelve a crear la excepción a partir de SolicitudRechazada.cuerpo() (p. ej. la respuesta de un nodo)."""
+    clase = LimiteUsuarioExcedido if cuerpo['codigo'] == LimiteUsuarioExcedido.codigo else ServicioSaturado
+    return clase(cuerpo['error'], cuerpo['reintentar_en'])
+
+def cabeceras_rechazo(rechazo):
+    return {'Retry-After': str(max(1, math.ceil(rechazo.reintentar_en)))}
+
+class Planificador:
+    """Prioridad de cada solicitud en las colas de los servidores y capacidad del pool."""
+    def __init__(self, orden="sjf", envejecimiento=ENVEJECIMIENTO, capacidad=CAPACIDAD, pesos_perfil=None):
+        if orden not in ORDENES:
+            raise ValueError(f"Orden de cola desconocido: {orden}. Opciones: {', '.join(ORDENES)}")
+        self.orden = orden
+        self.envejecimiento = envejecimiento
+        self.capacidad = capacidad
+        self.pesos_perfil = PESOS_PERFIL if pesos_perfil is None else pesos_perfil
+
+    def clave(self, demanda, perfil, llegada):
+        """
+        Clave de prioridad (sale antes la menor). La prioridad efectiva de una solicitud que lleva esperando
+        t segundos es demanda / peso - envejecimiento * t; como t avanza igual para todas, ordenarlas por
+        demanda / peso + envejecimiento * llegada da el mismo orden con una clave fija.
+        """
+        if self.orden == "fifo":
+            return llegada
+        return demanda / self.pesos_perfil.get(perfil, 1.0) + self.envejecimiento * llegada
+
+class ColaPlanificada:
+    """
+    Cola de un servidor que entrega primero el elemento de menor clave, con la interfaz de queue.Queue que
+    usa el hilo de trabajo (put, get, task_done, qsize). Además permite desalojar el de mayor clave: hay un
+    montículo para cada extremo y los elementos que salen por uno se descartan del otro al llegar a su cima.
+    Los elementos que no son desalojables (p. ej. la marca de parada del servidor) sólo están en el primero.
+    """
+    def __init__(self):
+        self._menores = []  # (clave, secuencia, elemento)
+        self._mayores = []  # (-clave, -secuencia, elemento): entre iguales se desaloja el más reciente
+        self._vivos = set()  # Secuencias de los elementos en cola
+        self._secuencia = itertools.count()
+        self._condicion = threading.Condition(threading.Lock())
+
+    def put(self, elemento, clave=0.0, desalojable=True):
+        with self._condicion:
+            secuencia = next(self._secuencia)
+            heapq.heappush(self._menores, (clave, secuencia, elemento))
+            if desalojable:
+                heapq.heappush(self._mayores, (-clave, -secuencia, elemento))
+            self._vivos.add(secuencia)
+            self._condicion.notify()
+
+    def get(self, block=True, timeout=None):
+        with self._condicion:
+            if not self._condicion.wait_for(lambda: self._vivos, timeout if block else 0):
+                raise queue.Empty
+            while True:
+                _, secuencia, elemento = heapq.heappop(self._menores)
+                if secuencia in self._vivos:
+                    break
+            self._vivos.remove(secuencia)
+            self._compactar()
+            return elemento
+
+    def task_done(self):
+        """Compatibilidad con queue.Queue; la cola no lleva la cuenta de elementos terminados."""
+
+    def qsize(self):
+        return len(self._vivos)
+
+    def __len__(self):
+        return len(self._vivos)
+
+    def _cima_mayores(self):
+        while self._mayores and -self._mayores[0][1] not in self._vivos:
+            heapq.heappop(self._mayores)
+        return self._mayores[0] if self._mayores else None
+
+    def peor_clave(self):
+        """Clave del elemento que se desalojaría, o None si la cola está vacía."""
+        with self._condicion:
+            cima = self._cima_mayores()
+            return None if cima is None else -cima[0]
+
+    def desalojar_peor(self, clave):
+        """Saca y devuelve el elemento de mayor clave si es mayor que `clave`; si no, devuelve None."""
+        with self._condicion:
+            cima = self._cima_mayores()
+            if cima is None or -cima[0] <= clave:
+                return None
+            heapq.heappop(self._mayores)
+            self._vivos.remove(-cima[1])
+            self._compactar()
+            return cima[2]
+
+    def _compactar(self):
+        # Las entradas de elementos que ya salieron por el otro extremo se quitan cuando superan a los vivos
+        limite = 2 * len(self._vivos) + 64
+        if len(self._menores) > limite:
+            self._menores = [entrada for entrada in self._menores if entrada[1] in self._vivos]
+            heapq.heapify(self._menores)
+        if len(self._mayores) > limite:
+            self._mayores = [entrada for entrada in self._mayores if -entrada[1] in self._vivos]
+            heapq.heapify(self._mayores)
+
+class CubetaTokens:
+    __slots__ = ("tasa", "rafaga", "tokens", "instante")
+
+    def __init__(self, tasa, rafaga, instante):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.tokens = rafaga
+        self.instante = instante
+
+    def tomar(self, ahora):
+        """Gasta un token y devuelve 0, o devuelve los segundos que faltan para que haya uno."""
+        self.tokens = min(self.rafaga, self.tokens + (ahora - self.instante) * self.tasa)
+        self.instante = ahora
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.tasa
+
+class LimitadorUsuarios:
+    """
+    Cubeta de tokens por usuario con la (tasa en solicitudes/s, ráfaga) de su perfil en `limites`
+    ({perfil: (tasa, ráfaga)}; la clave None vale para los perfiles que no estén). Las cubetas se reparten
+    en franjas con su lock y se conservan las de los `max_usuarios` usuarios más recientes.
+    """
+    def __init__(self, limites, max_usuarios=100000, num_franjas=16, reloj=time.monotonic):
+        self.limites = limites
+        self.reloj = reloj
+        self.franjas = [(threading.Lock(), OrderedDict()) for _ in range(num_franjas)]
+        self.max_por_franja = max(1, -(-max_usuarios // num_franjas))
+
+    def admitir(self, user_id, perfil=None):
+        """Gasta un token del usuario o lanza LimiteUsuarioExcedido."""
+        limite = self.limites.get(perfil, self.limites.get(None))
+        if limite is None:
+            return
+        lock, cubetas = self.franjas[hash(user_id) % len(self.franjas)]
+        ahora = self.reloj()
+        with lock:
+            cubeta = cubetas.get(user_id)
+            if cubeta is None:
+                cubeta = cubetas[user_id] = CubetaTokens(*limite, ahora)
+                if len(cubetas) > self.max_por_franja:
+                    cubetas.popitem(last=False)
+            else:
+                cubetas.move_to_end(user_id)
+                cubeta.tasa, cubeta.rafaga = limite  # El perfil del usuario puede haber cambiado
+            espera = cubeta.tomar(ahora)
+        if espera > 0:
+            raise LimiteUsuarioExcedido(f"Límite de solicitudes excedido para {user_id}", espera)
+
+def crear_limitador(especificacion, reloj=time.monotonic):
+    """
+    LIMITE_USUARIO: "tasa:ráfaga" para todos los perfiles (p. ej. "20:40") o por perfil
+    ("basico=10:20,avanzado=40:80"; los que no aparezcan no tienen límite). Vacío lo desactiva.
+    """
+    if not especificacion:
+        return None
+    limites = {}
+    for parte in especificacion.split(","):
+        perfil, _, valores = parte.rpartition("=")
+        tasa, _, rafaga = valores.partition(":")
+        limites[perfil.strip() or None] = (float(tasa), float(rafaga or tasa))
+    return LimitadorUsuarios(limites, reloj=reloj)
+
+def crear_planificador(entorno):
+    """ORDEN_COLA (sjf o fifo), ENVEJECIMIENTO y CAPACIDAD_COLA del entorno."""
+    return Planificador(entorno.get("ORDEN_COLA", "sjf"), float(entorno.get("ENVEJECIMIENTO", ENVEJECIMIENTO)),
+                        int(entorno.get("CAPACIDAD_COLA", CAPACIDAD)))
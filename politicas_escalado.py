@@ -0,0 +1,232 @@
+import ast
+import math
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Unidades de demanda predicha que procesa un servidor por segundo. La unidad es la del modelo de demanda
+# (ver asignador_recursos.SEGUNDOS_POR_UNIDAD): una unidad son 1 / CAPACIDAD_SERVIDOR segundos de servidor.
+CAPACIDAD_SERVIDOR = 5.0
+
+class PoliticaEscalado:
+    """
+    Política de autoescalado basada en una ventana deslizante de demanda predicha y llegadas.
+
+    La demanda se agrega en intervalos fijos; cada subclase pronostica la demanda por segundo
+    a partir de esa serie. La capacidad de un servidor se expresa en las mismas unidades que la
+    demanda registrada (unidades de demanda que procesa por segundo).
+    """
+    def __init__(self, ventana=30.0, intervalo=1.0, capacidad_servidor=CAPACIDAD_SERVIDOR, min_servidores=1, max_servidores=5,
+                 margen_subida=0.8, margen_bajada=0.5, enfriamiento_subida=5.0, enfriamiento_bajada=30.0,
+                 reloj=time.monotonic):
+        self.ventana = ventana
+        self.intervalo = intervalo
+        self.capacidad_servidor = capacidad_servidor
+        self.min_servidores = min_servidores
+        self.max_servidores = max_servidores
+        # Histéresis: se sube por encima de margen_subida y se baja por debajo de margen_bajada
+        self.margen_subida = margen_subida
+        self.margen_bajada = margen_bajada
+        self.enfriamiento_subida = enfriamiento_subida
+        self.enfriamiento_bajada = enfriamiento_bajada
+        self.reloj = reloj
+        self.intervalos = deque()  # [inicio, demanda, llegadas] de cada intervalo de la ventana
+        # registrar se llama desde todos los hilos que asignan; la sección crítica es sólo actualizar la ventana
+        self.lock = threading.Lock()
+        self.ultimo_escalado = -math.inf
+
+    def registrar(self, demanda, instante=None):
+        """Añade la demanda predicha de una solicitud que acaba de llegar."""
+        ahora = self.reloj() if instante is None else instante
+        inicio = ahora - ahora % self.intervalo
+        with self.lock:
+            if not self.intervalos or self.intervalos[-1][0] < inicio:
+                self.intervalos.append([inicio, 0.0, 0])
+            self.intervalos[-1][1] += demanda
+            self.intervalos[-1][2] += 1
+            self.descartar_antiguos(ahora)
+
+    def descartar_antiguos(self, ahora):
+        while self.intervalos and self.intervalos[0][0] <= ahora - self.ventana:
+            self.intervalos.popleft()
+
+    def serie(self, ahora):
+        """Demanda por segundo de cada intervalo de la ventana, incluidos los vacíos, hasta el actual."""
+        with self.lock:
+            self.descartar_antiguos(ahora)
+            intervalos = [tuple(intervalo) for intervalo in self.intervalos]
+        num = max(1, int(self.ventana / self.intervalo))
+        inicio = ahora - ahora % self.intervalo - (num - 1) * self.intervalo
+        valores = [0.0] * num
+        for inicio_intervalo, demanda, _ in intervalos:
+            indice = int(round((inicio_intervalo - inicio) / self.intervalo))
+            if 0 <= indice < num:
+                valores[indice] += demanda / self.intervalo
+        return valores
+
+    def tasa_llegadas(self, instante=None):
+        """Solicitudes por segundo dentro de la ventana."""
+        ahora = self.reloj() if instante is None else instante
+        with self.lock:
+            self.descartar_antiguos(ahora)
+            return sum(llegadas for _, _, llegadas in self.intervalos) / self.ventana
+
+    def pronostico(self, ahora):
+        """Demanda por segundo esperada a corto plazo: media de la ventana."""
+        valores = self.serie(ahora)
+        return sum(valores) / len(valores)
+
+    def decidir(self, num_servidores, carga_actual=0.0, instante=None):
+        """Devuelve +1 para añadir un servidor, -1 para retirarlo o 0 para no hacer nada."""
+        ahora = self.reloj() if instante is None else instante
+        demanda = self.pronostico(ahora)
+        capacidad = num_servidores * self.capacidad_servidor
+        if (num_servidores < self.max_servidores and demanda > capacidad * self.margen_subida
+                and ahora - self.ultimo_escalado >= self.enfriamiento_subida):
+            self.ultimo_escalado = ahora
+            return 1
+        if (num_servidores > self.min_servidores
+                and demanda < (num_servidores - 1) * self.capacidad_servidor * self.margen_bajada
+                and ahora - self.ultimo_escalado >= self.enfriamiento_bajada):
+            self.ultimo_escalado = ahora
+            return -1
+        return 0
+
+class PoliticaUmbral(PoliticaEscalado):
+    """Comportamiento original: compara la carga instantánea con umbrales fijos, sin pronóstico."""
+    def __init__(self, umbral_superior=5, umbral_inferior=1, **config):
+        super().__init__(**config)
+        self.umbral_superior = umbral_superior
+        self.umbral_inferior = umbral_inferior
+
+    def decidir(self, num_servidores, carga_actual=0.0, instante=None):
+        if carga_actual > self.umbral_superior and num_servidores < self.max_servidores:
+            return 1
+        if carga_actual < self.umbral_inferior and num_servidores > self.min_servidores:
+            return -1
+        return 0
+
+class PoliticaEWMA(PoliticaEscalado):
+    """Pronóstico por media móvil exponencial de la demanda por intervalo."""
+    def __init__(self, alfa=0.3, **config):
+        super().__init__(**config)
+        self.alfa = alfa
+
+    def pronostico(self, ahora):
+        valores = self.serie(ahora)
+        nivel = valores[0]
+        for valor in valores[1:]:
+            nivel = self.alfa * valor + (1 - self.alfa) * nivel
+        return nivel
+
+class PoliticaHolt(PoliticaEscalado):
+    """Suavizado exponencial doble (Holt): nivel más tendencia, proyectado `horizonte` intervalos."""
+    def __init__(self, alfa=0.5, beta=0.3, horizonte=5, **config):
+        super().__init__(**config)
+        self.alfa = alfa
+        self.beta = beta
+        self.horizonte = horizonte
+
+    def pronostico(self, ahora):
+        valores = self.serie(ahora)
+        nivel, tendencia = valores[0], 0.0
+        for valor in valores[1:]:
+            nivel_anterior = nivel
+            nivel = self.alfa * valor + (1 - self.alfa) * (nivel + tendencia)
+            tendencia = self.beta * (nivel - nivel_anterior) + (1 - self.beta) * tendencia
+        return max(0.0, nivel + self.horizonte * tendencia)
+
+POLITICAS = {
+    "umbral": PoliticaUmbral,
+    "media": PoliticaEscalado,
+    "ewma": PoliticaEWMA,
+    "holt": PoliticaHolt,
+}
+
+def crear_politica(nombre, **config):
+    """Instancia una política de escalado por su nombre en POLITICAS."""
+    if nombre not in POLITICAS:
+        raise ValueError(f"Política de escalado desconocida: {nombre}. Opciones: {', '.join(POLITICAS)}")
+    return POLITICAS[nombre](**config)
+
+def cargar_traza(ruta_csv):
+    """Lee (instante, segundos de trabajo) de cada solicitud de un CSV de simulación."""
+    import csv
+    traza = []
+    with open(ruta_csv, newline='', encoding='utf-8') as f:
+        for fila in csv.DictReader(f):
+            instante = datetime.strptime(fila["tiempo_inicio"], '%Y-%m-%d %H:%M:%S').timestamp()
+            caracteristicas = ast.literal_eval(fila["caracteristicas"])
+            traza.append((instante, caracteristicas["longitud"] * 0.01))
+    traza.sort()
+    return traza
+
+def evaluar_politica(politica, traza, tiempo_arranque=0.0, paso=1.0):
+    """
+    Reproduce una traza sobre una cola fluida: cada servidor procesa un segundo de trabajo por segundo.
+    Devuelve eventos de escalado, coste en servidor-segundos y trabajo acumulado sin atender.
+    """
+    if not traza:
+        return {}
+    servidores = politica.min_servidores
+    pendientes_arranque = []  # Instantes en que entran los servidores que están arrancando
+    trabajo_pendiente = 0.0
+    eventos = coste = suma_pendiente = max_pendiente = 0.0
+    segundos_saturado = 0.0
+    indice = 0
+    ahora = traza[0][0]
+    fin = traza[-1][0] + paso
+    while ahora < fin:
+        while indice < len(traza) and traza[indice][0] < ahora + paso:
+            politica.registrar(traza[indice][1], traza[indice][0])
+            trabajo_pendiente += traza[indice][1]
+            indice += 1
+        servidores += sum(1 for t in pendientes_arranque if t <= ahora)
+        pendientes_arranque = [t for t in pendientes_arranque if t > ahora]
+        total = servidores + len(pendientes_arranque)
+        decision = politica.decidir(total, trabajo_pendiente, ahora + paso)
+        if decision > 0:
+            pendientes_arranque.append(ahora + tiempo_arranque)
+            eventos += 1
+        elif decision < 0 and servidores > politica.min_servidores:
+            servidores -= 1
+            eventos += 1
+        trabajo_pendiente = max(0.0, trabajo_pendiente - servidores * paso)
+        if trabajo_pendiente > 0:
+            segundos_saturado += paso
+        coste += (servidores + len(pendientes_arranque)) * paso
+        suma_pendiente += trabajo_pendiente * paso
+        max_pendiente = max(max_pendiente, trabajo_pendiente)
+        ahora += paso
+    duracion = fin - traza[0][0]
+    return {
+        "eventos_escalado": int(eventos),
+        "servidor_segundos": coste,
+        "trabajo_pendiente_medio": suma_pendiente / duracion,
+        "trabajo_pendiente_max": max_pendiente,
+        "segundos_saturado": segundos_saturado
+    }
+
+def comparar_politicas(ruta_csv, nombres=None, aceleracion=1.0, paso=1.0, **config):
+    """
+    Evalúa varias políticas sobre la misma traza y devuelve {nombre: resultados}.
+    Con aceleracion > 1 la traza se comprime en el tiempo para simular más tráfico.
+    """
+    traza = cargar_traza(ruta_csv)
+    if traza and aceleracion != 1.0:
+        origen = traza[0][0]
+        traza = [(origen + (instante - origen) / aceleracion, trabajo) for instante, trabajo in traza]
+    # En la traza la demanda son segundos de trabajo, así que un servidor procesa 1 unidad por segundo
+    config.setdefault("capacidad_servidor", 1.0)
+    resultados = {}
+    for nombre in nombres or POLITICAS:
+        resultados[nombre] = evaluar_politica(crear_politica(nombre, **config), traza, paso=paso)
+    return resultados
+
+if __name__ == "__main__":
+    ruta = sys.argv[1] if len(sys.argv) > 1 else "datos_simulacion.csv"
+    aceleracion = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    for nombre, resultado in comparar_politicas(ruta, aceleracion=aceleracion, paso=0.1).items():
+        print(f"{nombre:>8}: " + ", ".join(f"{clave}={valor:.2f}" for clave, valor in resultado.items()))
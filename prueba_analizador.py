@@ -0,0 +1,60 @@
+import argparse
+import sys
+from analizador_solicitudes import RUTA_PALABRAS_CLAVE, AnalizadorSolicitudes
+from perfiles_usuario import PERFILES
+
+# Comprueba la clasificación de analizador_solicitudes.py: palabras clave como palabras completas (una que
+# sólo empieza igual, como "apio" o "funcionario", no cuenta), raíces marcadas con "*" con sus derivadas,
+# prioridad entre tipos y textos de los perfiles de usuario.
+
+CASOS = [
+    # Palabras que sólo comparten el principio con una palabra clave
+    ("Receta de sopa de apio", "simple"),
+    ("Duda sobre mi funcionario asignado", "simple"),
+    ("Ejecutivo de cuentas", "simple"),
+    ("Quiero programar una cita", "simple"),
+    ("Información del programa de puntos", "simple"),
+    ("Quiero reservar una clase de yoga", "simple"),
+    ("Horario del estudio de yoga", "simple"),
+    ("Modelo de la factura", "simple"),
+    # Palabras completas, raíces y expresiones de varias palabras
+    ("Prueba de la API de pagos", "codigo"),
+    ("Ejecutarlo en un servidor", "codigo"),
+    ("Depuración de un fallo", "codigo"),
+    ("Curso de programación", "codigo"),
+    ("Quiero automatizarlo", "codigo"),
+    ("Se queda en un stack trace", "codigo"),
+    ("Necesito un estudio de mercado", "compleja"),
+    ("Optimizar el modelo predictivo", "compleja"),
+    ("Estadísticas de big data", "compleja"),
+    # Con palabras de varios tipos gana el prioritario
+    ("Análisis de datos con Python", "codigo"),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Clasificación de solicitudes por palabras clave")
+    parser.add_argument("--palabras-clave", default=RUTA_PALABRAS_CLAVE)
+    args = parser.parse_args()
+    errores = []
+    analizador = AnalizadorSolicitudes(args.palabras_clave)
+
+    for texto, esperado in CASOS:
+        tipo = analizador.analizar(texto)["tipo"]
+        print(f"{tipo:>9}  {texto}")
+        if tipo != esperado:
+            errores.append(f"{texto!r}: {tipo}, esperado {esperado}")
+
+    # Los textos de consultas de los perfiles no deben parecer código ni solicitudes complejas
+    for perfil in PERFILES.values():
+        for texto in perfil["textos"].get("simple", []):
+            tipo = analizador.analizar(texto)["tipo"]
+            if tipo != "simple":
+                errores.append(f"{texto!r} (perfil, simple): {tipo}")
+
+    print(f"{len(CASOS)} casos, {len(errores)} error(es)")
+    for error in errores:
+        print(f"  - {error}")
+    sys.exit(1 if errores else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import sys
+import threading
+import time
+import numpy as np
+from aprendizaje_online import AprendizajeOnline
+from asignador_recursos import SEGUNDOS_POR_UNIDAD, DemandPredictor, coste_procesamiento
+
+# Comprueba el aprendizaje en línea (aprendizaje_online.py) con el modelo servido desde los pesos exportados:
+# un ajuste con el coste observado reduce el error y se pone a servir, uno que empeora con el tráfico
+# siguiente se revierte, y las predicciones concurrentes salen siempre enteras del motor anterior o del nuevo.
+# Mide además la latencia de predict en varios hilos sin ajuste y mientras se ajusta (sin caché, para que
+# cada predicción pase por el motor).
+
+def caracteristicas_al_azar(rng):
+    return {"longitud": int(rng.integers(5, 200)), "tipo": DemandPredictor.TIPOS[int(rng.integers(3))]}
+
+def medir_latencias(demand_predictor, num_hilos, segundos, semilla=0):
+    """Latencias de predict (en segundos) de `num_hilos` hilos llamándolo sin parar durante `segundos`."""
+    latencias = [[] for _ in range(num_hilos)]
+    limite = time.perf_counter() + segundos
+
+    def cliente(indice):
+        rng = np.random.default_rng(semilla + indice)
+        while time.perf_counter() < limite:
+            caracteristicas = caracteristicas_al_azar(rng)
+            inicio = time.perf_counter()
+            demand_predictor.predict(caracteristicas)
+            latencias[indice].append(time.perf_counter() - inicio)
+            time.sleep(0.0002)  # Ritmo de peticiones por debajo de la saturación
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(num_hilos)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return np.concatenate([np.asarray(l) for l in latencias])
+
+def resumen(latencias):
+    p50, p99, p999 = np.percentile(latencias, [50, 99, 99.9]) * 1e6
+    return f"{len(latencias)} predicciones, p50={p50:.0f} µs p99={p99:.0f} µs p99.9={p999:.0f} µs"
+
+def observar(aprendizaje, num, coste, semilla):
+    rng = np.random.default_rng(semilla)
+    for _ in range(num):
+        caracteristicas = caracteristicas_al_azar(rng)
+        aprendizaje.observar(caracteristicas, coste(caracteristicas))
+
+def main():
+    parser = argparse.ArgumentParser(description="Ajuste en línea del modelo sin bloquear las predicciones")
+    parser.add_argument("--observaciones", type=int, default=20000)
+    parser.add_argument("--hilos", type=int, default=4)
+    parser.add_argument("--segundos", type=float, default=3.0)
+    args = parser.parse_args()
+    errores = []
+
+    demand_predictor = DemandPredictor(backend="numpy", cache_capacidad=0)
+    aprendizaje = AprendizajeOnline(demand_predictor, min_observaciones=256, epochs=20)
+    print(f"Sin ajuste: {resumen(medir_latencias(demand_predictor, args.hilos, args.segundos))}")
+
+    # Ajuste con el coste que observan los servidores simulados, mientras los hilos siguen prediciendo
+    observar(aprendizaje, args.observaciones, coste_procesamiento, semilla=1)
+    original = demand_predictor.motor
+    resultados = []
+    ajuste = threading.Thread(target=lambda: resultados.append(aprendizaje.ciclo()))
+    ajuste.start()
+    latencias = medir_latencias(demand_predictor, args.hilos, args.segundos, semilla=100)
+    ajuste.join()
+    print(f"Con ajuste: {resumen(latencias)}")
+    ultimo = aprendizaje.ultimo
+    print(f"Ajuste {resultados[0]} en {ultimo['segundos_ajuste']:.2f} s: error de validación {ultimo['error']:.5f} "
+          f"(antes {ultimo['error_referencia']:.5f})")
+    if resultados[0] != "aceptada" or demand_predictor.motor is original:
+        errores.append("el ajuste con el coste observado no se ha puesto a servir")
+
+    # Atomicidad: durante una sustitución cada predicción es la del motor anterior o la del nuevo
+    rng = np.random.default_rng(2)
+    X = DemandPredictor.matriz_caracteristicas(rng.integers(5, 200, 64), rng.choice(DemandPredictor.TIPOS, 64))
+    motores = (demand_predictor.motor, original)
+    esperadas = [motor.predecir(X) for motor in motores]
+    mezcladas = 0
+    for i in range(2000):
+        hilo = threading.Thread(target=demand_predictor.sustituir_motor, args=(motores[i % 2],))
+        hilo.start()
+        salida = demand_predictor.motor_predecir(X)
+        hilo.join()
+        mezcladas += not any(np.array_equal(salida, esperada) for esperada in esperadas)
+    demand_predictor.sustituir_motor(motores[0])
+    print(f"Sustituciones concurrentes: {mezcladas} predicciones mezcladas de 2000")
+    if mezcladas:
+        errores.append(f"{mezcladas} predicciones mezclan dos motores")
+
+    # Reversión: el tráfico siguiente vuelve a costar lo que predecía el modelo original (el coste se observa
+    # en segundos de servidor)
+    observar(aprendizaje, args.observaciones,
+             lambda c: SEGUNDOS_POR_UNIDAD * float(original.predecir(np.array([DemandPredictor.vector_caracteristicas(c)],
+                                                                             dtype=np.float32))[0]), semilla=3)
+    resultado = aprendizaje.ciclo()
+    print(f"Tráfico como el del modelo original: ajuste {resultado} "
+          f"(error {aprendizaje.ultimo['error']:.5f} frente a {aprendizaje.ultimo['error_referencia']:.5f})")
+    if resultado != "revertida" or demand_predictor.motor is not original:
+        errores.append("no se ha revertido un ajuste que empeora con el tráfico nuevo")
+
+    for error in errores:
+        print(f"  - {error}")
+    sys.exit(1 if errores else 0)
+
+if __name__ == "__main__":
+    main()
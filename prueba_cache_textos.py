@@ -0,0 +1,108 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+from analizador_solicitudes import RUTA_PALABRAS_CLAVE, AnalizadorSolicitudes
+from asignador_recursos import DemandPredictor
+from cache_textos import CABECERA, CAMPOS, CacheTextos, TablaCompartida, directorio_compartido
+from perfiles_usuario import PERFILES
+
+# Comprueba cache_textos.py: que lo que devuelve la caché es lo mismo que analizar y predecir el texto, que
+# la tabla compartida llena en otro proceso se usa en este, que una entrada alterada a medio escribir o de
+# otro modelo no se reutiliza, y el desalojo de la caché del proceso. Mide el coste de un acierto frente a
+# analizar y predecir.
+
+def textos_perfiles():
+    textos = {texto for perfil in PERFILES.values() for lista in perfil["textos"].values() for texto in lista}
+    # Variantes con el mismo contenido normalizado y con otra longitud
+    return sorted(textos | {texto.upper() for texto in textos} | {texto + "  " for texto in textos})
+
+def llenar(ruta, textos):
+    """En otro proceso: analiza y predice los textos y los guarda en la tabla compartida."""
+    analizador = AnalizadorSolicitudes(RUTA_PALABRAS_CLAVE)
+    predictor = DemandPredictor()
+    cache = CacheTextos(analizador, compartida=TablaCompartida(ruta))
+    for texto in textos:
+        caracteristicas = analizador.analizar(texto)
+        cache.guardar(texto, caracteristicas, predictor.predict(caracteristicas), predictor.version)
+    cache.cerrar()
+
+def main():
+    parser = argparse.ArgumentParser(description="Coherencia, compartición entre procesos y coste de la caché de textos")
+    parser.add_argument("--repeticiones", type=int, default=20000)
+    args = parser.parse_args()
+    errores = []
+    analizador = AnalizadorSolicitudes(RUTA_PALABRAS_CLAVE)
+    predictor = DemandPredictor()
+    textos = textos_perfiles()
+    esperados = {texto: (analizador.analizar(texto), float(predictor.predict(analizador.analizar(texto)))) for texto in textos}
+
+    ruta = os.path.join(directorio_compartido(), f"prueba_cache_textos_{os.getpid()}")
+    try:
+        proceso = multiprocessing.get_context("spawn").Process(target=llenar, args=(ruta, textos))
+        proceso.start()
+        proceso.join()
+        cache = CacheTextos(analizador, compartida=TablaCompartida(ruta))
+        for texto in textos:
+            encontrado = cache.obtener(texto, predictor.version)
+            if encontrado != esperados[texto]:
+                errores.append(f"{texto!r}: {encontrado} desde la tabla compartida, esperado {esperados[texto]}")
+        estado = cache.estadisticas()
+        print(f"{len(textos)} textos guardados en otro proceso: {estado['aciertos_compartida']} aciertos en la tabla "
+              f"compartida, {estado['compartida']['ocupadas']} de {estado['compartida']['entradas']} entradas ocupadas")
+
+        # Con otro modelo se reutilizan las características y no la demanda
+        texto = textos[0]
+        if cache.obtener(texto, predictor.version + 1) != (esperados[texto][0], None):
+            errores.append("una entrada de otro modelo devuelve su demanda")
+
+        # Una entrada alterada sin su suma de control (escrita a medias) es un fallo
+        tabla = np.memmap(ruta, dtype=np.int64, mode="r+")[CABECERA:].reshape(-1, CAMPOS)
+        alterada = CacheTextos(analizador, compartida=TablaCompartida(ruta))
+        fila = np.flatnonzero(tabla[:, 3])[0]
+        tabla[fila, 7] += 1
+        fallos = sum(alterada.obtener(texto, predictor.version) is None for texto in textos)
+        tabla[fila, 7] -= 1
+        # Los textos con el mismo contenido normalizado comparten la entrada
+        afectados = sum(analizador.clave(texto) == tabla[fila, :2].tobytes() for texto in textos)
+        print(f"Con una entrada alterada: {fallos} fallo(s) de {afectados} texto(s) con esa entrada")
+        if fallos != afectados:
+            errores.append(f"{fallos} fallos con una entrada alterada, se esperaban {afectados}")
+        del tabla
+        alterada.cerrar()
+        cache.cerrar()
+    finally:
+        os.remove(ruta)
+
+    # Desalojo de la caché del proceso por número de entradas y por caracteres
+    pequena = CacheTextos(analizador, capacidad=2, max_caracteres=60)
+    for texto in ("a" * 10, "b" * 10, "c" * 10, "d" * 45, "e" * 61):
+        pequena.guardar(texto, analizador.analizar(texto), 1.0, predictor.version)
+    presentes = [texto[0] for texto in ("a" * 10, "b" * 10, "c" * 10, "d" * 45, "e" * 61)
+                 if pequena.obtener(texto, predictor.version) is not None]
+    if presentes != ["c", "d"]:
+        errores.append(f"tras el desalojo quedan {presentes}, se esperaba ['c', 'd']")
+
+    # Coste de un acierto frente a analizar y predecir
+    cache = CacheTextos(analizador)
+    for texto in textos:
+        cache.guardar(texto, *esperados[texto], predictor.version)
+    muestra = [textos[i % len(textos)] for i in range(args.repeticiones)]
+    inicio = time.perf_counter()
+    for texto in muestra:
+        cache.obtener(texto, predictor.version)
+    acierto = (time.perf_counter() - inicio) / len(muestra)
+    inicio = time.perf_counter()
+    for texto in muestra:
+        predictor.predict(analizador.analizar(texto))
+    sin_cache = (time.perf_counter() - inicio) / len(muestra)
+    print(f"Acierto en la caché: {acierto * 1e6:.1f} µs; analizar y predecir: {sin_cache * 1e6:.1f} µs")
+
+    for error in errores:
+        print(f"  - {error}")
+    sys.exit(1 if errores else 0)
+
+if __name__ == "__main__":
+    main()
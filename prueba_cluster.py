@@ -0,0 +1,104 @@
+import argparse
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+from cluster import ESTADOS_CLUSTER, Cluster
+from perfiles_usuario import PERFILES, generar_solicitud
+from servicio import Servicio, bloques
+
+# Comprueba que el cluster (cluster.py) da los mismos perfiles que un único proceso y mide cómo escala
+# el procesamiento de bloques de /solicitudes con el número de nodos. La misma secuencia de solicitudes
+# se procesa con Servicio solicitud a solicitud (como /solicitud) y con Cluster.procesar_lote por bloques;
+# el perfil de cada respuesta y los perfiles finales tienen que coincidir.
+
+def generar_cuerpos(num_solicitudes, num_usuarios, semilla=0):
+    """Cuerpos {user_id, texto} de los perfiles de carga, con `num_usuarios` usuarios distintos."""
+    rng = random.Random(semilla)
+    perfiles = list(PERFILES.values())
+    cuerpos = []
+    for _ in range(num_solicitudes):
+        usuario = rng.randrange(num_usuarios)
+        user_id, _, texto = generar_solicitud(perfiles[usuario % len(perfiles)], rng)
+        cuerpos.append({"user_id": f"{user_id}-{usuario}", "texto": texto})
+    return cuerpos
+
+@contextmanager
+def sin_salida():
+    """Descarta la salida estándar (también la de los procesos que se lancen mientras tanto)."""
+    sys.stdout.flush()
+    original = os.dup(1)
+    nulo = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(nulo, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(original, 1)
+        os.close(nulo)
+        os.close(original)
+
+def referencia(cuerpos):
+    """Perfiles de cada respuesta y finales con un único proceso, solicitud a solicitud."""
+    servicio = Servicio(entorno={"MODO_ARRANQUE": "solo_cargar", "TELEMETRIA": ""})
+    inicio = time.perf_counter()
+    respuestas = []
+    for data in cuerpos:
+        user_id, texto = Servicio.validar(data)
+        respuestas.append(servicio.procesar(user_id, servicio.analizar(texto))["perfil"])
+    segundos = time.perf_counter() - inicio
+    servicio.actualizar_perfiles()
+    return respuestas, dict(servicio.gestor_usuarios.perfiles), len(cuerpos) / segundos
+
+def en_cluster(cuerpos, num_nodos, estado, tamano_bloque):
+    """Lo mismo con el cluster, por bloques de /solicitudes; devuelve también las solicitudes por segundo."""
+    cluster = Cluster(num_nodos, estado, entorno={"MODO_ARRANQUE": "solo_cargar", "TELEMETRIA": ""})
+    try:
+        inicio = time.perf_counter()
+        respuestas = []
+        for bloque in bloques(cuerpos, tamano_bloque):
+            respuestas.extend(r["perfil"] for r in cluster.procesar_lote(bloque))
+        segundos = time.perf_counter() - inicio
+        cluster.actualizar_perfiles()
+        return respuestas, cluster.perfiles(), len(cuerpos) / segundos
+    finally:
+        cluster.cerrar()
+
+def diferencias(cuerpos, esperadas, obtenidas, perfiles_esperados, perfiles_obtenidos):
+    errores = [f"solicitud {i} de {cuerpos[i]['user_id']}: perfil {o}, esperado {e}"
+               for i, (e, o) in enumerate(zip(esperadas, obtenidas)) if e != o]
+    for user_id in perfiles_esperados.keys() | perfiles_obtenidos.keys():
+        if perfiles_esperados.get(user_id) != perfiles_obtenidos.get(user_id):
+            errores.append(f"{user_id}: perfil final {perfiles_obtenidos.get(user_id)}, esperado {perfiles_esperados.get(user_id)}")
+    return errores
+
+def main():
+    parser = argparse.ArgumentParser(description="Equivalencia y escalabilidad del cluster frente a un único proceso")
+    parser.add_argument("--nodos", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--estado", choices=ESTADOS_CLUSTER, default="proceso")
+    parser.add_argument("--solicitudes", type=int, default=20000)
+    parser.add_argument("--usuarios", type=int, default=500)
+    parser.add_argument("--bloque", type=int, default=256, help="Solicitudes por bloque de /solicitudes")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    cuerpos = generar_cuerpos(args.solicitudes, args.usuarios, args.semilla)
+    with sin_salida():
+        esperadas, perfiles_esperados, ritmo = referencia(cuerpos)
+    print(f"{os.cpu_count()} núcleos, {args.solicitudes} solicitudes de {args.usuarios} usuarios")
+    print(f"un proceso, solicitud a solicitud: {ritmo:,.0f} solicitudes/s")
+    fallos = 0
+    for num_nodos in args.nodos:
+        with sin_salida():
+            obtenidas, perfiles_obtenidos, ritmo = en_cluster(cuerpos, num_nodos, args.estado, args.bloque)
+        errores = diferencias(cuerpos, esperadas, obtenidas, perfiles_esperados, perfiles_obtenidos)
+        estado = "perfiles idénticos" if not errores else f"{len(errores)} diferencias"
+        print(f"cluster ({args.estado}) con {num_nodos} nodos, bloques de {args.bloque}: {ritmo:,.0f} solicitudes/s -> {estado}")
+        for error in errores[:10]:
+            print(f"  - {error}")
+        fallos += len(errores)
+    sys.exit(1 if fallos else 0)
+
+if __name__ == "__main__":
+    main()
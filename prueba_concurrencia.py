@@ -0,0 +1,206 @@
+import argparse
+import contextlib
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from asignador_recursos import AsignadorRecursos, ServidorSimulado
+from gestor_usuarios import GestorUsuarios
+from persistencia import Persistencia
+
+# Prueba de estrés del estado compartido: muchos hilos a la vez sobre GestorUsuarios y AsignadorRecursos,
+# comprobando al final que no se ha perdido ninguna actualización, y medida de cómo escala el rendimiento
+# con el número de hilos con locks por franjas frente a un único lock global.
+
+TIPOS = ("simple", "compleja", "codigo")
+
+def _lanzar(num_hilos, objetivo):
+    hilos = [threading.Thread(target=objetivo, args=(i,)) for i in range(num_hilos)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return time.perf_counter() - inicio
+
+def perfil_esperado(cuentas):
+    total, complejas, codigo = sum(cuentas.values()), cuentas["compleja"], cuentas["codigo"]
+    if total >= 15 and codigo >= 5:
+        return "avanzado"
+    if total >= 10 and complejas >= 3:
+        return "intermedio"
+    return "basico"
+
+def estres_gestor(num_hilos=16, operaciones=5000, num_usuarios=50, semilla=0):
+    """
+    Cada hilo registra solicitudes de usuarios al azar (compartidos entre hilos) mientras otro recalcula
+    todos los perfiles. Devuelve la lista de invariantes incumplidos (vacía si todo cuadra).
+    """
+    gestor = GestorUsuarios()
+    esperado = [Counter() for _ in range(num_hilos)]  # {(user_id, tipo): n} de cada hilo
+    terminado = threading.Event()
+
+    def trabajador(indice):
+        rng = random.Random(semilla + indice)
+        for _ in range(operaciones):
+            user_id = f"u{rng.randrange(num_usuarios)}"
+            tipo = rng.choice(TIPOS)
+            gestor.registrar_solicitud(user_id, {"longitud": rng.randrange(1, 200), "tipo": tipo})
+            gestor.obtener_perfil(user_id)
+            gestor.actualizar_perfil(user_id)
+            esperado[indice][(user_id, tipo)] += 1
+
+    def recalculador():
+        while not terminado.is_set():
+            gestor.actualizar_perfiles()
+
+    hilo_perfiles = threading.Thread(target=recalculador)
+    hilo_perfiles.start()
+    segundos = _lanzar(num_hilos, trabajador)
+    terminado.set()
+    hilo_perfiles.join()
+    gestor.actualizar_perfiles()
+
+    cuentas = {}
+    for parcial in esperado:
+        for (user_id, tipo), n in parcial.items():
+            cuentas.setdefault(user_id, Counter())[tipo] += n
+    errores = []
+    for user_id, por_tipo in cuentas.items():
+        contadores = gestor.contadores[user_id]
+        total = sum(por_tipo.values())
+        if (contadores.total, contadores.complejas, contadores.codigo) != (total, por_tipo["compleja"], por_tipo["codigo"]):
+            errores.append(f"{user_id}: contadores {contadores.total}/{contadores.complejas}/{contadores.codigo}, "
+                           f"esperado {total}/{por_tipo['compleja']}/{por_tipo['codigo']}")
+        if gestor.historial.num_solicitudes(user_id) != min(total, gestor.historial.retencion):
+            errores.append(f"{user_id}: historial con {gestor.historial.num_solicitudes(user_id)} solicitudes, esperado {total}")
+        if gestor.perfiles[user_id] != perfil_esperado(por_tipo):
+            errores.append(f"{user_id}: perfil {gestor.perfiles[user_id]}, esperado {perfil_esperado(por_tipo)}")
+    return num_hilos * operaciones / segundos, errores
+
+def estres_asignador(num_hilos=16, solicitudes=2000, semilla=0, espera_max=60):
+    """
+    Los hilos encolan solicitudes mientras otro añade y retira servidores sin parar. Al vaciarse las colas
+    cada ticket debe estar completado, cada solicitud atendida una vez y la carga de cada servidor en cero.
+    """
+    creados = []
+    lock_creados = threading.Lock()
+
+    def fabrica(*args):
+        servidor = ServidorSimulado(*args, escala_tiempo=0)
+        with lock_creados:
+            creados.append(servidor)
+        return servidor
+
+    total = num_hilos * solicitudes
+    asignador = AsignadorRecursos(num_servidores_inicial=2, demand_predictor=None, max_tickets=total,
+                                  tiempo_arranque=0, estrategia_balanceo="menor_trabajo", fabrica_servidor=fabrica)
+    terminado = threading.Event()
+
+    def trabajador(indice):
+        rng = random.Random(semilla + indice)
+        for _ in range(solicitudes):
+            caracteristicas = {"longitud": rng.randrange(1, 200), "tipo": rng.choice(TIPOS)}
+            asignador.asignar(f"u{indice}", caracteristicas, rng.uniform(0.5, 5.0))
+
+    def escalador():
+        rng = random.Random(semilla - 1)
+        while not terminado.is_set():
+            if rng.random() < 0.5:
+                asignador.crear_servidor()
+            else:
+                asignador.eliminar_servidor()
+            time.sleep(0.001)
+
+    hilo_escalado = threading.Thread(target=escalador)
+    hilo_escalado.start()
+    segundos = _lanzar(num_hilos, trabajador)
+    terminado.set()
+    hilo_escalado.join()
+
+    limite = time.monotonic() + espera_max
+    pendientes = list(range(1, total + 1))
+    while pendientes and time.monotonic() < limite:
+        pendientes = [t for t in pendientes if (asignador.estado_ticket(t) or {}).get("estado") != "completada"]
+        if pendientes:
+            time.sleep(0.05)
+
+    errores = []
+    if pendientes:
+        errores.append(f"{len(pendientes)} tickets sin completar (p. ej. {pendientes[:5]})")
+    atendidas = sum(s.atendidas for s in creados)
+    if atendidas != total:
+        errores.append(f"{atendidas} solicitudes atendidas, esperado {total}")
+    for servidor in creados:
+        if abs(servidor.carga) > 1e-6 or abs(servidor.trabajo_pendiente) > 1e-6:
+            errores.append(f"servidor {servidor.id}: carga {servidor.carga}, trabajo pendiente {servidor.trabajo_pendiente} al terminar")
+    if not 1 <= len(asignador.servidores) <= asignador.num_servidores_max:
+        errores.append(f"{len(asignador.servidores)} servidores en el pool")
+    ids = [s.id for s in creados]
+    if len(ids) != len(set(ids)):
+        errores.append("ids de servidor repetidos")
+    return total / segundos, errores
+
+class PersistenciaConLatencia(Persistencia):
+    """Persistencia que tarda `latencia` segundos en cada escritura, como un diario síncrono en disco."""
+    def __init__(self, latencia):
+        self.latencia = latencia
+
+    def registrar_solicitud(self, user_id, timestamp, longitud, tipo, contadores):
+        time.sleep(self.latencia)
+
+def escalabilidad(hilos=(1, 2, 4, 8, 16), operaciones=2000, latencia=0.0002, num_usuarios=1000):
+    """
+    Operaciones por segundo de registrar_solicitud según el número de hilos, con 64 franjas de locks
+    y con una sola (equivalente a un lock global). Cada registro espera `latencia` segundos dentro
+    de la sección crítica, como al escribir un diario síncrono: con el GIL el trabajo puramente en
+    Python no escala con más hilos, pero sí el tiempo de espera que se solapa entre usuarios distintos.
+    """
+    resultados = {}
+    for num_franjas in (64, 1):
+        for num_hilos in hilos:
+            gestor = GestorUsuarios(persistencia=PersistenciaConLatencia(latencia), num_franjas=num_franjas)
+            por_hilo = max(1, operaciones // num_hilos)
+
+            def trabajador(indice):
+                rng = random.Random(indice)
+                for _ in range(por_hilo):
+                    gestor.registrar_solicitud(f"u{rng.randrange(num_usuarios)}", {"longitud": 10, "tipo": "simple"})
+
+            resultados[(num_franjas, num_hilos)] = por_hilo * num_hilos / _lanzar(num_hilos, trabajador)
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de estrés y escalabilidad del estado compartido")
+    parser.add_argument("--hilos", type=int, default=16)
+    parser.add_argument("--operaciones", type=int, default=3000, help="Operaciones por hilo en las pruebas de estrés")
+    parser.add_argument("--latencia", type=float, default=0.0002,
+                        help="Segundos de escritura simulada por registro en la prueba de escalabilidad")
+    parser.add_argument("--sin-escalabilidad", action="store_true")
+    args = parser.parse_args()
+
+    fallos = 0
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        ritmo_gestor, errores_gestor = estres_gestor(args.hilos, args.operaciones)
+        ritmo_asignador, errores_asignador = estres_asignador(args.hilos, args.operaciones // 2)
+    for nombre, ritmo, errores in (("GestorUsuarios", ritmo_gestor, errores_gestor),
+                                   ("AsignadorRecursos", ritmo_asignador, errores_asignador)):
+        estado = "OK" if not errores else f"{len(errores)} invariantes incumplidos"
+        print(f"{nombre}: {args.hilos} hilos, {ritmo:,.0f} operaciones/s -> {estado}")
+        for error in errores[:10]:
+            print(f"  - {error}")
+        fallos += len(errores)
+
+    if not args.sin_escalabilidad:
+        resultados = escalabilidad(latencia=args.latencia)
+        hilos = sorted({h for _, h in resultados})
+        print(f"\nregistrar_solicitud con {args.latencia * 1e6:.0f} µs de escritura por registro (operaciones/s):")
+        print(f"{'hilos':>6} {'64 franjas':>12} {'lock global':>12}")
+        for h in hilos:
+            print(f"{h:>6} {resultados[(64, h)]:>12,.0f} {resultados[(1, h)]:>12,.0f}")
+    sys.exit(1 if fallos else 0)
+
+if __name__ == "__main__":
+    main()
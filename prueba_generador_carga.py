@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import sys
+import numpy as np
+from generador_carga import GeneradorCarga, HistogramaLatencias, TransporteASGI, crear_llegadas, crear_mezcla
+
+# Comprueba generador_carga.py sin red ni servicio: los percentiles del histograma frente a los exactos,
+# y la tasa de llegadas y la latencia medidas contra una aplicación ASGI mínima que tarda `retardo`
+# segundos en responder, en la propia memoria. Mide además cuántas solicitudes por segundo puede generar.
+
+def aplicacion_retardo(retardo):
+    async def app(alcance, recibir, enviar):
+        if alcance["type"] == "lifespan":
+            while (await recibir())["type"] != "lifespan.shutdown":
+                await enviar({"type": "lifespan.startup.complete"})
+            await enviar({"type": "lifespan.shutdown.complete"})
+            return
+        await recibir()
+        await asyncio.sleep(retardo)
+        await enviar({"type": "http.response.start", "status": 200, "headers": []})
+        await enviar({"type": "http.response.body", "body": b"{}"})
+    return app
+
+def ejecutar(llegadas, duracion, retardo):
+    generador = GeneradorCarga(TransporteASGI(aplicacion_retardo(retardo)), crear_mezcla("basico,avanzado"),
+                               crear_llegadas(llegadas, duracion), duracion, ventana=duracion / 4)
+
+    async def sesion():
+        await generador.transporte.abrir()
+        await generador.ejecutar()
+        await generador.transporte.cerrar()
+
+    asyncio.run(sesion())
+    return generador.informe()
+
+def main():
+    parser = argparse.ArgumentParser(description="Precisión del histograma y de las llegadas de generador_carga.py")
+    parser.add_argument("--duracion", type=float, default=8.0)
+    parser.add_argument("--retardo", type=float, default=0.02)
+    args = parser.parse_args()
+    errores = []
+
+    # Histograma: error relativo de cada percentil frente al exacto con latencias log-normales de 10 µs a minutos
+    valores = np.random.default_rng(0).lognormal(np.log(0.005), 2.0, 200000)
+    histograma = HistogramaLatencias()
+    for valor in valores:
+        histograma.registrar(float(valor))
+    cuantiles = (1, 50, 90, 99, 99.9, 99.99)
+    exactos = np.percentile(valores, cuantiles, method="inverted_cdf")
+    medidos = histograma.percentiles(cuantiles)
+    print(f"Histograma: {histograma.contadores.nbytes} bytes")
+    for q, exacto in zip(cuantiles, exactos):
+        error = abs(medidos[f"p{q}"] - exacto)
+        print(f"  p{q}: {medidos[f'p{q}'] * 1e6:.0f} µs frente a {exacto * 1e6:.1f} µs ({error / exacto:.3%})")
+        # La resolución es de 1 µs: por debajo de 2 ** bits µs el error es absoluto
+        if error > max(exacto * 2 ** (1 - histograma.bits), 1e-6):
+            errores.append(f"p{q} del histograma con un error de {error / exacto:.3%}")
+
+    # Llegadas de Poisson a tasa fija: tasa conseguida y latencia de la aplicación
+    tasa = 2000
+    informe = ejecutar(f"poisson:{tasa}", args.duracion, args.retardo)
+    conseguida = informe["total"]["enviadas"] / args.duracion
+    latencia = informe["total"]["latencia_ms"]
+    print(f"Poisson a {tasa}/s: {conseguida:.0f}/s enviadas, p50={latencia['p50']:.2f} ms p99={latencia['p99']:.2f} ms "
+          f"(la aplicación tarda {args.retardo * 1000:.0f} ms), retraso máximo del generador "
+          f"{informe['retraso_max_generador_ms']:.1f} ms")
+    if abs(conseguida - tasa) > 0.05 * tasa:
+        errores.append(f"tasa conseguida {conseguida:.0f}/s frente a {tasa}/s")
+    if not args.retardo * 1000 <= latencia["p50"] <= args.retardo * 1000 * 1.25:
+        errores.append(f"p50 de {latencia['p50']} ms con una aplicación de {args.retardo * 1000:.0f} ms")
+
+    # Rampa: cada ventana envía lo que pide la tasa en su punto medio
+    informe = ejecutar("rampa:200:2000", args.duracion, args.retardo)
+    for ventana in informe["ventanas"][:4]:
+        enviada = ventana["enviadas"] / (args.duracion / 4)
+        print(f"Rampa, ventana desde {ventana['inicio']:.0f} s: objetivo {ventana['tasa_objetivo']:.0f}/s, enviadas {enviada:.0f}/s")
+        if abs(enviada - ventana["tasa_objetivo"]) > 0.1 * ventana["tasa_objetivo"]:
+            errores.append(f"rampa: {enviada:.0f}/s frente a {ventana['tasa_objetivo']:.0f}/s")
+
+    # Capacidad del propio generador: tasa a la que deja de seguir a las llegadas
+    informe = ejecutar("poisson:100000", 0.5, 0.0)
+    print(f"Capacidad del generador en este proceso: {informe['total']['enviadas'] / informe['segundos']:.0f} solicitudes/s")
+
+    for error in errores:
+        print(f"  - {error}")
+    sys.exit(1 if errores else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+# Registro de mensajes del servicio con el módulo logging. Cada módulo usa su logger
+# (logging.getLogger(__name__)) con el nivel adecuado: debug para lo que ocurre en cada solicitud, info
+# para arranques, escalados y ciclo de vida de los servidores, warning y error para los problemas.
+# Quien emite el mensaje sólo lo encola; un hilo aparte le da formato y lo escribe en la salida estándar.
+# NIVEL_LOG: DEBUG, INFO (por defecto), WARNING, ERROR o "desactivado" (no se registra nada). Con un
+# nivel por encima de DEBUG las llamadas de la ruta caliente se descartan antes de crear el mensaje.
+
+FORMATO = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_oyente = None
+_lock = threading.Lock()
+
+def nivel_configurado(entorno=os.environ):
+    """Nivel numérico de NIVEL_LOG; "desactivado" es un nivel por encima de CRITICAL."""
+    nombre = entorno.get("NIVEL_LOG", "INFO").strip().upper()
+    if nombre == "DESACTIVADO":
+        return logging.CRITICAL + 1
+    nivel = logging.getLevelName(nombre)
+    if not isinstance(nivel, int):
+        raise ValueError(f"NIVEL_LOG desconocido: {nombre}. Opciones: DEBUG, INFO, WARNING, ERROR, desactivado")
+    return nivel
+
+def configurar_registro(entorno=os.environ):
+    """
+    Configura el logger raíz con el nivel de NIVEL_LOG y la escritura en segundo plano. Llamarla más
+    de una vez en el mismo proceso sólo cambia el nivel.
+    """
+    global _oyente
+    raiz = logging.getLogger()
+    raiz.setLevel(nivel_configurado(entorno))
+    with _lock:
+        if _oyente is not None:
+            return
+        cola = queue.SimpleQueue()
+        salida = logging.StreamHandler(sys.stdout)
+        salida.setFormatter(logging.Formatter(FORMATO))
+        for manejador in list(raiz.handlers):
+            raiz.removeHandler(manejador)
+        raiz.addHandler(logging.handlers.QueueHandler(cola))
+        _oyente = logging.handlers.QueueListener(cola, salida, respect_handler_level=True)
+        _oyente.start()
+    atexit.register(detener_registro)
+
+def detener_registro():
+    """Escribe los mensajes pendientes y detiene el hilo de escritura."""
+    global _oyente
+    with _lock:
+        if _oyente is not None:
+            _oyente.stop()
+            _oyente = None
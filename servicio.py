@@ -0,0 +1,397 @@
+import time
+from gestor_usuarios import GestorUsuarios
+from analizador_solicitudes import RUTA_PALABRAS_CLAVE, AnalizadorSolicitudes
+from aprendizaje_online import crear_aprendizaje
+from asignador_recursos import ESTADO_ARRANCANDO, ESTADO_LISTO, AsignadorRecursos, DemandPredictor
+from cache_textos import crear_cache_textos
+from metricas import LATENCIA_ETAPA, METRICAS, SOLICITUDES, SOLICITUDES_NO_VALIDAS, SOLICITUDES_RECHAZADAS
+from persistencia import crear_persistencia
+from planificador import LimiteUsuarioExcedido, SolicitudRechazada, crear_limitador, crear_planificador
+from telemetria import crear_telemetria
+from collections import Counter
+import atexit
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+# Solicitudes de /solicitudes que se procesan (y se devuelven) juntas
+TAMANO_BLOQUE_LOTE = 256
+
+# Series de latencia de cada etapa (ver metricas.py), resueltas una vez para no buscarlas en cada solicitud
+_LATENCIA_ANALIZAR = LATENCIA_ETAPA.etiquetas("analizar")
+_LATENCIA_PREDECIR = LATENCIA_ETAPA.etiquetas("predecir")
+_LATENCIA_PERFIL = LATENCIA_ETAPA.etiquetas("perfil")
+_LATENCIA_ENCOLAR = LATENCIA_ETAPA.etiquetas("encolar")
+_LIMITE_USUARIO = SOLICITUDES_RECHAZADAS.etiquetas("limite_usuario")
+
+class SolicitudNoValida(ValueError):
+    """Cuerpo de solicitud sin user_id o sin texto, o con alguno que no es una cadena."""
+
+def decodificar_ndjson(lineas):
+    """Decodifica líneas NDJSON; las que no son JSON válido se devuelven como None (y se rechazan al validar)."""
+    datos = []
+    for linea in lineas:
+        if not linea.strip():
+            continue
+        try:
+            datos.append(json.loads(linea))
+        except ValueError:
+            datos.append(None)
+    return datos
+
+def codificar_ndjson(resultados):
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in resultados).encode("utf-8")
+
+def resultados_error(datos, primer_indice):
+    """
+    Resultados de un bloque de /solicitudes que ha fallado al procesarse: un error por elemento. La respuesta
+    ya ha empezado con 200, así que así sigue teniendo una línea por solicitud en lugar de cortarse.
+    """
+    return [{'indice': primer_indice + posicion, 'error': 'Error interno del servidor'} for posicion in range(len(datos))]
+
+def bloques(datos, tamano=TAMANO_BLOQUE_LOTE):
+    for inicio in range(0, len(datos), tamano):
+        yield datos[inicio:inicio + tamano]
+
+def cuerpo_resultado(ticket, estado):
+    """
+    Devuelve (cuerpo, código HTTP) de la consulta de un ticket: 202 en curso, 200 completado, 503 si se
+    desalojó de la cola por saturación y 404 si no existe.
+    """
+    if estado is None:
+        return {'error': 'Ticket no encontrado'}, 404
+    codigo = {'completada': 200, 'rechazada': 503}.get(estado['estado'], 202)
+    return {'ticket': ticket, **estado}, codigo
+
+def preparar_modelo(modo_arranque="cargar"):
+    """
+    Entrena el modelo antes de servir si hace falta y devuelve si se ha entrenado.
+    MODO_ARRANQUE: "cargar" (por defecto) sólo entrena si el artefacto del modelo no está al día,
+    "entrenar" reentrena siempre y "solo_cargar" nunca entrena. El entrenamiento habitual se hace
+    fuera del servicio con `python entrenar_modelo.py`.
+    """
+    if modo_arranque == "solo_cargar":
+        return False
+    import entrenar_modelo
+    if modo_arranque == "entrenar" or not entrenar_modelo.modelo_vigente("demand_predictor_model.h5"):
+        entrenar_modelo.entrenar(forzar=True)
+        return True
+    return False
+
+def crear_asignador(entorno, demand_predictor, persistencia, telemetria=None, aprendizaje=None):
+    """
+    Crea el pool de servidores con la configuración del entorno: la política de autoescalado se elige con
+    POLITICA_ESCALADO (umbral, media, ewma, holt) y la estrategia de balanceo con ESTRATEGIA_BALANCEO
+    (menor_carga, menor_trabajo, dos_opciones, cola_mas_corta, round_robin). El orden de las colas y la
+    capacidad del pool, con ORDEN_COLA (sjf, por defecto, o fifo), ENVEJECIMIENTO y CAPACIDAD_COLA.
+    Los indicadores del pool para /metrics se registran aquí, en el proceso donde vive.
+    """
+    asignador = AsignadorRecursos(num_servidores_inicial=1, demand_predictor=demand_predictor,
+                                  politica_escalado=entorno.get("POLITICA_ESCALADO", "ewma"),
+                                  estrategia_balanceo=entorno.get("ESTRATEGIA_BALANCEO", "menor_trabajo"),
+                                  persistencia=persistencia, telemetria=telemetria, aprendizaje=aprendizaje,
+                                  planificador=crear_planificador(entorno))
+    METRICAS.indicador("cola_solicitudes", "Solicitudes pendientes en las colas de los servidores", asignador.longitud_cola)
+    METRICAS.indicador("servidores", "Servidores del pool por estado",
+                       lambda: {(estado,): sum(s.estado == estado for s in asignador.servidores)
+                                for estado in (ESTADO_ARRANCANDO, ESTADO_LISTO)}, ("estado",))
+    METRICAS.indicador("servidores_reserva", "Servidores en la reserva (arrancados o arrancando)", lambda: len(asignador.reserva))
+    METRICAS.indicador("trabajo_pendiente", "Demanda predicha encolada o en curso en cada servidor",
+                       lambda: {(str(s.id),): s.trabajo_pendiente for s in asignador.servidores}, ("servidor",))
+    return asignador
+
+def reencolar_pendientes(asignador, pendientes):
+    """
+    Vuelve a encolar las solicitudes que no llegaron a procesarse antes del último reinicio. Las que no caben
+    en el pool se rechazan (y cuentan como rechazadas en admitir) sin impedir el arranque.
+    """
+    rechazadas = 0
+    for user_id, caracteristicas in pendientes:
+        try:
+            asignador.asignar(user_id, caracteristicas)
+        except SolicitudRechazada:
+            rechazadas += 1
+    if rechazadas:
+        log.warning("%d de %d solicitudes pendientes del último reinicio rechazadas por saturación",
+                    rechazadas, len(pendientes))
+
+class Servicio:
+    """
+    Componentes del servicio (perfiles, análisis, predicción y asignación) y la lógica de cada petición,
+    compartidos por la aplicación Flask (app.py), la ASGI (app_asgi.py) y cada nodo de cluster.py.
+    Con `asignador_recursos` se usa un pool de servidores creado fuera (en cluster.py, el compartido
+    por todos los nodos) en lugar de crear uno propio.
+    """
+    def __init__(self, entorno=os.environ, asignador_recursos=None):
+        self.tiempos_arranque = {}  # Duración de cada fase del arranque en segundos
+        inicio_arranque = time.perf_counter()
+
+        # PERSISTENCIA = "wal:<directorio>" o "sqlite:<fichero>" conserva perfiles, historial y cola entre reinicios
+        inicio = time.perf_counter()
+        self.persistencia = crear_persistencia(entorno.get("PERSISTENCIA", ""))
+        # TELEMETRIA = directorio de la telemetría de cada solicitud (por defecto "telemetria"; vacío la desactiva)
+        self.telemetria = crear_telemetria(entorno.get("TELEMETRIA", "telemetria"), entorno.get("ORIGEN_TELEMETRIA", "servicio"))
+        atexit.register(self.cerrar)
+        self.gestor_usuarios = GestorUsuarios(persistencia=self.persistencia)
+        solicitudes_pendientes = self.gestor_usuarios.restaurar()
+        # PALABRAS_CLAVE: fichero JSON con las palabras clave de cada tipo de solicitud (por defecto palabras_clave.json)
+        self.analizador_solicitudes = AnalizadorSolicitudes(entorno.get("PALABRAS_CLAVE") or RUTA_PALABRAS_CLAVE)
+        # CACHE_TEXTOS y CACHE_TEXTOS_COMPARTIDA: características y demanda de los textos ya vistos (ver cache_textos.py)
+        self.cache_textos = crear_cache_textos(entorno, self.analizador_solicitudes)
+        # LIMITE_USUARIO = "tasa:ráfaga" de solicitudes por usuario, para todos o por perfil (ver
+        # planificador.crear_limitador); vacío, por defecto, no limita. En el cluster cada usuario está en
+        # un único nodo, así que su límite también.
+        self.limitador = crear_limitador(entorno.get("LIMITE_USUARIO", ""))
+        self._fase("estado", inicio)
+
+        inicio = time.perf_counter()
+        if preparar_modelo(entorno.get("MODO_ARRANQUE", "cargar")):
+            self._fase("entrenamiento", inicio)
+        # BACKEND_MODELO: "auto" (por defecto) sirve desde los pesos exportados (.pesos.npy) sin importar
+        # TensorFlow cuando corresponden al .h5; "keras" fuerza cargar el .h5 y "numpy" exige los pesos exportados.
+        inicio = time.perf_counter()
+        self.demand_predictor = DemandPredictor(backend=entorno.get("BACKEND_MODELO", "auto"))
+        self._fase("carga_modelo", inicio)
+
+        inicio = time.perf_counter()
+        self.aprendizaje = None
+        if asignador_recursos is None:
+            # APRENDIZAJE_ONLINE = segundos entre ajustes del modelo con el coste observado en los servidores
+            # (vacío, por defecto, lo desactiva). Sólo con un pool propio, que es el que informa de los costes.
+            self.aprendizaje = crear_aprendizaje(entorno.get("APRENDIZAJE_ONLINE", ""), self.demand_predictor)
+            asignador_recursos = crear_asignador(entorno, self.demand_predictor, self.persistencia, self.telemetria,
+                                                 self.aprendizaje)
+        self.asignador_recursos = asignador_recursos
+
+        reencolar_pendientes(self.asignador_recursos, solicitudes_pendientes)
+        self._fase("servidores", inicio)
+        self.tiempos_arranque["total"] = time.perf_counter() - inicio_arranque
+
+    def cerrar(self):
+        """Detiene el aprendizaje en línea y escribe lo pendiente de la persistencia y la telemetría."""
+        if self.aprendizaje is not None:
+            self.aprendizaje.detener()
+        if self.cache_textos is not None:
+            self.cache_textos.cerrar()
+        self.persistencia.cerrar()
+        if self.telemetria is not None:
+            self.telemetria.cerrar()
+
+    def _fase(self, nombre, inicio):
+        self.tiempos_arranque[nombre] = time.perf_counter() - inicio
+
+    @staticmethod
+    def validar(data):
+        """
+        Devuelve (user_id, texto) del cuerpo de /solicitud o lanza SolicitudNoValida. Ambos han de ser cadenas:
+        el user_id es la clave de los perfiles, de los locks por usuario y del reparto entre nodos del cluster.
+        """
+        if not isinstance(data, dict) or 'user_id' not in data or 'texto' not in data:
+            raise SolicitudNoValida('Datos de solicitud no válidos')
+        if not isinstance(data['user_id'], str) or not data['user_id']:
+            raise SolicitudNoValida('user_id debe ser una cadena no vacía')
+        if not isinstance(data['texto'], str):
+            raise SolicitudNoValida('texto debe ser una cadena')
+        return data['user_id'], data['texto']
+
+    def analizar(self, texto_solicitud):
+        inicio = time.perf_counter()
+        caracteristicas = self.analizador_solicitudes.analizar(texto_solicitud)
+        _LATENCIA_ANALIZAR.observar(time.perf_counter() - inicio)
+        return caracteristicas
+
+    def consultar(self, texto_solicitud):
+        """
+        (características, demanda predicha) de un texto. Un texto que está en la caché de textos no se vuelve
+        a analizar, y su demanda se reutiliza si la predijo el modelo vigente; si no, la demanda es None: se
+        predice aparte y se guarda con recordar.
+        """
+        if self.cache_textos is not None:
+            encontrado = self.cache_textos.obtener(texto_solicitud, self.demand_predictor.version)
+            if encontrado is not None:
+                return encontrado
+        return self.analizar(texto_solicitud), None
+
+    def recordar(self, texto_solicitud, caracteristicas, demanda, version):
+        """Guarda en la caché de textos la demanda del texto predicha con el modelo `version` (leída antes de predecir)."""
+        if self.cache_textos is not None:
+            self.cache_textos.guardar(texto_solicitud, caracteristicas, demanda, version)
+
+    def consultar_muchos(self, textos):
+        """
+        consultar() de varios textos con las demandas ya completas: los que no están en la caché se analizan
+        juntos (analizar_muchos), las demandas que faltan se predicen en una sola llamada al modelo y se guardan.
+        """
+        version = self.demand_predictor.version
+        consultas = [self.cache_textos.obtener(texto, version) if self.cache_textos is not None else None
+                     for texto in textos]
+        analizar = [i for i, consulta in enumerate(consultas) if consulta is None]
+        if analizar:
+            inicio = time.perf_counter()
+            analizadas = self.analizador_solicitudes.analizar_muchos([textos[i] for i in analizar])
+            _LATENCIA_ANALIZAR.observar((time.perf_counter() - inicio) / len(analizar), len(analizar))
+            for i, caracteristicas in zip(analizar, analizadas):
+                consultas[i] = (caracteristicas, None)
+        lista_caracteristicas = [caracteristicas for caracteristicas, _ in consultas]
+        demandas = [demanda for _, demanda in consultas]
+        predecir = [i for i, demanda in enumerate(demandas) if demanda is None]
+        if predecir:
+            for i, demanda in zip(predecir, self.predecir_lote([lista_caracteristicas[i] for i in predecir])):
+                demandas[i] = float(demanda)
+                self.recordar(textos[i], lista_caracteristicas[i], demandas[i], version)
+        return lista_caracteristicas, demandas
+
+    def predecir_lote(self, lista_caracteristicas):
+        """Demandas predichas de varias solicitudes en una sola llamada al modelo."""
+        inicio = time.perf_counter()
+        demandas = self.demand_predictor.predict_lote(lista_caracteristicas)
+        if lista_caracteristicas:
+            _LATENCIA_PREDECIR.observar((time.perf_counter() - inicio) / len(lista_caracteristicas), len(lista_caracteristicas))
+        return demandas
+
+    def admitir(self, user_id):
+        """
+        Perfil actual del usuario, tras comprobar su límite de solicitudes (LimiteUsuarioExcedido si lo
+        ha superado). El perfil da el límite y el peso de la solicitud en la cola; un usuario nuevo no se da
+        de alta hasta que se acepta su primera solicitud.
+        """
+        perfil = self.gestor_usuarios.perfil_actual(user_id)
+        if self.limitador is not None:
+            try:
+                self.limitador.admitir(user_id, perfil)
+            except LimiteUsuarioExcedido:
+                _LIMITE_USUARIO.inc()
+                raise
+        return perfil
+
+    def procesar(self, user_id, caracteristicas, demanda=None, texto=None):
+        """
+        Encola la solicitud ya analizada en un servidor, la registra en el historial del usuario y devuelve
+        la respuesta de /solicitud. Con `demanda` se usa una predicción calculada fuera (p. ej. en un lote o la
+        de la caché de textos, ver consultar) en lugar de predecir aquí; `texto` se usa para la telemetría y
+        para guardar en la caché la demanda predicha aquí. Una solicitud no admitida
+        (SolicitudRechazada: límite del usuario o pool saturado) no llega a registrarse.
+        """
+        inicio_servicio = time.perf_counter()
+        perfil_actual = self.admitir(user_id)
+        tiempo_perfil = time.perf_counter() - inicio_servicio
+
+        # Encolar la solicitud en un servidor; se procesa en segundo plano
+        if demanda is None:
+            version = self.demand_predictor.version
+            inicio = time.perf_counter()
+            demanda = self.demand_predictor.predict(caracteristicas)
+            _LATENCIA_PREDECIR.observar(time.perf_counter() - inicio)
+            if texto is not None:
+                self.recordar(texto, caracteristicas, demanda, version)
+        inicio = time.time()
+        ticket, servidor_id = self.asignador_recursos.asignar(user_id, caracteristicas, demanda, perfil_actual)
+        tiempo_asignacion = time.time() - inicio
+        _LATENCIA_ENCOLAR.observar(tiempo_asignacion)
+
+        # Registrar la solicitud en el historial del usuario y actualizar su perfil
+        inicio = time.perf_counter()
+        self.gestor_usuarios.registrar_solicitud(user_id, caracteristicas)
+        perfil = self.gestor_usuarios.obtener_perfil(user_id)
+        self.gestor_usuarios.actualizar_perfil(user_id)
+        _LATENCIA_PERFIL.observar(tiempo_perfil + time.perf_counter() - inicio)
+        SOLICITUDES.etiquetas(caracteristicas["tipo"]).inc()
+
+        if self.telemetria is not None:
+            self.telemetria.registrar_solicitud(ticket, user_id, texto or "", caracteristicas, demanda, servidor_id,
+                                                tiempo_asignacion, time.perf_counter() - inicio_servicio)
+        return {
+            'mensaje': 'Solicitud procesada correctamente',
+            'user_id': user_id,
+            'perfil': perfil,
+            'ticket': ticket,
+            'servidor_asignado': servidor_id,
+            'demanda_predicha': float(demanda),
+            'caracteristicas': caracteristicas,
+            'tiempo_asignacion': tiempo_asignacion
+        }
+
+    def procesar_lote(self, datos, primer_indice=0):
+        """
+        Procesa un bloque de cuerpos {user_id, texto} de /solicitudes y devuelve un resultado por elemento,
+        con su `indice` en la petición. El análisis y la predicción (una sola llamada al modelo), ambos sólo de
+        los textos que no están en la caché de textos, y el encolado se hacen en bloque; el registro y la
+        actualización del perfil se aplican solicitud a solicitud y en orden, así que cada perfil devuelto es
+        el mismo que daría /solicitud con las solicitudes una a una.
+        Las no admitidas llevan en su resultado el error, el `codigo` HTTP (429 o 503) y `reintentar_en`;
+        el límite y la prioridad se calculan con el perfil que tiene cada usuario al empezar el bloque.
+        """
+        inicio_servicio = time.perf_counter()
+        resultados = [None] * len(datos)
+        validos = []  # [(posición, user_id, texto)]
+        for posicion, data in enumerate(datos):
+            try:
+                validos.append((posicion, *self.validar(data)))
+            except SolicitudNoValida as e:
+                SOLICITUDES_NO_VALIDAS.inc()
+                resultados[posicion] = {'indice': primer_indice + posicion, 'error': str(e)}
+        admitidos = []  # [(posición, user_id, texto, perfil actual)]
+        for posicion, user_id, texto in validos:
+            try:
+                admitidos.append((posicion, user_id, texto, self.admitir(user_id)))
+            except SolicitudRechazada as e:
+                resultados[posicion] = {'indice': primer_indice + posicion, 'user_id': user_id, **e.cuerpo()}
+        if admitidos:
+            # Las etapas se miden por bloque y se registran como el tiempo medio de cada solicitud
+            n = len(admitidos)
+            usuarios = [user_id for _, user_id, _, _ in admitidos]
+            lista_caracteristicas, demandas = self.consultar_muchos([texto for _, _, texto, _ in admitidos])
+
+            inicio = time.time()
+            asignaciones = self.asignador_recursos.asignar_lote(list(zip(usuarios, lista_caracteristicas)), demandas,
+                                                                [perfil for _, _, _, perfil in admitidos])
+            tiempo_asignacion = (time.time() - inicio) / n
+            _LATENCIA_ENCOLAR.observar(tiempo_asignacion, n)
+
+            inicio = time.perf_counter()
+            encoladas = []  # [(solicitud admitida, características, demanda, asignación, perfil)]
+            for solicitud, caracteristicas, demanda, asignacion in zip(admitidos, lista_caracteristicas, demandas, asignaciones):
+                posicion, user_id = solicitud[:2]
+                if isinstance(asignacion, SolicitudRechazada):
+                    resultados[posicion] = {'indice': primer_indice + posicion, 'user_id': user_id, **asignacion.cuerpo()}
+                    continue
+                self.gestor_usuarios.registrar_solicitud(user_id, caracteristicas)
+                perfil = self.gestor_usuarios.obtener_perfil(user_id)
+                self.gestor_usuarios.actualizar_perfil(user_id)
+                encoladas.append((solicitud, caracteristicas, demanda, asignacion, perfil))
+            _LATENCIA_PERFIL.observar((time.perf_counter() - inicio) / n, n)
+            tiempo_servicio = (time.perf_counter() - inicio_servicio) / n
+            for tipo, cuantas in Counter(c["tipo"] for _, c, _, _, _ in encoladas).items():
+                SOLICITUDES.etiquetas(tipo).inc(cuantas)
+
+            for (posicion, user_id, texto, _), caracteristicas, demanda, (ticket, servidor_id), perfil in encoladas:
+                if self.telemetria is not None:
+                    self.telemetria.registrar_solicitud(ticket, user_id, texto, caracteristicas, demanda, servidor_id,
+                                                        tiempo_asignacion, tiempo_servicio)
+                resultados[posicion] = {
+                    'indice': primer_indice + posicion,
+                    'user_id': user_id,
+                    'perfil': perfil,
+                    'ticket': ticket,
+                    'servidor_asignado': servidor_id,
+                    'demanda_predicha': float(demanda),
+                    'caracteristicas': caracteristicas,
+                    'tiempo_asignacion': tiempo_asignacion
+                }
+        return resultados
+
+    def resultado(self, ticket):
+        return cuerpo_resultado(ticket, self.asignador_recursos.estado_ticket(ticket))
+
+    def estado_servidores(self):
+        estado = {'servidores': self.asignador_recursos.informe_utilizacion(), 'arranque': self.tiempos_arranque}
+        if self.aprendizaje is not None:
+            estado['aprendizaje'] = self.aprendizaje.estado()
+        if self.cache_textos is not None:
+            estado['cache_textos'] = self.cache_textos.estadisticas()
+        return estado
+
+    def actualizar_perfiles(self):
+        self.gestor_usuarios.actualizar_perfiles()
@@ -0,0 +1,313 @@
+import argparse
+import csv
+import heapq
+import itertools
+import json
+import random
+import time
+from datetime import datetime
+
+from analizador_solicitudes import AnalizadorSolicitudes
+from asignador_recursos import (AsignadorRecursos, DemandPredictor, coste_procesamiento, demanda_observada,
+                                ESTADO_ARRANCANDO, ESTADO_LISTO, ESTADO_DRENANDO, ESTADO_DETENIDO)
+from gestor_usuarios import GestorUsuarios
+from perfiles_usuario import PERFILES, generar_solicitud, pausa
+from planificador import CAPACIDAD, ENVEJECIMIENTO, ORDENES, ColaPlanificada, Planificador, SolicitudRechazada, crear_limitador
+from politicas_escalado import CAPACIDAD_SERVIDOR
+
+class ServidorVirtual:
+    """
+    Servidor con la misma interfaz que ServidorSimulado, pero cuyo arranque y procesamiento
+    son eventos del simulador en lugar de hilos y sleeps.
+    """
+    def __init__(self, simulador, id, al_completar=None, tiempo_arranque=5):
+        self.simulador = simulador
+        self.id = id
+        self.carga = 0
+        self.estado = ESTADO_ARRANCANDO
+        self.tiempo_arranque = tiempo_arranque
+        self.cola = ColaPlanificada()
+        self.al_completar = al_completar
+        self.trabajo_pendiente = 0.0
+        self.peso = 1
+        self.atendidas = 0
+        self.tiempo_ocupado = 0.0
+        self.instante_listo = None
+        self.ocupado = False
+        simulador.servidores_creados.append(self)
+        simulador.programar(tiempo_arranque, self._arrancado)
+
+    @property
+    def arrancando(self):
+        return self.estado == ESTADO_ARRANCANDO
+
+    def esperar_listo(self, timeout=None):
+        # Los servidores iniciales de la simulación empiezan ya arrancados
+        self._arrancado()
+        return True
+
+    def _arrancado(self):
+        if self.estado == ESTADO_ARRANCANDO:
+            self.estado = ESTADO_LISTO
+            self.instante_listo = self.simulador.ahora
+        self._siguiente()
+
+    def encolar(self, ticket, caracteristicas, timestamp, demanda=0.0, clave=None):
+        self.carga += coste_procesamiento(caracteristicas)
+        self.trabajo_pendiente += demanda
+        self.cola.put((ticket, caracteristicas, timestamp, demanda), timestamp if clave is None else clave)
+        self._siguiente()
+
+    def desalojar(self, clave):
+        elemento = self.cola.desalojar_peor(clave)
+        if elemento is not None:
+            ticket, caracteristicas, _, demanda = elemento
+            self.carga -= coste_procesamiento(caracteristicas)
+            self.trabajo_pendiente -= demanda
+            self.simulador.solicitud_desalojada(ticket)
+        return elemento
+
+    def detener(self):
+        self.estado = ESTADO_DRENANDO
+        self._siguiente()
+
+    def utilizacion(self):
+        if self.instante_listo is None:
+            return 0.0
+        transcurrido = self.simulador.ahora - self.instante_listo
+        return min(1.0, self.tiempo_ocupado / transcurrido) if transcurrido > 0 else 0.0
+
+    def _siguiente(self):
+        """Empieza la siguiente solicitud de la cola si el servidor está libre."""
+        if self.ocupado or self.estado in (ESTADO_ARRANCANDO, ESTADO_DETENIDO):
+            return
+        if not self.cola:
+            if self.estado == ESTADO_DRENANDO:
+                self.estado = ESTADO_DETENIDO
+            return
+        ticket, caracteristicas, timestamp, demanda = self.cola.get(block=False)
+        self.ocupado = True
+        inicio = self.simulador.ahora
+        tiempo_procesamiento = coste_procesamiento(caracteristicas)
+        self.simulador.programar(tiempo_procesamiento,
+                                 lambda: self._completar(ticket, caracteristicas, timestamp, demanda, inicio, tiempo_procesamiento))
+
+    def _completar(self, ticket, caracteristicas, timestamp, demanda, inicio, tiempo_procesamiento):
+        self.ocupado = False
+        self.carga -= tiempo_procesamiento
+        self.trabajo_pendiente -= demanda
+        self.atendidas += 1
+        self.tiempo_ocupado += tiempo_procesamiento
+        resultado = {
+            "servidor": self.id,
+            "espera_cola": inicio - timestamp,
+            "tiempo_procesamiento": tiempo_procesamiento,
+            "tiempo_respuesta": self.simulador.ahora - timestamp,
+            "demanda_predicha": demanda
+        }
+        self.simulador.solicitud_completada(ticket, caracteristicas, resultado)
+        if self.al_completar is not None:
+            self.al_completar(ticket, resultado)
+        self._siguiente()
+
+class PredictorCoste:
+    """Predictor oráculo que devuelve el coste real de procesamiento, en unidades de demanda; no necesita el modelo."""
+    def predict(self, features):
+        return demanda_observada(coste_procesamiento(features))
+
+def percentiles(valores, cuantiles=(50, 95, 99)):
+    if not valores:
+        return {f"p{q}": None for q in cuantiles}
+    ordenados = sorted(valores)
+    return {f"p{q}": ordenados[min(len(ordenados) - 1, int(len(ordenados) * q / 100))] for q in cuantiles}
+
+class Simulador:
+    """
+    Simulación de eventos discretos del balanceador sobre un reloj virtual, sin sleeps ni HTTP.
+    Usa los mismos AnalizadorSolicitudes, GestorUsuarios y AsignadorRecursos que app.py y, con
+    `limite_usuario` (ver planificador.crear_limitador), el mismo límite por usuario que servicio.py.
+    """
+    def __init__(self, predictor, semilla=0, num_servidores_inicial=1, intervalo_muestreo=1.0, limite_usuario=None,
+                 **config_asignador):
+        self.ahora = 0.0
+        self.eventos = []  # (instante, secuencia, accion)
+        self.secuencia = itertools.count()
+        self.rng = random.Random(semilla)
+        # Algunas estrategias (dos_opciones) usan el módulo random global
+        random.seed(semilla)
+        self.servidores_creados = []
+        self.analizador = AnalizadorSolicitudes()
+        self.gestor_usuarios = GestorUsuarios()
+        self.asignador = AsignadorRecursos(
+            num_servidores_inicial, predictor, reloj=lambda: self.ahora,
+            fabrica_servidor=lambda id, al_completar, tiempo_arranque: ServidorVirtual(self, id, al_completar, tiempo_arranque),
+            **config_asignador)
+        self.limitador = crear_limitador(limite_usuario, reloj=lambda: self.ahora)
+        self.intervalo_muestreo = intervalo_muestreo
+        self.llegadas = {}  # {ticket: tipo}
+        self.rechazadas = {}  # {tipo: {motivo: solicitudes}}
+        self.latencias = []
+        self.latencias_por_tipo = {}
+        self.muestras = []  # (instante, longitud de cola, servidores en el pool)
+        self.servidor_segundos = 0.0
+        self.ultimo_coste = 0.0
+
+    def programar(self, retraso, accion):
+        heapq.heappush(self.eventos, (self.ahora + retraso, next(self.secuencia), accion))
+
+    def servidores_provisionados(self):
+        return sum(1 for s in self.servidores_creados if s.estado != ESTADO_DETENIDO)
+
+    def _avanzar(self, instante):
+        # El coste se acumula por tramos con el número de servidores provisionados en cada tramo
+        self.servidor_segundos += (instante - self.ultimo_coste) * self.servidores_provisionados()
+        self.ultimo_coste = instante
+        self.ahora = instante
+
+    def llegada(self, user_id, texto):
+        """Procesa una solicitud como lo hace la ruta /solicitud de app.py (Servicio.procesar)."""
+        caracteristicas = self.analizador.analizar(texto)
+        perfil = self.gestor_usuarios.perfil_actual(user_id)
+        try:
+            if self.limitador is not None:
+                self.limitador.admitir(user_id, perfil)
+            ticket, _ = self.asignador.asignar(user_id, caracteristicas, perfil=perfil)
+        except SolicitudRechazada as e:
+            self._rechazada(caracteristicas["tipo"], e.motivo)
+            return
+        self.llegadas[ticket] = caracteristicas["tipo"]
+        self.gestor_usuarios.registrar_solicitud(user_id, caracteristicas)
+        self.gestor_usuarios.actualizar_perfil(user_id)
+
+    def _rechazada(self, tipo, motivo):
+        motivos = self.rechazadas.setdefault(tipo, {})
+        motivos[motivo] = motivos.get(motivo, 0) + 1
+
+    def solicitud_desalojada(self, ticket):
+        self._rechazada(self.llegadas.pop(ticket), "desalojada")
+
+    def solicitud_completada(self, ticket, caracteristicas, resultado):
+        tipo = self.llegadas.pop(ticket, caracteristicas["tipo"])
+        self.latencias.append(resultado["tiempo_respuesta"])
+        self.latencias_por_tipo.setdefault(tipo, []).append(resultado["tiempo_respuesta"])
+
+    def _muestrear(self):
+        self.muestras.append((self.ahora, self.asignador.longitud_cola(), len(self.asignador.servidores)))
+        self.programar(self.intervalo_muestreo, self._muestrear)
+
+    def cliente(self, perfil, duracion):
+        """Cliente en bucle cerrado: envía una solicitud del perfil y espera su pausa."""
+        def enviar():
+            if self.ahora >= duracion:
+                return
+            user_id, _, texto = generar_solicitud(perfil, self.rng)
+            self.llegada(user_id, texto)
+            self.programar(pausa(perfil, self.rng), enviar)
+        self.programar(pausa(perfil, self.rng), enviar)
+
+    def cargar_traza(self, ruta_csv, aceleracion=1.0):
+        """Programa las llegadas de un CSV de simulación (tiempo_inicio, user_id, texto_solicitud)."""
+        with open(ruta_csv, newline='', encoding='utf-8') as f:
+            filas = [(datetime.strptime(fila["tiempo_inicio"], '%Y-%m-%d %H:%M:%S').timestamp(),
+                      fila["user_id"], fila["texto_solicitud"]) for fila in csv.DictReader(f)]
+        filas.sort()
+        if not filas:
+            return 0.0
+        origen = filas[0][0]
+        for instante, user_id, texto in filas:
+            self.programar((instante - origen) / aceleracion, lambda u=user_id, t=texto: self.llegada(u, t))
+        return (filas[-1][0] - origen) / aceleracion
+
+    def ejecutar(self, hasta=None):
+        """Procesa eventos hasta vaciar la cola de eventos o alcanzar el instante `hasta`."""
+        self.programar(0.0, self._muestrear)
+        inicio_real = time.perf_counter()
+        while self.eventos:
+            instante, _, accion = self.eventos[0]
+            if hasta is not None and instante > hasta:
+                break
+            heapq.heappop(self.eventos)
+            self._avanzar(instante)
+            accion()
+            if hasta is None and len(self.eventos) == 1 and not self.llegadas:
+                # Sólo queda el muestreo periódico
+                break
+        return self.informe(time.perf_counter() - inicio_real)
+
+    def informe(self, tiempo_real):
+        colas = [cola for _, cola, _ in self.muestras]
+        servidores = [num for _, _, num in self.muestras]
+        return {
+            "tiempo_simulado": self.ahora,
+            "tiempo_real": tiempo_real,
+            "aceleracion": self.ahora / tiempo_real if tiempo_real > 0 else None,
+            "solicitudes": len(self.latencias),
+            "latencia": percentiles(self.latencias),
+            "latencia_por_tipo": {tipo: percentiles(valores) for tipo, valores in sorted(self.latencias_por_tipo.items())},
+            "rechazadas_por_tipo": self.rechazadas,
+            "cola_media": sum(colas) / len(colas) if colas else 0,
+            "cola_max": max(colas, default=0),
+            "servidores_medio": sum(servidores) / len(servidores) if servidores else 0,
+            "servidores_max": max(servidores, default=0),
+            "servidor_segundos": self.servidor_segundos,
+            "serie_servidores": [(round(t, 3), num) for t, _, num in self.muestras],
+            "perfiles": dict(self.gestor_usuarios.perfiles)
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulación de eventos discretos del balanceador")
+    parser.add_argument("--duracion", type=float, default=600, help="Segundos simulados de llegadas")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--perfiles", default="basico,intermedio,avanzado", help="Perfiles de perfiles_usuario.PERFILES")
+    parser.add_argument("--clientes", type=int, default=1, help="Multiplicador de clientes por perfil")
+    parser.add_argument("--traza", help="Reproduce un CSV como datos_simulacion.csv en lugar de los perfiles")
+    parser.add_argument("--aceleracion-traza", type=float, default=1.0)
+    parser.add_argument("--estrategia", default="menor_trabajo")
+    parser.add_argument("--politica", default="ewma")
+    parser.add_argument("--capacidad-servidor", type=float, default=CAPACIDAD_SERVIDOR,
+                        help="Unidades de demanda por segundo que atiende un servidor, para la política de escalado")
+    parser.add_argument("--servidores", type=int, default=1)
+    parser.add_argument("--reserva", type=int, default=1)
+    parser.add_argument("--tiempo-arranque", type=float, default=5)
+    parser.add_argument("--predictor", choices=["modelo", "coste"], default="modelo",
+                        help="'modelo' usa DemandPredictor; 'coste' usa el coste real como predicción")
+    parser.add_argument("--orden", choices=ORDENES, default="sjf", help="Orden de las colas de los servidores")
+    parser.add_argument("--envejecimiento", type=float, default=ENVEJECIMIENTO)
+    parser.add_argument("--capacidad", type=int, default=CAPACIDAD, help="Solicitudes en cola en todo el pool")
+    parser.add_argument("--limite-usuario", help="Límite por usuario, p. ej. 20:40 (ver planificador.crear_limitador)")
+    parser.add_argument("--json", help="Fichero donde guardar el informe completo")
+    args = parser.parse_args()
+
+    predictor = DemandPredictor() if args.predictor == "modelo" else PredictorCoste()
+    simulador = Simulador(predictor, semilla=args.semilla, num_servidores_inicial=args.servidores,
+                          limite_usuario=args.limite_usuario,
+                          planificador=Planificador(args.orden, args.envejecimiento, args.capacidad),
+                          tamano_reserva=args.reserva, tiempo_arranque=args.tiempo_arranque,
+                          politica_escalado=args.politica, estrategia_balanceo=args.estrategia,
+                          config_escalado={"capacidad_servidor": args.capacidad_servidor})
+    if args.traza:
+        simulador.cargar_traza(args.traza, args.aceleracion_traza)
+        informe = simulador.ejecutar()
+    else:
+        for nombre in args.perfiles.split(","):
+            perfil = PERFILES[nombre]
+            for _ in range(perfil["clientes"] * args.clientes):
+                simulador.cliente(perfil, args.duracion)
+        informe = simulador.ejecutar()
+
+    print(f"Simulados {informe['tiempo_simulado']:.1f} s en {informe['tiempo_real']:.2f} s "
+          f"({informe['aceleracion'] or 0:.0f}x tiempo real), {informe['solicitudes']} solicitudes")
+    print("Latencia: " + ", ".join(f"{k}={v:.4f}s" for k, v in informe["latencia"].items() if v is not None))
+    for tipo, valores in informe["latencia_por_tipo"].items():
+        print(f"  {tipo}: " + ", ".join(f"{k}={v:.4f}s" for k, v in valores.items()))
+    for tipo, motivos in sorted(informe["rechazadas_por_tipo"].items()):
+        print(f"  {tipo} rechazadas: " + ", ".join(f"{motivo}={n}" for motivo, n in sorted(motivos.items())))
+    print(f"Cola media/máx: {informe['cola_media']:.2f}/{informe['cola_max']}, "
+          f"servidores medio/máx: {informe['servidores_medio']:.2f}/{informe['servidores_max']}, "
+          f"coste: {informe['servidor_segundos']:.1f} servidor-segundos")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
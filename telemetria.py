@@ -0,0 +1,260 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+# Telemetría del servidor: una fila por solicitud atendida (tiempos, demanda predicha, servidor) y otra
+# por solicitud completada (usuario, tipo, longitud, espera en cola y tiempo de procesamiento), unidas por el
+# ticket. Las filas
+# se encolan sin bloquear la petición y un hilo las escribe por bloques en ficheros binarios por columnas
+# que rotan por tamaño:
+#   <directorio>/<tabla>-<origen>-<generación>.tlm
+# Cada fichero empieza con su esquema y sigue con bloques; en cada bloque cada columna es un array .npy,
+# y las de texto se guardan como diccionario (valores distintos + códigos), así que los textos repetidos
+# ocupan un entero. `python telemetria.py exportar` lo convierte al CSV de siempre (datos_simulacion.csv)
+# y analitica.py lo recorre por bloques para el informe de latencias, rendimiento y escalado. Cada fila de
+# "completadas" es además un ejemplo de entrenamiento (características y coste observado) para entrenar_modelo.py.
+
+TEXTO = "texto"  # Tipo de las columnas de texto, que se codifican como diccionario en cada bloque
+
+ESQUEMAS = {
+    "solicitudes": (("instante", "<f8"), ("ticket", "<i8"), ("user_id", TEXTO), ("texto", TEXTO), ("tipo", TEXTO),
+                    ("longitud", "<u4"), ("demanda_predicha", "<f4"), ("servidor", "<i4"),
+                    ("tiempo_asignacion", "<f4"), ("tiempo_servicio", "<f4")),
+    "completadas": (("instante", "<f8"), ("ticket", "<i8"), ("servidor", "<i4"), ("espera_cola", "<f4"),
+                    ("tiempo_procesamiento", "<f4"), ("tiempo_respuesta", "<f4"), ("user_id", TEXTO), ("tipo", TEXTO),
+                    ("longitud", "<u4")),
+}
+
+# Filas por bloque de iterar(): los bloques pequeños de los ficheros se juntan para operar sobre arrays grandes
+FILAS_ITERACION = 65536
+
+def _tipo_codigos(num_valores):
+    if num_valores <= 1 << 8:
+        return np.uint8
+    if num_valores <= 1 << 16:
+        return np.uint16
+    return np.uint32
+
+def escribir_bloque(fichero, esquema, filas):
+    """Escribe las filas (tuplas en el orden del esquema) como un bloque de columnas."""
+    for (nombre, tipo), valores in zip(esquema, zip(*filas)):
+        if tipo == TEXTO:
+            categorias, codigos = np.unique(np.array(valores, dtype=str), return_inverse=True)
+            np.save(fichero, categorias)
+            np.save(fichero, codigos.astype(_tipo_codigos(len(categorias))))
+        else:
+            np.save(fichero, np.asarray(valores, dtype=tipo))
+
+def _vacias(esquema):
+    return {nombre: np.array([], dtype=str if tipo == TEXTO else tipo) for nombre, tipo in esquema}
+
+def bloques_fichero(ruta):
+    """Genera los bloques {nombre: array} de un fichero de telemetría; un bloque final a medio escribir se ignora."""
+    with open(ruta, "rb") as fichero:
+        tamano = os.fstat(fichero.fileno()).st_size
+        try:
+            esquema = json.loads(str(np.load(fichero)))
+        except (ValueError, EOFError):
+            return  # Fichero recién creado y aún vacío
+        while fichero.tell() < tamano:
+            bloque = {}
+            try:
+                for nombre, tipo in esquema:
+                    if tipo == TEXTO:
+                        categorias = np.load(fichero)
+                        bloque[nombre] = categorias[np.load(fichero)]
+                    else:
+                        bloque[nombre] = np.load(fichero)
+            except (ValueError, EOFError, OSError):
+                return
+            yield bloque
+
+def leer_fichero(ruta):
+    """Columnas {nombre: array} de un fichero de telemetría, o None si aún no tiene esquema."""
+    with open(ruta, "rb") as fichero:
+        try:
+            esquema = json.loads(str(np.load(fichero)))
+        except (ValueError, EOFError):
+            return None
+    bloques = list(bloques_fichero(ruta))
+    if not bloques:
+        return _vacias(esquema)
+    return {nombre: np.concatenate([b[nombre] for b in bloques]) for nombre, _ in esquema}
+
+def ficheros(directorio, tabla):
+    return [os.path.join(directorio, nombre) for nombre in sorted(os.listdir(directorio))
+            if nombre.startswith(f"{tabla}-") and nombre.endswith(".tlm")]
+
+def _con_esquema(bloque, esquema):
+    """El bloque con las columnas del esquema actual; las que no tenía (ficheros anteriores) van vacías."""
+    filas = len(next(iter(bloque.values()))) if bloque else 0
+    return {nombre: bloque[nombre] if nombre in bloque else np.full(filas, "" if tipo == TEXTO else 0, dtype=str if tipo == TEXTO else tipo)
+            for nombre, tipo in esquema}
+
+def iterar(directorio, tabla, filas=FILAS_ITERACION):
+    """
+    Genera las columnas de una tabla por bloques de unas `filas` filas, fichero a fichero y sin ordenar,
+    de modo que la memoria no depende del tamaño de la telemetría.
+    """
+    esquema = ESQUEMAS[tabla]
+    pendientes, num_pendientes = [], 0
+    for ruta in ficheros(directorio, tabla):
+        for bloque in bloques_fichero(ruta):
+            pendientes.append(_con_esquema(bloque, esquema))
+            num_pendientes += len(bloque["instante"])
+            if num_pendientes >= filas:
+                yield {nombre: np.concatenate([p[nombre] for p in pendientes]) for nombre, _ in esquema}
+                pendientes, num_pendientes = [], 0
+    if pendientes:
+        yield {nombre: np.concatenate([p[nombre] for p in pendientes]) for nombre, _ in esquema}
+
+def leer(directorio, tabla):
+    """Columnas de una tabla reunidas de todos los ficheros (y orígenes) del directorio, por instante."""
+    partes = list(iterar(directorio, tabla))
+    if not partes:
+        return _vacias(ESQUEMAS[tabla])
+    columnas = {nombre: np.concatenate([p[nombre] for p in partes]) for nombre, _ in ESQUEMAS[tabla]}
+    orden = np.argsort(columnas["instante"], kind="stable")
+    return {nombre: valores[orden] for nombre, valores in columnas.items()}
+
+def exportar_csv(directorio, salida):
+    """
+    Exporta la telemetría al formato de datos_simulacion.csv (el que leen analisis_datos.py y las trazas del
+    simulador), más el ticket y los tiempos del servidor. tiempo_fin es el final del procesamiento si la
+    solicitud se completó. Devuelve el número de filas escritas.
+    """
+    solicitudes = leer(directorio, "solicitudes")
+    completadas = leer(directorio, "completadas")
+    fila_completada = {int(t): i for i, t in enumerate(completadas["ticket"])}
+    formato = lambda instante: time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(instante))
+    with open(salida, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(["tiempo_inicio", "tiempo_fin", "user_id", "tipo_solicitud", "texto_solicitud", "caracteristicas",
+                           "demanda_predicha", "servidor_asignado", "ticket", "tiempo_asignacion", "espera_cola",
+                           "tiempo_procesamiento"])
+        for i in range(len(solicitudes["ticket"])):
+            instante = float(solicitudes["instante"][i])
+            j = fila_completada.get(int(solicitudes["ticket"][i]))
+            escritor.writerow([
+                formato(instante),
+                formato(float(completadas["instante"][j]) if j is not None else instante),
+                solicitudes["user_id"][i],
+                solicitudes["tipo"][i],
+                solicitudes["texto"][i],
+                {"longitud": int(solicitudes["longitud"][i]), "tipo": str(solicitudes["tipo"][i])},
+                round(float(solicitudes["demanda_predicha"][i]), 4),
+                int(solicitudes["servidor"][i]),
+                int(solicitudes["ticket"][i]),
+                round(float(solicitudes["tiempo_asignacion"][i]), 6),
+                round(float(completadas["espera_cola"][j]), 4) if j is not None else "",
+                round(float(completadas["tiempo_procesamiento"][j]), 4) if j is not None else "",
+            ])
+    return len(solicitudes["ticket"])
+
+class Telemetria:
+    """
+    Registro de telemetría con escritura en segundo plano: registrar_* sólo encola la fila; el hilo de
+    escritura agrupa `filas_por_bloque` filas (o lo que haya cada `intervalo` segundos) en un bloque,
+    y empieza un fichero nuevo al pasar de `max_bytes`, conservando los `max_ficheros` más recientes
+    de cada tabla. `origen` distingue los ficheros de varios procesos en el mismo directorio.
+    """
+    def __init__(self, directorio="telemetria", origen="servicio", filas_por_bloque=4096, intervalo=1.0,
+                 max_bytes=64 * 2**20, max_ficheros=20):
+        self.directorio = directorio
+        self.origen = origen
+        self.filas_por_bloque = filas_por_bloque
+        self.intervalo = intervalo
+        self.max_bytes = max_bytes
+        self.max_ficheros = max_ficheros
+        os.makedirs(directorio, exist_ok=True)
+        self._ficheros = {}  # {tabla: fichero abierto}
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def registrar_solicitud(self, ticket, user_id, texto, caracteristicas, demanda, servidor, tiempo_asignacion, tiempo_servicio):
+        self._cola.put(("solicitudes", (time.time(), ticket, user_id, texto, caracteristicas["tipo"], caracteristicas["longitud"],
+                                        demanda, servidor, tiempo_asignacion, tiempo_servicio)))
+
+    def registrar_completada(self, ticket, resultado, estado=None):
+        """`estado` es el del ticket en el asignador (usuario, tipo y longitud); None si ya se descartó."""
+        estado = estado or {}
+        self._cola.put(("completadas", (time.time(), ticket, resultado["servidor"], resultado["espera_cola"],
+                                        resultado["tiempo_procesamiento"], resultado["tiempo_respuesta"],
+                                        estado.get("user_id", ""), estado.get("tipo", ""), estado.get("longitud", 0))))
+
+    def cerrar(self):
+        """Escribe las filas pendientes y detiene el hilo de escritura."""
+        if self._hilo.is_alive():
+            self._cola.put(None)
+            self._hilo.join()
+
+    def _bucle(self):
+        pendientes = {tabla: [] for tabla in ESQUEMAS}
+        ultima_escritura = time.monotonic()
+        terminar = False
+        while not terminar:
+            try:
+                elemento = self._cola.get(timeout=self.intervalo)
+                if elemento is None:
+                    terminar = True
+                else:
+                    tabla, fila = elemento
+                    pendientes[tabla].append(fila)
+                    if len(pendientes[tabla]) < self.filas_por_bloque and time.monotonic() - ultima_escritura < self.intervalo:
+                        continue
+            except queue.Empty:
+                pass
+            for tabla, filas in pendientes.items():
+                if filas:
+                    self._escribir(tabla, filas)
+                    pendientes[tabla] = []
+            ultima_escritura = time.monotonic()
+        for fichero in self._ficheros.values():
+            fichero.close()
+
+    def _generaciones(self, tabla):
+        prefijo = f"{tabla}-{self.origen}-"
+        return sorted(int(nombre[len(prefijo):-4]) for nombre in os.listdir(self.directorio)
+                      if nombre.startswith(prefijo) and nombre.endswith(".tlm") and nombre[len(prefijo):-4].isdigit())
+
+    def _ruta(self, tabla, generacion):
+        return os.path.join(self.directorio, f"{tabla}-{self.origen}-{generacion:06d}.tlm")
+
+    def _escribir(self, tabla, filas):
+        fichero = self._ficheros.get(tabla)
+        if fichero is None:
+            # Siempre en un fichero nuevo, para no continuar uno con un bloque a medias tras un fallo
+            generaciones = self._generaciones(tabla)
+            fichero = self._ficheros[tabla] = open(self._ruta(tabla, (generaciones[-1] if generaciones else 0) + 1), "wb")
+            np.save(fichero, np.array(json.dumps(ESQUEMAS[tabla])))
+            for generacion in generaciones[:max(0, len(generaciones) + 1 - self.max_ficheros)]:
+                os.remove(self._ruta(tabla, generacion))
+        escribir_bloque(fichero, ESQUEMAS[tabla], filas)
+        fichero.flush()
+        if fichero.tell() >= self.max_bytes:
+            fichero.close()
+            del self._ficheros[tabla]
+
+def crear_telemetria(directorio, origen="servicio"):
+    """Telemetría en `directorio`, o None (sin telemetría) si está vacío."""
+    return Telemetria(directorio, origen) if directorio else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Telemetría del servidor")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    exportar = subcomandos.add_parser("exportar", help="Exporta la telemetría a CSV")
+    exportar.add_argument("--directorio", default="telemetria")
+    exportar.add_argument("--salida", default="datos_simulacion.csv")
+    args = parser.parse_args()
+    if args.comando == "exportar":
+        filas = exportar_csv(args.directorio, args.salida)
+        print(f"{filas} solicitudes exportadas a {args.salida}")
+
+if __name__ == "__main__":
+    main()